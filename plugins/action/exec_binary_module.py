@@ -5,25 +5,401 @@
 
 from __future__ import annotations
 
+import fcntl
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import secrets
+import shlex
+
 from collections import ChainMap
 
-from ansible.errors import AnsibleError
+from ansible import constants as C
+from ansible.module_utils.parsing.convert_bool import boolean
 from ansible.plugins.action import ActionBase
+from ansible.utils.collection_loader._collection_finder import (
+    _get_collection_metadata,
+    _get_collection_path,
+)
 from ansible.utils.display import Display
+from ansible.utils.unsafe_proxy import wrap_var
+from ansible.vars.clean import remove_internal_keys
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.atomic import (
+    write_atomic,
+)
+
+try:
+    import zstandard
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
 
 display = Display()
 
 
+# Discovered architectures, as reported by ``uname -m``, to their names in
+# Golang's ``GOARCH``
 ARCH_MAP = {
     'i386': '386',
+    'i486': '386',
+    'i586': '386',
+    'i686': '386',
     'x86_64': 'amd64',
+    'aarch64': 'arm64',
+    'aarch64_be': 'arm64be',
+    'armv5tel': 'arm',
+    'armv6l': 'arm',
+    'armv7l': 'arm',
+    'armv8l': 'arm',
+    'mips64': 'mips64',
+    'ppc': 'ppc',
+    'ppc64': 'ppc64',
+    'ppc64le': 'ppc64le',
+    'riscv64': 'riscv64',
+    's390x': 's390x',
+}
+
+# Architectures to try in order, when there is no implementation for an
+# architecture, before a generic ``any`` build
+ARCH_FALLBACKS = {
+    'amd64v4': ['amd64v3', 'amd64v2', 'amd64'],
+    'amd64v3': ['amd64v2', 'amd64'],
+    'amd64v2': ['amd64'],
+    'arm64': ['arm'],
+}
+
+# Modules, and modules redirected by meta/runtime.yml, by collection, or
+# None for names that are not a collection, loaded by this process
+_INDEX = {}
+
+# Whether a module looked up with the loader could be found, by
+# (name, task collections), loaded by this process
+_FOUND = {}
+
+# Fact holding the system and architecture discovered by gather_facts, by
+# host name, with platform_cache=facts, so that they persist through the
+# fact cache
+PLATFORMS_FACT = 'exec_binary_module_platforms'
+
+# Where platforms are cached, by platform_cache
+PLATFORM_CACHES = ('run', 'facts', 'none')
+
+# Platforms discovered by this process, by host name, reused by the
+# remaining items of a loop
+_PLATFORMS = {}
+
+# SHA-256 of binary modules loaded by this process, by
+# (path, mtime, size)
+_CHECKSUMS = {}
+
+
+def checksum(path):
+    """The SHA-256 hex digest of the file at ``path``, hashed at most once
+    per run while the file is unchanged, and shared by all forks, in the
+    local tmp dir of the run
+    """
+    st = os.stat(path)
+    key = json.dumps([path, st.st_mtime_ns, st.st_size])
+    try:
+        return _CHECKSUMS[key]
+    except KeyError:
+        pass
+    hexdigest = _load('checksum', key)
+    if hexdigest is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        _save('checksum', key, hexdigest)
+    _CHECKSUMS[key] = hexdigest
+    return hexdigest
+
+
+# Extension, and command to decompress to stdout on the target, by
+# compression
+COMPRESSIONS = {
+    'gzip': ('.gz', 'gzip -dc'),
+    'xz': ('.xz', 'xz -dc'),
+    'zstd': ('.zst', 'zstd -dcq'),
 }
 
 
+# Seconds, by option, that a server may be idle, and that a request waits
+# for a response
+SERVER_TIMEOUTS = {
+    'server_idle_timeout': 300,
+    'server_request_timeout': 60,
+}
+
+# Directory on the target for binary module servers, one per binary and
+# become user
+SERVER_DIR = '~/.ansible/binary_module_servers'
+
+# Defines ``lock``, which takes the request lock of the server dir ``$D``
+# without waiting, recording the pid of the holder in it. A lock whose
+# holder has exited, or that has no holder after a minute, is removed so
+# that it can be taken again, under a second lock so that only one process
+# removes it
+SERVER_LOCK = '''
+lock() {
+    if mkdir "$D/lock" 2>/dev/null; then
+        echo $$ > "$D/lock/pid"
+        return 0
+    fi
+    if ! mkdir "$D/unlock" 2>/dev/null; then
+        # Left behind by a process that exited while removing a lock
+        [ -n "$(find "$D/unlock" -prune -mmin +1 2>/dev/null)" ] \\
+            && rmdir "$D/unlock" 2>/dev/null
+        return 1
+    fi
+    stale=
+    holder=$(cat "$D/lock/pid" 2>/dev/null)
+    if [ -n "$holder" ]; then
+        kill -0 "$holder" 2>/dev/null || stale=1
+    elif [ -n "$(find "$D/lock" -prune -mmin +1 2>/dev/null)" ]; then
+        stale=1
+    fi
+    if [ -n "$stale" ] \\
+            && [ "$(cat "$D/lock/pid" 2>/dev/null)" = "$holder" ]; then
+        rm -rf "$D/lock"
+    fi
+    rmdir "$D/unlock"
+    return 1
+}
+'''
+
+# Runs a binary module server in the background, holding both FIFOs open
+# so that neither the server nor a client sees EOF between requests, and
+# stopping the server once idle, while holding the request lock. Clients
+# only use a server while its pid file exists
+SERVER_WATCHDOG = '''
+D=$1
+T=$2
+''' + SERVER_LOCK + '''
+exec 3<>"$D/out" 4<>"$D/in"
+"$D/module" --ansible-server <&4 >&3 2>/dev/null &
+pid=$!
+echo "$pid" > "$D/module.pid"
+idle=0
+while kill -0 "$pid" 2>/dev/null; do
+    sleep 1
+    if [ -e "$D/active" ]; then
+        rm -f "$D/active"
+        idle=0
+        continue
+    fi
+    idle=$((idle + 1))
+    if [ "$idle" -ge "$T" ] && lock; then
+        rm -f "$D/pid"
+        kill "$pid"
+        wait "$pid"
+        rm -rf "$D"
+        exit 0
+    fi
+done
+rm -f "$D/pid"
+# Respond to the request in progress, if any
+printf '%s\n' '{"failed": true, "msg": "The binary module server exited"}' >&3
+rm -rf "$D"
+'''
+
+# Starts a server from a binary transferred to the target, holding the
+# request lock until it has started, and exiting 3 if another task is
+# starting one. Scripts run by the action are grouped, as ansible may
+# append a command to them
+SERVER_START = '''{
+D=%(dir)s
+mkdir -p "$(dirname "$D")" || exit 1
+if ! mkdir -m 0700 "$D" 2>/dev/null; then
+    [ -f "$D/pid" ] && kill -0 "$(cat "$D/pid")" 2>/dev/null && exit 3
+    # Remove a server dir left behind, that has not changed in a minute
+    [ -n "$(find "$D" -prune -mmin +1 2>/dev/null)" ] || exit 3
+    rm -rf "$D"
+    mkdir -m 0700 "$D" 2>/dev/null || exit 3
+fi
+mkdir "$D/lock" && echo $$ > "$D/lock/pid"
+cp %(binary)s "$D/module" && chmod 0700 "$D/module" \
+    && mkfifo "$D/in" "$D/out" || { rm -rf "$D"; exit 1; }
+W=%(watchdog)s
+nohup sh -c "$W" sh "$D" %(timeout)d >/dev/null 2>&1 </dev/null &
+echo $! > "$D/pid"
+rm -rf "$D/lock"
+}'''
+
+# Sends the request on stdin to a running server, and prints its response,
+# exiting 3 without sending the request when no server is running, 4 after
+# stopping a server that did not respond in time, and 5 without sending the
+# request when the request lock was not taken in time
+SERVER_REQUEST = '''{
+D=%(dir)s
+''' + SERVER_LOCK + '''
+end=$(($(date +%%s) + %(timeout)d))
+until lock; do
+    [ -f "$D/pid" ] || exit 3
+    [ "$(date +%%s)" -lt "$end" ] || exit 5
+    sleep 0.05 2>/dev/null || sleep 1
+done
+trap 'rm -rf "$D/lock"' EXIT
+if ! kill -0 "$(cat "$D/pid" 2>/dev/null)" 2>/dev/null; then
+    # Left behind by a server that is no longer running, such as after a
+    # reboot of the target
+    trap - EXIT
+    rm -rf "$D"
+    exit 3
+fi
+: > "$D/active"
+head -n 1 > "$D/in" || exit 1
+command -v timeout >/dev/null 2>&1 || { head -n 1 < "$D/out"; exit; }
+timeout %(timeout)d head -n 1 < "$D/out" && exit 0
+# The watchdog removes the server dir once the server has exited
+rm -f "$D/pid"
+kill "$(cat "$D/module.pid")" 2>/dev/null
+exit 4
+}'''
+
+
+def _compress(b_data, compression):
+    if compression == 'gzip':
+        return gzip.compress(b_data, compresslevel=9)
+    if compression == 'xz':
+        return lzma.compress(b_data, preset=6)
+    return zstandard.ZstdCompressor(level=10).compress(b_data)
+
+
+def compressed(path, compression):
+    """The path to ``path`` compressed with ``compression``, compressed
+    at most once per run, and shared by all forks, in the local tmp dir of
+    the run
+    """
+    extension = COMPRESSIONS[compression][0]
+    cached = os.path.join(
+        C.DEFAULT_LOCAL_TMP,
+        f'binary-module-{checksum(path)}{extension}'
+    )
+    if os.path.exists(cached):
+        return cached
+    with open(f'{cached}.lock', 'wb') as lock:
+        # Forks running the same binary module at once wait on the first
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not os.path.exists(cached):
+            with open(path, 'rb') as f:
+                write_atomic(cached, _compress(f.read(), compression))
+    return cached
+
+
+def _local_tmp_path(kind, key):
+    # The local tmp dir is shared by all forks, and removed at the end of
+    # the run
+    return os.path.join(
+        C.DEFAULT_LOCAL_TMP,
+        'binary-module-%s-%s.json' % (
+            kind,
+            hashlib.sha256(key.encode('utf-8')).hexdigest()
+        )
+    )
+
+
+def _load(kind, key, default=None):
+    try:
+        with open(_local_tmp_path(kind, key), 'rb') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return default
+
+
+def _save(kind, key, value):
+    write_atomic(_local_tmp_path(kind, key), json.dumps(value).encode('utf-8'))
+
+
+def load_platform(host):
+    """The platform of ``host`` discovered earlier in the run, by any
+    fork, or None
+    """
+    return _load('platform', host)
+
+
+def save_platform(host, conf):
+    _save('platform', host, conf)
+
+
+def _list_modules(collection):
+    try:
+        path = _get_collection_path(collection)
+        routing = _get_collection_metadata(collection).get('plugin_routing')
+    except ValueError:
+        return None
+    routing = (routing or {}).get('modules') or {}
+    modules_dir = os.path.join(path, 'plugins', 'modules')
+    try:
+        filenames = os.listdir(modules_dir)
+    except OSError:
+        filenames = []
+    modules = set()
+    for filename in filenames:
+        name, ext = os.path.splitext(filename)
+        if (filename.startswith(('.', '__'))
+                or ext in ('.yml', '.yaml', '.json')
+                or os.path.isdir(os.path.join(modules_dir, filename))):
+            continue
+        modules.add(name)
+    # Routing takes precedence over the files of a collection
+    modules.difference_update(routing)
+    redirects = [
+        name for name, route in routing.items()
+        if (route or {}).get('redirect')
+    ]
+    return {
+        'modules': sorted(f'{collection}.{name}' for name in modules),
+        'redirects': sorted(f'{collection}.{name}' for name in redirects),
+    }
+
+
+def module_index(collection):
+    """The names of the modules of ``collection``, including symlinks, and
+    of those redirected by its meta/runtime.yml, as a tuple of frozensets,
+    or None if ``collection`` is not an installed collection. Listed at
+    most once per run, and shared by all forks, in the local tmp dir of the
+    run
+    """
+    try:
+        return _INDEX[collection]
+    except KeyError:
+        pass
+    missing = object()
+    index = _load('index', collection, missing)
+    if index is missing:
+        index = _list_modules(collection)
+        _save('index', collection, index)
+    if index is not None:
+        index = (frozenset(index['modules']), frozenset(index['redirects']))
+    _INDEX[collection] = index
+    return index
+
+
+def _quote_path(path):
+    # Leave a leading ~ unquoted, so that the shell expands it
+    if path == '~':
+        return path
+    if path.startswith('~/'):
+        return '~/' + shlex.quote(path[2:])
+    return shlex.quote(path)
+
+
 class ActionModule(ActionBase):
 
     _supports_async = True
 
+    def __init__(self, *args, **kwargs):
+        super(ActionModule, self).__init__(*args, **kwargs)
+        self._remote_cache = None
+        self._remote_cache_result = None
+        self._compression = None
+        self._server_result = None
+
     def run(self, tmp=None, task_vars=None):
         result = super(ActionModule, self).run(tmp, task_vars)
 
@@ -34,40 +410,363 @@ class ActionModule(ActionBase):
         )
         arch = new_args.pop('arch', 'auto')
         system = new_args.pop('system', 'auto')
+        fallbacks = ARCH_FALLBACKS.copy()
+        fallbacks.update(new_args.pop('arch_fallbacks', None) or {})
+        platform_cache = new_args.pop('platform_cache', 'run')
+        if isinstance(platform_cache, bool):
+            platform_cache = 'run' if platform_cache else 'none'
+        if platform_cache not in PLATFORM_CACHES:
+            result.update({
+                'msg': (
+                    'platform_cache must be one of '
+                    f'{", ".join(PLATFORM_CACHES)}, got {platform_cache}'
+                ),
+                'failed': True,
+            })
+            return result
+
+        compression = new_args.pop('compression', None) or 'none'
+        if compression != 'none':
+            if compression not in COMPRESSIONS:
+                result.update({
+                    'msg': (
+                        'compression must be one of none, '
+                        f'{", ".join(COMPRESSIONS)}, got {compression}'
+                    ),
+                    'failed': True,
+                })
+                return result
+            if compression == 'zstd' and not HAS_ZSTANDARD:
+                result.update({
+                    'msg': (
+                        'The zstandard python library is required on the '
+                        'controller for compression=zstd'
+                    ),
+                    'failed': True,
+                })
+                return result
+            if self._connection._shell.SHELL_FAMILY == 'powershell':
+                display.warning(
+                    'compression is not supported with the powershell '
+                    'shell, the binary module will be transferred '
+                    'uncompressed'
+                )
+            else:
+                self._compression = compression
+
+        server = boolean(new_args.pop('server', False), strict=False)
+        server_timeouts = {}
+        for option, default in SERVER_TIMEOUTS.items():
+            value = new_args.pop(option, default)
+            try:
+                server_timeouts[option] = int(value)
+            except (TypeError, ValueError):
+                server_timeouts[option] = 0
+            if server_timeouts[option] < 1 or isinstance(value, bool):
+                result.update({
+                    'msg': (
+                        f'{option} must be a positive integer, got {value}'
+                    ),
+                    'failed': True,
+                })
+                return result
+        if server:
+            if self._task.async_val:
+                server = False
+            elif (self._connection._shell.SHELL_FAMILY == 'powershell'
+                    or not self._connection.has_pipelining):
+                display.warning(
+                    'server is not supported with the powershell shell, or '
+                    'connections without pipelining, the binary module will '
+                    'be executed without a server'
+                )
+                server = False
+
+        remote_cache = new_args.pop('remote_cache', None)
+        if remote_cache:
+            if self._connection._shell.SHELL_FAMILY == 'powershell':
+                display.warning(
+                    'remote_cache is not supported with the powershell shell, '
+                    'the binary module will be transferred'
+                )
+            elif self._is_become_unprivileged():
+                # The cache is owned by the remote user, and typically not
+                # readable by the become user
+                display.warning(
+                    'remote_cache is not supported when becoming an '
+                    'unprivileged user, the binary module will be transferred'
+                )
+            else:
+                self._remote_cache = remote_cache.rstrip('/') or '/'
 
+        facts = None
         if arch == 'auto' or system == 'auto':
-            conf = self._determine_auto(task_vars)
+            conf, facts = self._determine_auto(task_vars, platform_cache)
             result.update({f'_{k}': v for k, v in conf.items()})
             if arch == 'auto':
                 arch = conf['architecture']
             if system == 'auto':
                 system = conf['system']
 
-        module = result['_module'] = f'{action}_{system}_{arch}'
+        module = self._resolve(action, system, arch, fallbacks)
+        if module is None:
+            result.update({
+                'msg': (
+                    'Could not find a binary module implementation of '
+                    f'{action} for {system} {arch}.'
+                ),
+                'failed': True,
+            })
+            return result
 
-        try:
-            result.update(
-                self._execute_module(
-                    module_name=module,
-                    module_args=new_args,
-                    task_vars=task_vars,
-                    wrap_async=self._task.async_val
-                )
+        result['_module'] = module
+        data = None
+        if server:
+            data = self._execute_server(
+                module,
+                new_args.copy(),
+                task_vars,
+                server_timeouts['server_idle_timeout'],
+                server_timeouts['server_request_timeout']
             )
-        except AnsibleError as e:
-            if module in f'{e}' and all((arch, system)):
-                result.update({
-                    'msg': (
-                        'Could not find a binary module implementation of '
-                        f'{action} for {system} {arch}.'
-                    ),
-                    'failed': True,
-                })
-            else:
-                raise
+        if data is None:
+            data = self._execute_module(
+                module_name=module,
+                module_args=new_args,
+                task_vars=task_vars,
+                wrap_async=self._task.async_val
+            )
+        result.update(data)
+
+        if self._server_result:
+            result['_server'] = self._server_result
+
+        if self._remote_cache_result:
+            result['_remote_cache'] = self._remote_cache_result
+
+        if facts:
+            result.setdefault('ansible_facts', {}).update(facts)
 
         return result
 
+    def _has_module(self, name):
+        collection = name.rpartition('.')[0]
+        if collection and collection not in C.SYNTHETIC_COLLECTIONS:
+            index = module_index(collection)
+            if index is not None:
+                modules, redirects = index
+                if name in modules:
+                    return True
+                if name not in redirects:
+                    return False
+
+        # Redirects, and names that are not in a collection, are looked up
+        # with the loader, at most once per run
+        collections = self._task.collections
+        key = json.dumps([name, list(collections or ())])
+        try:
+            return _FOUND[key]
+        except KeyError:
+            pass
+        found = _load('found', key)
+        if found is None:
+            found = self._shared_loader_obj.module_loader.find_plugin_with_context(
+                name,
+                collection_list=collections
+            ).resolved
+            _save('found', key, found)
+        _FOUND[key] = found
+        return found
+
+    def _resolve(self, action, system, arch, fallbacks):
+        """The name of the first available implementation of ``action``
+        for ``system``, trying ``arch``, then its ``fallbacks``, then
+        C(any), or None
+        """
+        if not (system and arch):
+            return None
+        chain = fallbacks.get(arch) or []
+        if isinstance(chain, str):
+            chain = [chain]
+        for candidate in dict.fromkeys([arch, *chain, 'any']):
+            module = f'{action}_{system}_{candidate}'
+            if self._has_module(module):
+                return module
+        return None
+
+    def _start_server(self, local_path, server, timeout):
+        """Start a server, returning whether it was started by this task,
+        or None if it could not be started
+        """
+        tmpdir = self._connection._shell.tmpdir
+        made_tmpdir = tmpdir is None
+        if made_tmpdir:
+            tmpdir = self._make_tmp_path()
+        join_path = self._connection._shell.join_path
+        remote_path = join_path(
+            tmpdir,
+            'AnsiballZ_%s' % os.path.basename(local_path)
+        )
+        try:
+            self._transfer_file(local_path, remote_path)
+            self._fixup_perms2([tmpdir, remote_path], self._get_remote_user())
+            res = self._low_level_execute_command(SERVER_START % {
+                'dir': server,
+                'binary': shlex.quote(remote_path),
+                'watchdog': shlex.quote(SERVER_WATCHDOG),
+                'timeout': timeout,
+            })
+        finally:
+            # The server runs a copy of the binary in the server dir
+            if made_tmpdir:
+                self._remove_tmp_path(tmpdir, force=True)
+        if res['rc'] not in (0, 3):
+            display.warning(
+                'Failed to start the binary module server, executing the '
+                f'binary module without it: {res["stderr"].strip()}'
+            )
+            return None
+        return res['rc'] == 0
+
+    def _execute_server(self, module, module_args, task_vars, timeout,
+                        request_timeout):
+        """Execute ``module`` with a server on the target that is started
+        by the first task to use it, and reused by later tasks until it has
+        been idle for ``timeout`` seconds
+
+        Returns the result, or None when the server could not be used, was
+        busy with other requests for ``request_timeout`` seconds, or did not
+        respond within ``request_timeout`` seconds and was stopped
+        """
+        context = self._shared_loader_obj.module_loader.find_plugin_with_context(
+            module,
+            collection_list=self._task.collections
+        )
+        local_path = context.plugin_resolved_path
+        self._update_module_args(module, module_args, task_vars)
+
+        # One server per binary and become user
+        user = self.get_become_option('become_user', '')
+        name = hashlib.sha256(
+            f'{checksum(local_path)} {user}'.encode('utf-8')
+        ).hexdigest()
+        server = _quote_path(
+            self._connection._shell.join_path(SERVER_DIR, name)
+        )
+
+        request = SERVER_REQUEST % {'dir': server, 'timeout': request_timeout}
+        in_data = json.dumps(module_args).encode('utf-8') + b'\n'
+        res = self._low_level_execute_command(request, in_data=in_data)
+        started = False
+        if res['rc'] == 3:
+            started = self._start_server(local_path, server, timeout)
+            if started is None:
+                return None
+            res = self._low_level_execute_command(request, in_data=in_data)
+            if res['rc'] == 3:
+                return None
+        if res['rc'] == 4:
+            display.warning(
+                'The binary module server did not respond within '
+                f'{request_timeout} seconds and was stopped, executing the '
+                'binary module without it'
+            )
+            return None
+        if res['rc'] == 5:
+            display.warning(
+                'The binary module server was busy for longer than '
+                f'{request_timeout} seconds, executing the binary module '
+                'without it'
+            )
+            return None
+        self._server_result = 'started' if started else 'reused'
+
+        data = self._parse_returned_data(res)
+        remove_internal_keys(data)
+        if 'stdout' in data and 'stdout_lines' not in data:
+            data['stdout_lines'] = (data['stdout'] or '').splitlines()
+        if 'stderr' in data and 'stderr_lines' not in data:
+            data['stderr_lines'] = (data['stderr'] or '').splitlines()
+        return wrap_var(data)
+
+    def _transfer_binary(self, local_path, remote_path):
+        if self._compression:
+            extension, decompress = COMPRESSIONS[self._compression]
+            remote = shlex.quote(remote_path)
+            remote_compressed = shlex.quote(remote_path + extension)
+            super(ActionModule, self)._transfer_file(
+                compressed(local_path, self._compression),
+                remote_path + extension
+            )
+            res = self._low_level_execute_command(
+                f'{decompress} {remote_compressed} > {remote} '
+                f'&& rm -f {remote_compressed} '
+                f'|| {{ rm -f {remote} {remote_compressed}; exit 1; }}',
+                sudoable=False
+            )
+            if res['rc'] == 0:
+                return remote_path
+            display.warning(
+                f'Failed to decompress binary module with {decompress}, '
+                'transferring it uncompressed: '
+                f'{res["stderr"].strip()}'
+            )
+        return super(ActionModule, self)._transfer_file(
+            local_path,
+            remote_path
+        )
+
+    def _transfer_file(self, local_path, remote_path):
+        # Only the binary module itself is cached and compressed, and not
+        # the args file
+        if (not (self._remote_cache or self._compression)
+                or not os.path.basename(remote_path).startswith('AnsiballZ_')):
+            return super(ActionModule, self)._transfer_file(
+                local_path,
+                remote_path
+            )
+
+        if not self._remote_cache:
+            return self._transfer_binary(local_path, remote_path)
+
+        digest = checksum(local_path)
+        join_path = self._connection._shell.join_path
+        cache_dir = _quote_path(self._remote_cache)
+        cached = _quote_path(join_path(self._remote_cache, digest))
+        remote = shlex.quote(remote_path)
+
+        # The cache is keyed by checksum, so a binary in the cache is only
+        # ever replaced by an identical one. It is owned by the remote user,
+        # and not the become user
+        res = self._low_level_execute_command(
+            f'test -f {cached} && ln -sf {cached} {remote}',
+            sudoable=False
+        )
+        if res['rc'] == 0:
+            display.vvv(f'Using cached binary module {digest}')
+            self._remote_cache_result = 'hit'
+            return remote_path
+
+        self._transfer_binary(local_path, remote_path)
+        self._remote_cache_result = 'miss'
+
+        # Copy into the cache under a temporary name and then rename, so
+        # that a concurrent or interrupted copy is never used
+        tmp = _quote_path(
+            join_path(self._remote_cache, f'.{digest}.{secrets.token_hex(4)}')
+        )
+        res = self._low_level_execute_command(
+            f'mkdir -p {cache_dir} && cp {remote} {tmp} && chmod 0755 {tmp} '
+            f'&& mv -f {tmp} {cached} || {{ rm -f {tmp}; exit 1; }}',
+            sudoable=False
+        )
+        if res['rc'] != 0:
+            display.warning(
+                f'Failed to cache binary module in {self._remote_cache}: '
+                f'{res["stderr"].strip()}'
+            )
+        return remote_path
+
     def _template_with_locals(self, template, template_locals):
         temp_vars = ChainMap(
             template_locals,
@@ -77,8 +776,52 @@ class ActionModule(ActionBase):
         with set_temporary_context(available_variables=temp_vars) as templar:
             return templar.template(template)
 
-    def _determine_auto(self, task_vars):
+    def _cached_platforms(self, task_vars, host):
+        """The platforms cached in the facts of ``host``, by host name"""
+        if host == task_vars.get('inventory_hostname'):
+            facts = task_vars.get('ansible_facts')
+        else:
+            try:
+                facts = task_vars['hostvars'][host]['ansible_facts']
+            except Exception:
+                facts = None
+        try:
+            return dict(facts[PLATFORMS_FACT])
+        except Exception:
+            return {}
+
+    def _gather_platform(self, task_vars):
+        gather_facts_task = self._task.copy()
+        gather_facts_task.action = 'ansible.legacy.gather_facts'
+        gather_facts_task.args = {
+            'filter': [
+                'ansible_architecture',
+                'ansible_system',
+            ],
+            'gather_subset': ['!all', 'platform'],
+        }
+        gather_facts_action = self._shared_loader_obj.action_loader.get(
+            'ansible.legacy.gather_facts',
+            task=gather_facts_task,
+            connection=self._connection,
+            play_context=self._play_context,
+            loader=self._loader,
+            templar=self._templar,
+            shared_loader_obj=self._shared_loader_obj,
+        )
+        facts = gather_facts_action.run(task_vars=task_vars)
+        af = facts['ansible_facts']
+        return {
+            'system': af['ansible_system'].lower(),
+            'architecture': af['ansible_architecture'].lower(),
+        }
+
+    def _determine_auto(self, task_vars, cache='run'):
+        """Discover the system and architecture of the host, or delegate,
+        returning them along with any facts to cache them in
+        """
         conf = None
+        facts = None
         try:
             if dt := self._task.delegate_to:
                 conf = self._template_with_locals(
@@ -104,31 +847,36 @@ class ActionModule(ActionBase):
             conf['architecture'] = conf['architecture'].lower()
 
         if not conf:
-            gather_facts_task = self._task.copy()
-            gather_facts_task.action = 'ansible.legacy.gather_facts'
-            gather_facts_task.args = {
-                'filter': [
-                    'ansible_architecture',
-                    'ansible_system',
-                ],
-                'gather_subset': ['!all', 'platform'],
-            }
-            gather_facts_action = self._shared_loader_obj.action_loader.get(
-                'ansible.legacy.gather_facts',
-                task=gather_facts_task,
-                connection=self._connection,
-                play_context=self._play_context,
-                loader=self._loader,
-                templar=self._templar,
-                shared_loader_obj=self._shared_loader_obj,
-            )
-            facts = gather_facts_action.run(task_vars=task_vars)
-            af = facts['ansible_facts']
-            conf = {
-                'system': af['ansible_system'].lower(),
-                'architecture': af['ansible_architecture'].lower(),
-            }
+            host = dt or task_vars.get('inventory_hostname')
+            # With platform_cache=facts, platforms are cached in the facts
+            # of the host the results of this task are assigned to, which
+            # for a delegated task is the inventory host, unless
+            # delegate_facts is set
+            if dt and self._task.delegate_facts:
+                owner = dt
+            else:
+                owner = task_vars.get('inventory_hostname')
+
+            if cache != 'none':
+                conf = _PLATFORMS.get(host) or load_platform(host)
+                if conf is None and cache == 'facts':
+                    conf = self._cached_platforms(task_vars, owner).get(host)
+                    if conf is None and dt:
+                        conf = self._cached_platforms(task_vars, dt).get(dt)
+
+            if not conf:
+                conf = self._gather_platform(task_vars)
+                if cache != 'none':
+                    save_platform(host, conf)
+                if cache == 'facts':
+                    platforms = self._cached_platforms(task_vars, owner)
+                    platforms[host] = conf
+                    facts = {PLATFORMS_FACT: platforms}
+
+            if cache != 'none':
+                _PLATFORMS[host] = conf
+            conf = conf.copy()
 
         arch = conf['architecture']
         conf['architecture'] = ARCH_MAP.get(arch, arch)
-        return conf
+        return conf, facts
@@ -79,6 +79,20 @@ DOCUMENTATION = '''
           - key: per_host_task
             section: cprofile_callback
         type: bool
+      top_host_tasks:
+        description: When C(per_host_task) is enabled, only display and
+                     export the stats of this many host/task combinations,
+                     those with the most total time, slowest first. The
+                     remaining combinations are summarized by task, with
+                     their count and total time. Profiles are streamed
+                     from the store, and only this many are retained. By
+                     default, every host/task combination is displayed.
+        env:
+          - name: CPROFILE_TOP_HOST_TASKS
+        ini:
+          - key: top_host_tasks
+            section: cprofile_callback
+        type: int
       profile_forks:
         description: Whether to profile code executed in forks
         default: True
@@ -88,20 +102,303 @@ DOCUMENTATION = '''
           - key: profile_forks
             section: cprofile_callback
         type: bool
+      profile_modules:
+        description: Also profile Python modules as they run on managed
+                     hosts, merging their stats into the profile of the
+                     fork that ran them. Functions run on managed hosts
+                     have their filenames prefixed with C(remote:), and
+                     C(filters) apply to them as they do on the controller.
+                     Only applies to AnsiballZ wrapped modules when
+                     C(profile_forks) is enabled, and not to async tasks.
+                     Modules are always profiled with cProfile, regardless
+                     of C(mode).
+        default: False
+        env:
+          - name: CPROFILE_PROFILE_MODULES
+        ini:
+          - key: profile_modules
+            section: cprofile_callback
+        type: bool
+      profile_hosts:
+        description: Only profile forks for hosts with a name matching one
+                     of these shell style patterns. Defaults to all hosts.
+        default: []
+        env:
+          - name: CPROFILE_PROFILE_HOSTS
+        ini:
+          - key: profile_hosts
+            section: cprofile_callback
+        type: list
+        elements: str
+      profile_tasks:
+        description: Only profile forks for tasks with a name or action
+                     matching one of these shell style patterns. Defaults
+                     to all tasks.
+        default: []
+        env:
+          - name: CPROFILE_PROFILE_TASKS
+        ini:
+          - key: profile_tasks
+            section: cprofile_callback
+        type: list
+        elements: str
+      profile_fraction:
+        description: Randomly profile only this fraction of forks, between
+                     C(0.0) and C(1.0). Applied after C(profile_hosts)
+                     and C(profile_tasks).
+        default: 1.0
+        env:
+          - name: CPROFILE_PROFILE_FRACTION
+        ini:
+          - key: profile_fraction
+            section: cprofile_callback
+        type: float
+      mode:
+        description: The profiler to use. C(deterministic) uses C(cProfile),
+                     and C(sampling) uses a statistical stack sampler with
+                     much lower overhead. When using C(sampling), the number
+                     of calls reported is the number of samples a function
+                     was seen in, and calls to C functions are attributed to
+                     their caller.
+        default: deterministic
+        choices:
+          - deterministic
+          - sampling
+        env:
+          - name: CPROFILE_MODE
+        ini:
+          - key: mode
+            section: cprofile_callback
+        type: str
+      sample_interval:
+        description: Interval in seconds between stack samples when
+                     C(mode=sampling)
+        default: 0.01
+        env:
+          - name: CPROFILE_SAMPLE_INTERVAL
+        ini:
+          - key: sample_interval
+            section: cprofile_callback
+        type: float
+      export_dir:
+        description: Directory to export profiles to, in the formats
+                     specified by C(export_formats). Profiles are exported
+                     after filtering and stripping. When C(per_host_task)
+                     is enabled, each host/task combination is exported as
+                     a separate profile.
+        env:
+          - name: CPROFILE_EXPORT_DIR
+        ini:
+          - key: export_dir
+            section: cprofile_callback
+        type: path
+      export_formats:
+        description: >-
+          Formats to export profiles as, when C(export_dir) is set.
+          C(collapsed) is collapsed stack text, as consumed by
+          C(flamegraph.pl), C(speedscope) is speedscope JSON, and
+          C(chrome) is Chrome trace event JSON. As cProfile does not record
+          full stacks, stacks are reconstructed from caller data.
+          C(timeline) is a Chrome trace event JSON timeline of forks, by
+          fork slot and by host, showing the time each task waited for a
+          free fork, fork startup, the task run and the time spent saving
+          the profile. The timeline includes forks excluded by
+          C(profile_hosts), C(profile_tasks) and C(profile_fraction).
+          C(callgraph) is a SQLite database of the call graph, keeping
+          caller and callee data for every function, which can be queried
+          for the callers, callees and hot paths of a function across the
+          whole run with
+          C(python -m ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_callgraph).
+          C(timeline) and C(callgraph) are not exported by default.
+        default:
+          - collapsed
+          - speedscope
+          - chrome
+        choices:
+          - collapsed
+          - speedscope
+          - chrome
+          - timeline
+          - callgraph
+        env:
+          - name: CPROFILE_EXPORT_FORMATS
+        ini:
+          - key: export_formats
+            section: cprofile_callback
+        type: list
+        elements: str
+      baseline_dir:
+        description: Directory to save and load named baselines from
+        default: ~/.ansible/cprofile/baselines
+        env:
+          - name: CPROFILE_BASELINE_DIR
+        ini:
+          - key: baseline_dir
+            section: cprofile_callback
+        type: path
+      save_baseline:
+        description: Save the merged profile of this run, before filtering,
+                     as a baseline with this name in C(baseline_dir),
+                     replacing any existing baseline of the same name
+        env:
+          - name: CPROFILE_SAVE_BASELINE
+        ini:
+          - key: save_baseline
+            section: cprofile_callback
+        type: str
+      compare_baseline:
+        description: Compare the merged profile of this run against the
+                     baseline with this name in C(baseline_dir), and report
+                     the functions that regressed the most, by absolute and
+                     relative change. The first of C(sort) is used as the
+                     compared value when it is one of C(ncalls),
+                     C(tottime), or C(cumtime), otherwise C(cumtime) is
+                     used. C(filters), C(strip_dirs) and C(limit) apply.
+        env:
+          - name: CPROFILE_COMPARE_BASELINE
+        ini:
+          - key: compare_baseline
+            section: cprofile_callback
+        type: str
+      trace_memory:
+        description: Trace memory allocations with C(tracemalloc) alongside
+                     profiling, on the controller and in forks, and report
+                     the largest allocation sites and peak RSS. When
+                     C(per_host_task) is not enabled, only the
+                     C(memory_limit) forks with the highest peak RSS are
+                     reported individually. To trace allocations from
+                     interpreter startup, set C(PYTHONTRACEMALLOC=1).
+        default: False
+        env:
+          - name: CPROFILE_TRACE_MEMORY
+        ini:
+          - key: trace_memory
+            section: cprofile_callback
+        type: bool
+      memory_limit:
+        description: Number of allocation sites, and forks, to report when
+                     C(trace_memory) is enabled
+        default: 10
+        env:
+          - name: CPROFILE_MEMORY_LIMIT
+        ini:
+          - key: memory_limit
+            section: cprofile_callback
+        type: int
+      merge_interval:
+        description: Interval in seconds at which profiles from forks are
+                     merged in the background while the playbook runs.
+                     Set to C(0) to only merge at the end of the run. Not
+                     used when C(per_host_task).
+        default: 1.0
+        env:
+          - name: CPROFILE_MERGE_INTERVAL
+        ini:
+          - key: merge_interval
+            section: cprofile_callback
+        type: float
+      report_overhead:
+        description: Report the cost of profiling itself. For forks, the
+                     time spent enabling and disabling the profiler,
+                     snapshotting memory, building stats, encoding them
+                     for the profile store, waiting for its lock and
+                     writing to it. For the controller, the time
+                     spent merging profiles from forks, and producing the
+                     final report. When C(mode=deterministic), the time cProfile
+                     adds to each function call is calibrated, to estimate
+                     the share of the profiled time that is instrumentation
+                     overhead.
+        default: False
+        env:
+          - name: CPROFILE_REPORT_OVERHEAD
+        ini:
+          - key: report_overhead
+            section: cprofile_callback
+        type: bool
+      merge_workers:
+        description: Number of processes used to merge the profiles from
+                     forks that remain at the end of the run, as a tree
+                     reduction. C(1) merges in the controller process, and
+                     C(0) uses one process per CPU. A process pool is only
+                     used when many profiles remain, such as with
+                     C(merge_interval=0). Not used when C(per_host_task).
+        default: 1
+        env:
+          - name: CPROFILE_MERGE_WORKERS
+        ini:
+          - key: merge_workers
+            section: cprofile_callback
+        type: int
+      rollup:
+        description: >-
+          Also report time rolled up into Ansible subsystems, such as
+          connection plugins, templating, the strategy, module build and
+          transfer, lookups, and this collection, with each subsystem's
+          share of the total self time. When C(per_host_task) is enabled,
+          each host/task combination is rolled up, followed by a rollup of
+          the whole run. The rollup is of all profiled code, regardless of
+          C(filters). Functions outside of any subsystem, such as builtins
+          and the standard library, are attributed to the subsystem of
+          their most expensive caller, and cumulative time is the time
+          spent in calls into a subsystem from outside of it.
+        default: False
+        env:
+          - name: CPROFILE_ROLLUP
+        ini:
+          - key: rollup
+            section: cprofile_callback
+        type: bool
+      rollup_subsystems:
+        description: >-
+          Additional subsystems for C(rollup), checked before the built in
+          subsystems, as C(name=fragment) items, where functions with a
+          filename containing the path C(fragment) are attributed to the
+          subsystem C(name), for example
+          C(my.collection=/ansible_collections/my/collection/). A name may
+          be repeated to match multiple fragments.
+        default: []
+        env:
+          - name: CPROFILE_ROLLUP_SUBSYSTEMS
+        ini:
+          - key: rollup_subsystems
+            section: cprofile_callback
+        type: list
+        elements: str
+      socket_path:
+        description: >-
+          Path of a Unix socket to serve the current merged controller and
+          fork profile from while the playbook runs, sorted and filtered
+          like the final report. Each connection sends a single line of
+          space separated C(key=value) pairs, where C(sort) is a comma
+          separated list and C(limit) is an int, overriding C(sort) and
+          C(limit), for example
+          C(echo 'sort=tottime limit=20' | nc -U /path/to/socket).
+          The socket is only accessible by the current user, and is
+          removed at the end of the run.
+        env:
+          - name: CPROFILE_SOCKET_PATH
+        ini:
+          - key: socket_path
+            section: cprofile_callback
+        type: path
 '''
 
 import _lsprof
 import cProfile
+import fnmatch
 import functools
-import json
+import heapq
+import io
 import os
 import pickle
 import pstats
+import random
+import re
 import shutil
 import sys
 import tempfile
+import threading
 import time
-from glob import iglob
 
 try:
     import importlib.util
@@ -112,9 +409,45 @@ except ImportError:
 import ansible
 from ansible.errors import AnsibleError
 from ansible.executor.process.worker import WorkerProcess
+from ansible.module_utils.common.text.formatters import bytes_to_human
 from ansible.module_utils.six import PY3
 from ansible.playbook.block import Block
+from ansible.plugins.action import ActionBase
 from ansible.plugins.callback import CallbackBase
+from ansible.utils.multiprocessing import context as multiprocessing_context
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_memory
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_overhead
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_live import (
+    LiveServer,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_rollup import (
+    Classifier,
+    rollup,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_remote
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_sampler
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_startup
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_diff import (
+    METRICS,
+    diff_stats,
+    regressions,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_export import (
+    Exporter,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_fork import (
+    defer_sigterm,
+    wait_for_workers,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_sampler import (
+    SamplingProfiler,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_store import (
+    ProfileStore,
+    add_entries,
+    reduce_range,
+)
 
 try:
     from ansible.compat.importlib_resources import files
@@ -124,6 +457,11 @@ except ImportError:
 else:
     HAS_IMPORTLIB_RESOURCES = True
 
+# Profile records remaining at the end of the run below which
+# ``merge_workers`` merges in the controller, rather than a process pool
+POOL_MIN_RECORDS = 64
+# Chunks of records per pool process, so uneven chunks are balanced
+POOL_CHUNKS = 4
 VALID_SORTS = frozenset(pstats.Stats.sort_arg_dict_default.keys())
 
 
@@ -168,54 +506,295 @@ def find_module(module):
             return [str(path)]
 
 
-def filter_pstats(ps, filters):
-    """Filter out stats from pstats based on a path filter"""
-    for stat in list(ps.stats):
-        found = False
-        for f in filters:
-            if f == 'builtins' and stat[2].startswith('<built-in'):
-                found = True
-                break
-            elif (f.startswith('function:') and
-                    (function := f.split(':', 1)[1]) and
-                    stat[2] == function):
-                found = True
-                break
-            elif stat[0].startswith(f):
-                found = True
-                break
-        if not found:
-            ps.total_calls -= ps.stats[stat][1]
-            ps.prim_calls -= ps.stats[stat][0]
-            ps.total_tt -= ps.stats[stat][2]
-            del ps.stats[stat]
-    return ps
+class FilterIndex:
+    """Index of path filters, that classifies each unique function key
+    once, caching the result for the remainder of the run
+    """
+    def __init__(self, filters):
+        self.filters = filters
+        self._builtins = 'builtins' in filters
+        self._functions = frozenset(
+            function for f in filters
+            if f.startswith('function:') and (function := f.split(':', 1)[1])
+        )
+        # ``str.startswith`` accepts a tuple, and checks all prefixes
+        # in a single call
+        self._prefixes = tuple(
+            f for f in filters
+            if f != 'builtins' and not f.startswith('function:')
+        )
+        self._cache = {}
+
+    def match(self, func):
+        """Whether the function key ``func`` matches any filter"""
+        try:
+            return self._cache[func]
+        except KeyError:
+            pass
+        found = self._cache[func] = (
+            (self._builtins and func[2].startswith('<built-in')) or
+            func[2] in self._functions or
+            func[0].startswith(self._prefixes)
+        )
+        return found
 
 
-def strip_filter(ps, filters=None):
-    """Strip the matching filter from the paths"""
+class Stripper:
+    """Strip the leading ``path`` from function keys, caching the result
+    for each unique key
+    """
+    def __init__(self, path):
+        self.path = path
+        self._cache = {}
+
+    def __call__(self, func):
+        try:
+            return self._cache[func]
+        except KeyError:
+            pass
+        if func[0].startswith(self.path):
+            stripped = (func[0][len(self.path):],) + func[1:]
+        else:
+            stripped = func
+        self._cache[func] = stripped
+        return stripped
+
+    def strip_stats(self, stats):
+        """Strip all function keys, including callers, from a ``pstats``
+        compatible dict, in place
+        """
+        stripped = {
+            self(func): (
+                cc,
+                nc,
+                tt,
+                ct,
+                {self(caller): value for caller, value in callers.items()}
+            )
+            for func, (cc, nc, tt, ct, callers) in stats.items()
+        }
+        stats.clear()
+        stats.update(stripped)
+        return stats
+
+
+class TopHostTasks:
+    """Keep the ``top`` host/task combinations with the most total time,
+    by their offset in the profile store, summarizing the remainder by
+    task in ``rest``, as ``{(play, task_name): [count, total, slowest,
+    host]}``. A ``top`` of None, or less than 0, keeps every combination
+    """
+    def __init__(self, top):
+        self.top = None if top is not None and top < 0 else top
+        self.rest = {}
+        self._heap = []
+
+    def add(self, offset, meta):
+        """Add the host/task combination at ``offset``, with the store
+        ``meta`` of its record
+        """
+        item = (meta.get('total', 0.0), offset, meta)
+        if self.top is None or len(self._heap) < self.top:
+            heapq.heappush(self._heap, item)
+            return
+        # Offsets are unique, so meta is never compared
+        if self._heap and item[:2] > self._heap[0][:2]:
+            item = heapq.heapreplace(self._heap, item)
+        total, dummy, meta = item
+        summary = self.rest.setdefault(
+            (meta['play'], meta['task_name']),
+            [0, 0.0, 0.0, None]
+        )
+        summary[0] += 1
+        summary[1] += total
+        if summary[3] is None or total > summary[2]:
+            summary[2] = total
+            summary[3] = meta['host']
+
+    def kept(self):
+        """The ``(total, offset, meta)`` of the kept host/task
+        combinations, slowest first
+        """
+        return sorted(self._heap, key=lambda i: i[:2], reverse=True)
+
+
+def strip_path(funcs):
+    """Find the longest common path of ``funcs``, that should be stripped.
+    Returns ``None`` if there is no common path
+    """
     dirname = os.path.dirname
     ansible_root = dirname(ansible.__file__)
     try:
         path = '%s/' % os.path.commonpath(
-            [dirname(key[0]) for key in ps.stats if key[0][0] == '/']
+            [dirname(key[0]) for key in funcs if key[0][0] == '/']
         )
     except ValueError:
-        return ps
+        return None
     if path != ansible_root and path.startswith(ansible_root):
         path = dirname(ansible_root) + '/'
+    return path
 
-    for stat, item in list(ps.stats.items()):
-        index = stat[0].find(path)
-        if index != 0:
-            continue
+
+def filter_pstats(ps, filters):
+    """Filter out stats from pstats based on a path filter. ``filters``
+    may be a list of filters, or a ``FilterIndex``
+    """
+    if not isinstance(filters, FilterIndex):
+        filters = FilterIndex(filters)
+    match = filters.match
+    for stat in [s for s in ps.stats if not match(s)]:
+        ps.total_calls -= ps.stats[stat][1]
+        ps.prim_calls -= ps.stats[stat][0]
+        ps.total_tt -= ps.stats[stat][2]
         del ps.stats[stat]
-        end = index + len(path)
-        stat = (stat[0][end:],) + stat[1:]
-        ps.stats[stat] = item
     return ps
 
 
+def strip_filter(ps, filters=None, stripper=None):
+    """Strip the longest common path from the paths, or the path of the
+    supplied ``Stripper``
+    """
+    if stripper is None:
+        path = strip_path(ps.stats)
+        if path is None:
+            return ps
+        stripper = Stripper(path)
+    stripper.strip_stats(ps.stats)
+    return ps
+
+
+def make_stats(stats):
+    """Create a ``pstats.Stats`` from a ``pstats`` compatible dict, which
+    unlike ``pstats.Stats`` itself, allows an empty dict
+    """
+    if not stats:
+        return pstats.Stats()
+    return pstats.Stats(Stats(stats))
+
+
+def _reduce_range(args):
+    return reduce_range(*args)
+
+
+def _reduce_pair(pair):
+    return add_entries(*pair)
+
+
+class StatsAggregator(threading.Thread):
+    """Thread to incrementally merge stats appended to the profile store
+    by forks, so that the end of run merge only has to handle what remains
+
+    With more than one of ``workers``, what remains is merged by a process
+    pool, as a tree reduction
+    """
+    def __init__(self, store, interval, on_meta=None, workers=1):
+        super(StatsAggregator, self).__init__(
+            name='cprofile-aggregator',
+            daemon=True
+        )
+        self._store = store
+        self._interval = interval
+        self._on_meta = on_meta
+        self._workers = workers
+        self._offset = None
+        # Seconds spent merging
+        self.elapsed = 0.0
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self.entries = {}
+
+    def run(self):
+        while not self._stop_event.wait(self._interval):
+            self.merge()
+
+    def merge(self):
+        """Merge all records appended since the last merge"""
+        with self._lock:
+            begin = time.perf_counter()
+            store = self._store
+            for dummy, meta, entries in store.records(self._offset):
+                add_entries(self.entries, entries)
+                if self._on_meta:
+                    self._on_meta(meta)
+            self._offset = store.end
+            self.elapsed += time.perf_counter() - begin
+
+    def stop(self):
+        """Stop the thread, merge any remaining records, and return the
+        merged stats
+        """
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        if self._workers > 1:
+            self._merge_parallel()
+        else:
+            self.merge()
+        return self._store.resolve(self.entries)
+
+    def _merge_parallel(self):
+        """Merge all records appended since the last merge in a process
+        pool. Each process reduces a contiguous chunk of records read
+        directly from the store, and the chunks are then reduced in pairs
+        until a single result remains. Only function key ids and counters
+        are passed between processes, meta is handled here
+        """
+        with self._lock:
+            begin = time.perf_counter()
+            store = self._store
+            offsets = []
+            for offset, meta, dummy in store.records(self._offset,
+                                                     entries=False):
+                offsets.append(offset)
+                if self._on_meta:
+                    self._on_meta(meta)
+            end = store.end
+            if len(offsets) < POOL_MIN_RECORDS:
+                parts = [reduce_range(store.path, self._offset, end)]
+            else:
+                size = -(-len(offsets) // (self._workers * POOL_CHUNKS))
+                bounds = offsets[::size] + [end]
+                ranges = [
+                    (store.path, start, stop)
+                    for start, stop in zip(bounds, bounds[1:])
+                ]
+                pool = multiprocessing_context.Pool(
+                    min(self._workers, len(ranges))
+                )
+                try:
+                    parts = pool.map(_reduce_range, ranges)
+                    while len(parts) > 1:
+                        odd = parts[-1:] if len(parts) % 2 else []
+                        parts = pool.map(
+                            _reduce_pair,
+                            zip(parts[::2], parts[1::2])
+                        ) + odd
+                finally:
+                    pool.terminate()
+                    pool.join()
+            add_entries(self.entries, parts[0])
+            self._offset = end
+            self.elapsed += time.perf_counter() - begin
+
+    def snapshot(self):
+        """Merge any new records, and return the merged stats so far,
+        without stopping the thread
+        """
+        self.merge()
+        with self._lock:
+            return self._store.resolve(self.entries)
+
+
+def compile_patterns(patterns):
+    """Compile a list of shell style patterns into a single regex, or
+    ``None`` if there are no patterns
+    """
+    patterns = [p for p in patterns or [] if p]
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns))
+
+
 def get_play(task):
     obj = task
     while obj._parent:
@@ -238,58 +817,205 @@ class CallbackModule(CallbackBase):
             self.disabled = True
         else:
             self._worker_tmp = tempfile.mkdtemp()
+            self._store = ProfileStore(
+                os.path.join(self._worker_tmp, 'profiles')
+            )
+            self._store.create()
+            self._aggregator = None
+            self._live = None
+            self._live_aggregator = None
+            self._memory_path = None
+            # Stats from modules run on managed hosts, in profiled forks
+            self._remote_stats = None
+            self._start = time.time()
+            # task uuid -> time the strategy started the task
+            self._task_start = {}
 
-            p = sys.getprofile()
             # Profiler may have been started by `python -m cProfile`
             # or the cprofile inventory plugin
-            if not isinstance(p, _lsprof.Profiler):
+            p = profile_sampler.active() or sys.getprofile()
+            if not isinstance(p, (_lsprof.Profiler, SamplingProfiler)):
                 p = cProfile.Profile()
                 p.enable()
             self._p = p
 
+    def _new_profiler(self):
+        if self._mode == 'sampling':
+            return SamplingProfiler(self._sample_interval)
+        return cProfile.Profile()
+
+    def _should_profile(self, host, task):
+        """Whether the fork for ``host`` and ``task`` should be profiled,
+        based on ``profile_hosts``, ``profile_tasks`` and
+        ``profile_fraction``
+        """
+        if self._profile_hosts and not self._profile_hosts.match(host.name):
+            return False
+        if self._profile_tasks and not any(
+                self._profile_tasks.match(name)
+                for name in (task.get_name(), task.action) if name):
+            return False
+        return random.random() < self._profile_fraction
+
     def _wrap_worker(self):
+        WorkerProcess.start = self._time_worker(WorkerProcess.start)
         WorkerProcess.run = self._profile_worker(WorkerProcess.run)
+        if self._profile_modules:
+            ActionBase._configure_module = self._inject_module(
+                ActionBase._configure_module
+            )
+            ActionBase._parse_returned_data = self._extract_module(
+                ActionBase._parse_returned_data
+            )
+
+    def _inject_module(self, func):
+        """Closure for injecting the remote profiler into modules built
+        by ``ActionBase._configure_module`` in profiled forks
+        """
+        @functools.wraps(func)
+        def inner(action, *args, **kwargs):
+            ret = func(action, *args, **kwargs)
+            module_style, shebang, module_data, module_path = ret
+            if (self._remote_stats is None or module_style != 'new' or
+                    action._task.async_val or
+                    b'_ANSIBALLZ_WRAPPER' not in module_data):
+                return ret
+            injected = profile_remote.inject(module_data)
+            if injected is None:
+                self._display.warning(
+                    'Unable to profile module %s, the AnsiballZ wrapper was '
+                    'not recognized' % module_path
+                )
+                return ret
+            return module_style, shebang, injected, module_path
+
+        return inner
+
+    def _extract_module(self, func):
+        """Closure for removing remote stats from module output, before
+        it is parsed by ``ActionBase._parse_returned_data``
+        """
+        @functools.wraps(func)
+        def inner(action, res, *args, **kwargs):
+            if self._remote_stats is not None and 'stdout' in res:
+                res['stdout'], stats = profile_remote.extract(res['stdout'])
+                if stats:
+                    self._remote_stats.append(stats)
+                    if 'stdout_lines' in res:
+                        res['stdout_lines'] = res['stdout'].splitlines()
+            return func(action, res, *args, **kwargs)
+
+        return inner
+
+    def _time_worker(self, func):
+        """Closure for recording when ``WorkerProcess.start`` is called
+        on the controller, for the timeline
+        """
+        @functools.wraps(func)
+        def inner(wp):
+            wp._cprofile_spawned = time.time()
+            return func(wp)
+
+        return inner
 
     def _profile_worker(self, func):
         """Closure for profiling ``WorkerProcess.run`` with ``cProfile``
+        or the sampling profiler
 
-        stats are dumped stats to a file for later retrieval
+        stats are appended to the profile store for later retrieval
         """
-        name = getattr(func, '__qualname__', func.__name__)
-
         @functools.wraps(func)
         def inner(wp):
             host = wp._host
             task = wp._task
-            p = cProfile.Profile()
+            timeline = {
+                'queued': self._task_start.get(task._uuid),
+                'spawned': getattr(wp, '_cprofile_spawned', None),
+                'slot': getattr(wp, 'worker_id', None),
+            }
+            if not self._should_profile(host, task):
+                if not self._timeline:
+                    return func(wp)
+                timeline['started'] = time.time()
+                try:
+                    return func(wp)
+                finally:
+                    timeline['finished'] = time.time()
+                    with defer_sigterm():
+                        meta = self._meta(host, task, timeline)
+                        meta['profiled'] = False
+                        self._store.append({}, meta)
+
+            if self._trace_memory:
+                profile_memory.start(reset=True)
+            if self._profile_modules:
+                self._remote_stats = []
+            clock = time.perf_counter
+            overhead = {} if self._overhead else None
+            begin = clock()
+            p = self._new_profiler()
             p.create_stats()
+            timeline['started'] = time.time()
             p.enable()
+            if overhead is not None:
+                overhead['enable'] = clock() - begin
             try:
                 func(wp)
             finally:
+                begin = clock()
                 p.disable()
-                pstat_file = os.path.join(
-                    self._worker_tmp,
-                    '%s-%s-%s.pstat' % (
-                        name,
-                        os.getpid(),
-                        time.time(),
-                    )
-                )
-                with open('%s.json' % pstat_file, 'w+') as f:
-                    json.dump(
-                        {
-                            'host': host.name,
-                            'task_name': task.get_name(),
-                            'task_uuid': task._uuid,
-                            'play': get_play(task).get_name(),
-                        },
-                        f
-                    )
-                dump_stats(p, pstat_file)
+                if overhead is not None:
+                    overhead['disable'] = clock() - begin
+                timeline['finished'] = time.time()
+                with defer_sigterm():
+                    self._write_profile(p, host, task, timeline, overhead)
 
         return inner
 
+    def _meta(self, host, task, timeline):
+        return {
+            'host': host.name,
+            'task_name': task.get_name(),
+            'task_uuid': task._uuid,
+            'play': get_play(task).get_name(),
+            'pid': os.getpid(),
+            'timeline': timeline,
+        }
+
+    def _write_profile(self, p, host, task, timeline, overhead=None):
+        clock = time.perf_counter
+        meta = self._meta(host, task, timeline)
+        if self._trace_memory:
+            # Snapshot before building stats, so that the allocations of
+            # the profiler itself are not included
+            begin = clock()
+            meta['memory'] = profile_memory.collect(self._memory_limit)
+            if overhead is not None:
+                overhead['memory'] = clock() - begin
+        begin = clock()
+        p.create_stats()
+        stats = p.stats
+        if self._remote_stats:
+            stats = add_entries({}, stats)
+            for remote in self._remote_stats:
+                add_entries(stats, remote)
+        # Used to rank host/task combinations by ``top_host_tasks``, and
+        # to estimate overhead
+        meta['total'] = 0.0
+        meta['calls'] = 0
+        for value in stats.values():
+            meta['total'] += value[2]
+            meta['calls'] += value[1]
+        if overhead is not None:
+            overhead['build'] = clock() - begin
+            meta['overhead'] = overhead
+        timeline['saved'] = time.time()
+        self._store.append(
+            stats,
+            meta,
+            timing='overhead' if overhead is not None else None
+        )
+
     def set_options(self, *args, **kwargs):
         super(CallbackModule, self).set_options(*args, **kwargs)
 
@@ -297,10 +1023,65 @@ class CallbackModule(CallbackBase):
         sort = self.get_option('sort')
         strip_dirs = self.get_option('strip_dirs')
         self._per_host_task = self.get_option('per_host_task')
+        self._top_host_tasks = self.get_option('top_host_tasks')
+        if self._top_host_tasks is not None and self._top_host_tasks < 0:
+            self._top_host_tasks = None
         self._limit = self.get_option('limit')
+        merge_interval = self.get_option('merge_interval')
+        merge_workers = self.get_option('merge_workers')
+        if merge_workers < 0:
+            self.disabled = True
+            raise AnsibleError(
+                'Invalid cprofile merge_workers: %d' % merge_workers
+            )
+        merge_workers = merge_workers or os.cpu_count() or 1
+        self._profile_hosts = compile_patterns(
+            self.get_option('profile_hosts')
+        )
+        self._profile_tasks = compile_patterns(
+            self.get_option('profile_tasks')
+        )
+        self._profile_fraction = self.get_option('profile_fraction')
+        self._profile_modules = self.get_option('profile_modules')
+        self._trace_memory = self.get_option('trace_memory')
+        self._memory_limit = self.get_option('memory_limit')
+        if self._trace_memory:
+            profile_memory.start()
+            self._memory = profile_memory.MemoryReport(self._memory_limit)
+        else:
+            self._memory = None
+        if self.get_option('report_overhead'):
+            self._overhead = profile_overhead.OverheadReport()
+        else:
+            self._overhead = None
+        self._mode = self.get_option('mode')
+        self._sample_interval = self.get_option('sample_interval')
+        self._export_dir = self.get_option('export_dir')
+        self._export_formats = self.get_option('export_formats')
+        self._timeline = bool(
+            self._export_dir and 'timeline' in self._export_formats
+        )
 
-        if self.get_option('profile_forks'):
+        # Replace the running profiler if it doesn't match the mode, this
+        # discards anything collected so far
+        sampling = self._mode == 'sampling'
+        if sampling != isinstance(self._p, SamplingProfiler):
+            self._p.disable()
+            self._p = self._new_profiler()
+            self._p.enable()
+
+        self._profile_forks = self.get_option('profile_forks')
+        if self._profile_forks:
             self._wrap_worker()
+            if not self._per_host_task:
+                self._aggregator = StatsAggregator(
+                    self._store,
+                    merge_interval,
+                    on_meta=self._on_meta,
+                    workers=merge_workers
+                )
+                if merge_interval > 0:
+                    self._aggregator.start()
 
         if any(filters):
             self._filters = []
@@ -311,6 +1092,10 @@ class CallbackModule(CallbackBase):
                     self._filters.append(f)
                     continue
                 self._filters.append(f'<frozen {f}')
+                if self._profile_modules:
+                    self._filters.append(
+                        '%s%s/' % (profile_remote.PREFIX, f.replace('.', '/'))
+                    )
                 try:
                     self._filters.extend(find_module(f))
                 except Exception as e:
@@ -320,9 +1105,18 @@ class CallbackModule(CallbackBase):
                     )
         else:
             self._filters = None
+        self._filter_index = FilterIndex(self._filters or [])
 
         self._sort = sort
         self._strip_dirs = strip_dirs
+        self._baseline_dir = self.get_option('baseline_dir')
+        self._save_baseline = self.get_option('save_baseline')
+        self._compare_baseline = self.get_option('compare_baseline')
+
+        for name in (self._save_baseline, self._compare_baseline):
+            if name and (os.sep in name or name.startswith('.')):
+                self.disabled = True
+                raise AnsibleError('Invalid cprofile baseline name: %s' % name)
 
         invalid = set(self._sort).difference(VALID_SORTS)
         if invalid:
@@ -331,48 +1125,589 @@ class CallbackModule(CallbackBase):
                 'Invalid cProfile sort: %s' % ', '.join(invalid)
             )
 
+        if self.get_option('rollup'):
+            subsystems = {}
+            for item in self.get_option('rollup_subsystems'):
+                name, sep, fragment = item.partition('=')
+                if not sep or not name or not fragment:
+                    self.disabled = True
+                    raise AnsibleError(
+                        'Invalid cprofile rollup subsystem %s, expected '
+                        'name=fragment' % item
+                    )
+                subsystems.setdefault(name, []).append(fragment)
+            self._classifier = Classifier(subsystems)
+        else:
+            self._classifier = None
+
+        socket_path = self.get_option('socket_path')
+        if socket_path:
+            try:
+                self._live = LiveServer(socket_path, self._live_report)
+            except (IOError, OSError) as e:
+                self.disabled = True
+                raise AnsibleError(
+                    'Unable to serve cprofile callback live stats on %s: %s'
+                    % (socket_path, e)
+                )
+            self._live.start()
+
+    def _live_report(self, request):
+        """Return the current merged profile as text, for the live
+        server
+        """
+        sort = request.get('sort')
+        sort = sort.split(',') if sort else self._sort
+        invalid = set(sort).difference(VALID_SORTS)
+        if invalid:
+            raise ValueError('Invalid sort: %s' % ', '.join(invalid))
+        limit = int(request.get('limit', self._limit))
+
+        # Snapshot without disabling the running profiler
+        self._p.snapshot_stats()
+        stream = io.StringIO()
+        # Empty in sampling mode before the first sample, or right after
+        # the profiler is reset
+        ps = make_stats(dict(self._p.stats))
+        ps.stream = stream
+        if self._profile_forks:
+            if self._aggregator:
+                worker_stats = self._aggregator.snapshot()
+            else:
+                if self._live_aggregator is None:
+                    # A separate store instance, so that the store is not
+                    # shared with the end of run report
+                    self._live_aggregator = StatsAggregator(
+                        ProfileStore(self._store.path),
+                        0
+                    )
+                worker_stats = self._live_aggregator.snapshot()
+            if worker_stats:
+                ps.add(make_stats(worker_stats))
+        ps.files[:] = []
+
+        if self._filters:
+            filter_pstats(ps, self._filter_index)
+        if self._strip_dirs:
+            strip_filter(ps, self._filters)
+        stream.write(
+            'Live profile after %.1f seconds\n' % (time.time() - self._start)
+        )
+        ps.sort_stats(*sort).print_stats(limit)
+        return stream.getvalue()
+
+    def _display_host_task(self, meta, entries, record_rollup, stripper,
+                           exporter):
+        """Display, and export, the stats of a single host/task
+        combination read from the store
+        """
+        store = self._store
+        if self._filters:
+            # Filter before resolving keys, so that filtered out
+            # stats are never built
+            keys = store.keys
+            match = self._filter_index.match
+            entries = {
+                fid: entry for fid, entry in entries.items()
+                if match(keys[fid])
+            }
+        ps = make_stats(store.resolve(entries))
+        if stripper:
+            strip_filter(ps, stripper=stripper)
+        if exporter:
+            exporter.add(
+                (meta['play'], meta['task_name'], meta['host']),
+                ps.stats
+            )
+        self._display.banner(
+            '%(play)s - %(task_name)s - %(host)s' % meta
+        )
+        ps.sort_stats(*self._sort).print_stats(self._limit)
+        if record_rollup:
+            self._display_rollup(*record_rollup)
+        if self._memory and 'memory' in meta:
+            self._memory_path = stripper and stripper.path
+            self._display_memory(meta['memory'])
+
+    def _display_rest(self, rest):
+        """Display the host/task combinations not included by
+        ``top_host_tasks``, summarized by task
+        """
+        self._display.banner(
+            'Other host/task combinations (%d)' % sum(
+                summary[0] for summary in rest.values()
+            )
+        )
+        self._display.display(
+            '%8s %10s %10s  %s' % ('count', 'total', 'max', 'task (slowest)')
+        )
+        ordered = sorted(rest.items(), key=lambda i: i[1][1], reverse=True)
+        for (play, task_name), (count, total, slowest, host) in ordered:
+            self._display.display(
+                '%8d %10.3f %10.3f  %s - %s (%s)' % (
+                    count, total, slowest, play, task_name, host
+                )
+            )
+
+    def _display_overhead(self, control_calls, control_total, report):
+        """Display the cost of profiling, for forks and the controller"""
+        overhead = self._overhead
+        self._display.banner('Overhead')
+        self._display.display('%d forks profiled' % overhead.count)
+        self._display.display(
+            '%10s %10s  %s' % ('total', 'max', 'phase')
+        )
+        for description, total, slowest in overhead.rows():
+            self._display.display(
+                '%10.3f %10.3f  fork %s' % (total, slowest, description)
+            )
+        if self._aggregator:
+            self._display.display(
+                '%10.3f %10s  controller merge' % (
+                    self._aggregator.elapsed, '-'
+                )
+            )
+        self._display.display(
+            '%10.3f %10s  controller report' % (report, '-')
+        )
+
+        if self._mode == 'sampling':
+            return
+        calls = overhead.calls + control_calls
+        profiled = overhead.total + control_total
+        per_call = profile_overhead.calibrate()
+        estimate = per_call * calls
+        self._display.display(
+            '%d calls at an estimated %.3fus each, %.3fs of %.3fs '
+            'profiled (%.1f%%)' % (
+                calls,
+                per_call * 1000000,
+                estimate,
+                profiled,
+                estimate / profiled * 100 if profiled else 0.0,
+            )
+        )
+
+    def _on_meta(self, meta):
+        """Collect memory and overhead data from the ``meta`` of a
+        profile read from the store
+        """
+        if self._memory and 'memory' in meta:
+            self._memory.add(
+                '%(play)s - %(task_name)s - %(host)s' % meta,
+                meta.pop('memory')
+            )
+        if self._overhead and 'overhead' in meta:
+            self._overhead.add(
+                meta['overhead'],
+                meta.get('calls', 0),
+                meta.get('total', 0.0)
+            )
+
+    def v2_playbook_on_start(self, playbook):
+        timer = profile_startup.active()
+        if timer:
+            timer.mark('playbook')
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._task_start[task._uuid] = time.time()
+        timer = profile_startup.active()
+        if timer:
+            timer.mark('first_task')
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._task_start[task._uuid] = time.time()
+
+    def _display_sites(self, sites):
+        self._display.display(
+            '%10s %10s  %s' % ('size', 'count', 'filename:lineno')
+        )
+        for filename, lineno, size, count in sites:
+            self._display.display(
+                '%10s %10d  %s:%d' % (
+                    bytes_to_human(size),
+                    count,
+                    self._strip_memory_path(filename),
+                    lineno,
+                )
+            )
+
+    def _strip_memory_path(self, filename):
+        if self._strip_dirs and self._memory_path and \
+                filename.startswith(self._memory_path):
+            return filename[len(self._memory_path):]
+        return filename
+
+    def _display_memory(self, memory):
+        """Display the memory data collected for a single fork"""
+        self._display.display(
+            'Memory: %s traced peak, %s peak RSS' % (
+                bytes_to_human(memory['peak']),
+                bytes_to_human(memory['rss']),
+            )
+        )
+        self._display_sites(memory['top'])
+
+    def _display_memory_report(self):
+        """Display memory for the controller and forks"""
+        control = profile_memory.collect(self._memory_limit)
+        self._memory_path = strip_path([(site[0],) for site in control['top']])
+        self._display.banner('Memory - Control')
+        self._display_memory(control)
+        self._display.display(
+            'Largest fork peak RSS: %s' % bytes_to_human(
+                profile_memory.peak_rss(children=True)
+            )
+        )
+        if not self._memory.count:
+            return
+
+        self._display.banner('Memory - Forks')
+        self._display.display(
+            '%d forks traced, highest peak RSS:' % self._memory.count
+        )
+        self._display.display(
+            '%10s %10s  %s' % ('rss', 'peak', 'play - task - host')
+        )
+        for name, memory in self._memory.forks():
+            self._display.display(
+                '%10s %10s  %s' % (
+                    bytes_to_human(memory['rss']),
+                    bytes_to_human(memory['peak']),
+                    name,
+                )
+            )
+        sites = self._memory.top_sites()
+        self._memory_path = strip_path([(site[0],) for site in sites])
+        self._display.display('Allocation sites across all forks:')
+        self._display_sites(sites)
+
+    def _baseline_path(self, name):
+        return os.path.join(self._baseline_dir, '%s.pstat' % name)
+
+    def _write_baseline(self, stats):
+        """Save the unfiltered merged ``stats`` as a named baseline"""
+        path = self._baseline_path(self._save_baseline)
+        try:
+            if not os.path.isdir(self._baseline_dir):
+                os.makedirs(self._baseline_dir, mode=0o755)
+            dump_stats(Stats(stats), path)
+        except (IOError, OSError) as e:
+            self._display.warning(
+                'Unable to save cprofile baseline %s: %s' % (path, e)
+            )
+
+    def _print_baseline_diff(self, ps, stripper=None):
+        """Compare the filtered ``ps``, stripped by ``stripper``, against
+        the named baseline, and display the regressions
+        """
+        path = self._baseline_path(self._compare_baseline)
+        try:
+            base = load_stats(path)
+        except (IOError, OSError) as e:
+            self._display.warning(
+                'Unable to load cprofile baseline %s: %s' % (path, e)
+            )
+            return
+        if self._filters:
+            filter_pstats(base, self._filter_index)
+        # Stripped the same as the run, so that the keys of both match
+        if stripper:
+            strip_filter(base, stripper=stripper)
+
+        metric = self._sort[0] if self._sort[0] in METRICS else 'cumtime'
+        deltas = diff_stats(base.stats, ps.stats, metric)
+        for relative in (False, True):
+            self._display.banner(
+                'Baseline %s - %s regressions by %s change' % (
+                    self._compare_baseline,
+                    metric,
+                    'relative' if relative else 'absolute',
+                )
+            )
+            self._display.display(
+                '%10s %10s %9s %9s %9s %9s %9s  %s' % (
+                    'ncalls', 'change', 'tottime', 'change', 'cumtime',
+                    'change', 'change%', 'filename:lineno(function)'
+                )
+            )
+            for delta in regressions(deltas, self._limit, relative):
+                if delta.relative is None:
+                    percent = 'new'
+                else:
+                    percent = '%+.1f%%' % (delta.relative * 100)
+                self._display.display(
+                    '%10d %+10d %9.3f %+9.3f %9.3f %+9.3f %9s  %s' % (
+                        delta.ncalls[0], delta.ncalls[1],
+                        delta.tottime[0], delta.tottime[1],
+                        delta.cumtime[0], delta.cumtime[1],
+                        percent,
+                        pstats.func_std_string(delta.func),
+                    )
+                )
+
+    def _display_startup(self, timer):
+        """Display the startup timing recorded by the cprofile inventory
+        plugin
+        """
+        self._display.banner('Startup')
+        self._display.display('%9s  %s' % ('seconds', 'phase'))
+        total = 0.0
+        for description, seconds in timer.phases():
+            total += seconds
+            self._display.display('%9.3f  %s' % (seconds, description))
+        self._display.display('%9.3f  %s' % (total, 'total startup'))
+        first_task = timer.marks.get('first_task')
+        if first_task:
+            self._display.display(
+                '%9.3f  %s' % (time.time() - first_task, 'play execution')
+            )
+
+        if timer.loaders:
+            self._display.display('Plugin loader lookups:')
+            self._display.display(
+                '%9s %9s  %s' % ('calls', 'seconds', 'loader')
+            )
+            for name, (calls, seconds) in sorted(
+                    timer.loaders.items(), key=lambda i: i[1][1],
+                    reverse=True):
+                self._display.display(
+                    '%9d %9.3f  %s' % (calls, seconds, name)
+                )
+
+        if timer.imports:
+            self._display.display(
+                'Imports, slowest %d of %d by cumulative time:' % (
+                    min(self._limit, len(timer.imports))
+                    if self._limit >= 0 else len(timer.imports),
+                    len(timer.imports),
+                )
+            )
+            self._display.display(
+                '%9s %10s  %s' % ('self', 'cumulative', 'module')
+            )
+            for name, self_time, cumulative in timer.top_imports(self._limit):
+                self._display.display(
+                    '%9.3f %10.3f  %s' % (self_time, cumulative, name)
+                )
+
+    def _display_rollup(self, totals, total):
+        """Display subsystem ``totals`` as returned by ``rollup``"""
+        self._display.display(
+            '%9s %7s %10s  %s' % ('self', 'share', 'cumulative', 'subsystem')
+        )
+        for name, (self_time, cumulative) in sorted(
+                totals.items(), key=lambda i: i[1][0], reverse=True):
+            self._display.display(
+                '%9.3f %6.1f%% %10.3f  %s' % (
+                    self_time,
+                    self_time / total * 100 if total else 0.0,
+                    cumulative,
+                    name,
+                )
+            )
+
+    def _wait_for_workers(self):
+        """Wait for forks that are still writing their profiles
+
+        Results are sent to the controller before a fork has finished
+        writing its profile, and any forks still running at exit are
+        terminated, losing their profiles
+        """
+        for pid in wait_for_workers():
+            self._display.warning(
+                'Timed out waiting for fork %s to write its profile' % pid
+            )
+
     def v2_playbook_on_stats(self, stats):
+        if self._live:
+            self._live.stop()
         self._p.disable()
+        report_start = time.perf_counter()
+        self._wait_for_workers()
+
+        timer = profile_startup.active()
+        if timer:
+            profile_startup.stop()
+            self._display_startup(timer)
 
         tmp = self._worker_tmp
 
+        if self._export_dir and self._export_formats:
+            exporter = Exporter(
+                self._export_dir,
+                self._export_formats,
+                origin=self._start
+            )
+        else:
+            exporter = None
+
         if self._per_host_task:
+            store = self._store
+            index = self._filter_index
             ps = pstats.Stats(self._p)
+            control_calls = ps.total_calls
+            control_total = ps.total_tt
+            baseline = self._save_baseline or self._compare_baseline
+            if baseline:
+                control = dict(ps.stats)
+                merged = {}
+            classifier = self._classifier
+            if classifier:
+                control_rollup = rollup(ps.stats, classifier)
+                run_totals = {}
+                run_total = 0.0
             if self._filters:
-                filter_pstats(ps, self._filters)
+                filter_pstats(ps, index)
+
+            stripper = None
             if self._strip_dirs:
-                strip_filter(ps, self._filters)
+                # Read all function keys, so that the same path is
+                # stripped from every host/task combo
+                for dummy in store.records(entries=False):
+                    pass
+                funcs = list(ps.stats)
+                if self._filters:
+                    funcs.extend(filter(index.match, store.keys.values()))
+                else:
+                    funcs.extend(store.keys.values())
+                path = strip_path(funcs)
+                if path is not None:
+                    stripper = Stripper(path)
+                    strip_filter(ps, stripper=stripper)
+
+            if exporter:
+                exporter.add('Control', ps.stats)
             self._display.banner('Control')
             ps.sort_stats(*self._sort).print_stats(self._limit)
+            if classifier:
+                self._display_rollup(*control_rollup)
 
-            for item in iglob('%s/*.pstat' % tmp):
-                ps = load_stats(item)
-                if self._filters:
-                    filter_pstats(ps, self._filters)
-                if self._strip_dirs:
-                    strip_filter(ps, self._filters)
-                with open('%s.json' % (item)) as f:
-                    data = json.load(f)
-                self._display.banner(
-                    '%(play)s - %(task_name)s - %(host)s' % data
-                )
-                ps.sort_stats(*self._sort).print_stats(self._limit)
+            keys = store.keys
+            top = self._top_host_tasks
+            top_host_tasks = TopHostTasks(top)
+            # Without ``top_host_tasks``, every record is displayed as it
+            # is read, otherwise entries are only needed for the totals
+            read_entries = top is None or baseline or classifier
+            for offset, meta, entries in store.records(entries=read_entries):
+                if meta.get('profiled') is False:
+                    self._on_meta(meta)
+                    continue
+                if baseline:
+                    add_entries(merged, entries)
+                record_rollup = None
+                if classifier:
+                    record_rollup = rollup(
+                        entries,
+                        classifier,
+                        key=keys.__getitem__
+                    )
+                    run_total += record_rollup[1]
+                    for name, (self_time, cumulative) in \
+                            record_rollup[0].items():
+                        totals = run_totals.setdefault(name, [0.0, 0.0])
+                        totals[0] += self_time
+                        totals[1] += cumulative
+                if top is None:
+                    self._display_host_task(meta, entries, record_rollup,
+                                            stripper, exporter)
+                    self._on_meta(meta)
+                    continue
+
+                self._on_meta(meta)
+                top_host_tasks.add(offset, meta)
+
+            for dummy, offset, meta in top_host_tasks.kept():
+                meta, entries = store.read(offset)
+                record_rollup = None
+                if classifier:
+                    record_rollup = rollup(
+                        entries,
+                        classifier,
+                        key=keys.__getitem__
+                    )
+                self._display_host_task(meta, entries, record_rollup,
+                                        stripper, exporter)
+            if top_host_tasks.rest:
+                self._display_rest(top_host_tasks.rest)
+
+            if classifier:
+                # Forks are rolled up separately, as the same subsystem
+                # may be entered in each fork
+                for name, (self_time, cumulative) in \
+                        control_rollup[0].items():
+                    totals = run_totals.setdefault(name, [0.0, 0.0])
+                    totals[0] += self_time
+                    totals[1] += cumulative
+                self._display.banner('Rollup')
+                self._display_rollup(run_totals, run_total + control_rollup[1])
+
+            if baseline:
+                ps = make_stats(control)
+                if merged:
+                    ps.add(make_stats(store.resolve(merged)))
+                if self._save_baseline:
+                    self._write_baseline(ps.stats)
+                if self._compare_baseline:
+                    if self._filters:
+                        filter_pstats(ps, index)
+                    if stripper:
+                        strip_filter(ps, stripper=stripper)
+                    self._print_baseline_diff(ps, stripper)
         else:
             ps = pstats.Stats(self._p)
-            ps.add(
-                *(load_stats(item) for item in iglob('%s/*.pstat' % tmp))
-            )
+            control_calls = ps.total_calls
+            control_total = ps.total_tt
+            if self._aggregator:
+                worker_stats = self._aggregator.stop()
+                if worker_stats:
+                    ps.add(pstats.Stats(Stats(worker_stats)))
 
             # Prevent ``print_stats`` from printing all files loaded from
             # the above ``ps.add``
             ps.files[:] = []
 
+            if self._save_baseline:
+                self._write_baseline(ps.stats)
+            if self._classifier:
+                run_rollup = rollup(ps.stats, self._classifier)
+
             if self._filters:
-                filter_pstats(ps, self._filters)
+                filter_pstats(ps, self._filter_index)
+            stripper = None
             if self._strip_dirs:
-                strip_filter(ps, self._filters)
+                path = strip_path(ps.stats)
+                if path is not None:
+                    stripper = Stripper(path)
+                    strip_filter(ps, stripper=stripper)
+            if exporter:
+                exporter.add('Profile', ps.stats)
             self._display.banner('Profile')
             ps.sort_stats(*self._sort).print_stats(self._limit)
+            if self._classifier:
+                self._display.banner('Rollup')
+                self._display_rollup(*run_rollup)
+
+            if self._compare_baseline:
+                self._print_baseline_diff(ps, stripper)
+
+        if self._memory:
+            self._display_memory_report()
+
+        if exporter:
+            if self._timeline:
+                # Streamed back from the store, rather than holding the
+                # meta of every fork for the run
+                for dummy, meta, dummy in self._store.records(entries=False):
+                    exporter.add_timeline(meta)
+            exporter.close()
+
+        if self._overhead:
+            self._display_overhead(
+                control_calls,
+                control_total,
+                time.perf_counter() - report_start
+            )
 
         # If profiling was started with `-m cProfile` there would be
         # another print that happens at exit that we don't want
@@ -0,0 +1,232 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: dump_metrics
+    short_description: Callback to dump task duration metrics to a JSON file
+    description:
+        - Records the duration of each task on each host, and dumps per task
+          percentiles, the slowest hosts, and the duration of each play to
+          a JSON file
+        - Durations are summarized in fixed size histograms, so memory use
+          does not grow with the number of hosts
+    type: aggregate
+    options:
+      output:
+        description: Output path to JSON file, defaults to metrics.json in the
+                     CWD
+        default: metrics.json
+        env:
+          - name: DUMP_METRICS_OUTPUT
+        ini:
+          - key: output
+            section: dump_metrics_callback
+        type: str
+      slowest_hosts:
+        description: Number of slowest hosts to include, for each task, and
+                     for the whole run by total task duration
+        default: 10
+        env:
+          - name: DUMP_METRICS_SLOWEST_HOSTS
+        ini:
+          - key: slowest_hosts
+            section: dump_metrics_callback
+        type: int
+    notes:
+      - Run ansible-playbook with ANSIBLE_CALLBACKS_ENABLED=sivel.toiletwater.dump_metrics
+      - >-
+        Durations are measured on the controller, from when a host starts a
+        task to when its result is received, and include the time spent
+        waiting for results to be processed
+      - >-
+        Percentiles are estimated from histograms with buckets about 9%
+        wide. The slowest hosts of the run are approximate when there are
+        more hosts than can be tracked, and each includes an C(error), the
+        most its C(total) may be overestimated by
+'''
+
+import json
+import os
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.atomic import (
+    write_atomic,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_metrics import (
+    HeavyHitters,
+    LogHistogram,
+    SlowestHosts,
+)
+
+# Counters for the slowest hosts of the run, per host reported
+HOST_COUNTERS = 10
+
+PERCENTILES = (
+    ('p50', 0.5),
+    ('p95', 0.95),
+    ('p99', 0.99),
+)
+
+
+class TaskMetrics:
+    """Durations and result counts of a single task across all hosts"""
+    def __init__(self, task, slowest_hosts):
+        self.name = task.get_name()
+        self.uuid = task._uuid
+        self.action = task.action
+        # Time the strategy last started the task
+        self.start = None
+        self.histogram = LogHistogram()
+        self.slowest = SlowestHosts(slowest_hosts)
+        self.results = {}
+
+    def add(self, host, duration, status):
+        self.histogram.add(duration)
+        self.slowest.add(host, duration)
+        self.results[status] = self.results.get(status, 0) + 1
+
+    def to_dict(self):
+        histogram = self.histogram
+        data = {
+            'name': self.name,
+            'uuid': self.uuid,
+            'action': self.action,
+            'count': histogram.count,
+            'total': histogram.total,
+            'min': histogram.min,
+            'max': histogram.max,
+            'mean': histogram.total / histogram.count
+            if histogram.count else None,
+        }
+        for name, q in PERCENTILES:
+            data[name] = histogram.quantile(q)
+        data['results'] = self.results
+        data['slowest_hosts'] = [
+            {'host': host, 'duration': duration}
+            for host, duration in self.slowest.top()
+        ]
+        return data
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'sivel.toiletwater.dump_metrics'
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display)
+
+        self._start = time.time()
+        self._plays = []
+        self._play = None
+        self._tasks = {}
+        # (host, task uuid) -> time, for hosts with a task in progress
+        self._running = {}
+
+    def set_options(self, *args, **kwargs):
+        super(CallbackModule, self).set_options(*args, **kwargs)
+
+        self._output = os.path.abspath(self.get_option('output'))
+        output_dir = os.path.dirname(self._output)
+        if not os.path.isdir(output_dir):
+            try:
+                os.makedirs(output_dir, mode=0o755)
+            except Exception:
+                pass
+
+        self._slowest_hosts = max(self.get_option('slowest_hosts'), 0)
+        self._hosts = HeavyHitters(
+            max(self._slowest_hosts * HOST_COUNTERS, 1)
+        )
+
+    def _end_play(self, now):
+        if self._play is not None:
+            self._play['duration'] = now - self._play['start']
+
+    def v2_playbook_on_play_start(self, play):
+        now = time.time()
+        self._end_play(now)
+        self._play = {
+            'name': play.get_name(),
+            'start': now,
+            'duration': None,
+            'tasks': [],
+        }
+        self._plays.append(self._play)
+
+    def _task_start(self, task):
+        if task._uuid not in self._tasks:
+            metrics = self._tasks[task._uuid] = TaskMetrics(
+                task,
+                self._slowest_hosts
+            )
+            if self._play is not None:
+                self._play['tasks'].append(metrics)
+        self._tasks[task._uuid].start = time.time()
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._task_start(task)
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self._task_start(task)
+
+    def v2_runner_on_start(self, host, task):
+        self._running[(host.get_name(), task._uuid)] = time.time()
+
+    def _record(self, result, status):
+        now = time.time()
+        host = result._host.get_name()
+        task = result._task
+        try:
+            metrics = self._tasks[task._uuid]
+        except KeyError:
+            # Such as a result of an include, for a task never started
+            return
+        start = self._running.pop((host, task._uuid), None)
+        if start is None:
+            start = metrics.start
+        duration = max(now - start, 0.0)
+        metrics.add(host, duration, status)
+        self._hosts.add(host, duration)
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        self._record(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, 'unreachable')
+
+    def v2_playbook_on_stats(self, stats):
+        now = time.time()
+        self._end_play(now)
+        metrics = {
+            'start': self._start,
+            'duration': now - self._start,
+            'plays': [
+                {
+                    'name': play['name'],
+                    'start': play['start'],
+                    'duration': play['duration'],
+                    'tasks': [task.to_dict() for task in play['tasks']],
+                }
+                for play in self._plays
+            ],
+            'slowest_hosts': [
+                {'host': host, 'total': total, 'error': error}
+                for host, total, error in self._hosts.top(self._slowest_hosts)
+            ],
+        }
+        write_atomic(self._output, json.dumps(metrics).encode('utf-8'))
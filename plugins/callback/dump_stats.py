@@ -23,16 +23,71 @@ DOCUMENTATION = '''
           - key: output
             section: dump_stats_callback
         type: str
+      incremental:
+        description: Also write the output each time C(set_stats) changes the
+                     stats, instead of only at the end of the run, so that
+                     the stats set so far are kept if the run does not
+                     complete
+        default: false
+        env:
+          - name: DUMP_STATS_INCREMENTAL
+        ini:
+          - key: incremental
+            section: dump_stats_callback
+        type: bool
+      compression:
+        description: Compress the output. The matching extension is
+                     appended to C(output), if not already present. C(zstd)
+                     requires the C(zstandard) python library. Compressed
+                     output must be decompressed to a regular file before
+                     it can be passed to C(--extra-vars)
+        default: none
+        choices:
+          - none
+          - gzip
+          - zstd
+        env:
+          - name: DUMP_STATS_COMPRESSION
+        ini:
+          - key: compression
+            section: dump_stats_callback
+        type: str
     notes:
       - Run ansible-playbook with ANSIBLE_CALLBACK_WHITELIST=sivel.toiletwater.dump_stats
       - Call the 2nd playbook with --extra-vars @stats.json
+      - The output is replaced atomically, so readers never see a partially
+        written file
+      - >-
+        Compressed output cannot be passed to --extra-vars directly, and
+        neither can a pipe such as C(@<(zcat stats.json.gz)), which
+        ansible-playbook rejects as not a file. Decompress it to a regular
+        file first, such as with C(zcat stats.json.gz > stats.json) or
+        C(zstd -d stats.json.zst), and pass C(--extra-vars @stats.json)
 '''
 
+import gzip
 import json
 import os
 
+from ansible.errors import AnsibleError
+from ansible.executor.stats import AggregateStats
 from ansible.plugins.callback import CallbackBase
 
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.atomic import (
+    write_atomic,
+)
+
+try:
+    import zstandard
+    HAS_ZSTANDARD = True
+except ImportError:
+    HAS_ZSTANDARD = False
+
+EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
 
 class CallbackModule(CallbackBase):
     CALLBACK_VERSION = 2.0
@@ -43,17 +98,65 @@ class CallbackModule(CallbackBase):
     def set_options(self, *args, **kwargs):
         super(CallbackModule, self).set_options(*args, **kwargs)
 
+        self._compression = self.get_option('compression')
+        if self._compression == 'zstd' and not HAS_ZSTANDARD:
+            self.disabled = True
+            raise AnsibleError(
+                'The zstandard python library is required for '
+                'dump_stats compression=zstd'
+            )
+
         self._output = os.path.abspath(self.get_option('output'))
+        extension = EXTENSIONS.get(self._compression)
+        if extension and not self._output.endswith(extension):
+            self._output += extension
         output_dir = os.path.dirname(self._output)
         if not os.path.isdir(output_dir):
             try:
-                os.path.makedirs(output_dir, mode=0o755)
+                os.makedirs(output_dir, mode=0o755)
             except Exception:
                 pass
 
+        # The custom stats of the run, as set so far by set_stats
+        self._incremental = self.get_option('incremental')
+        self._stats = AggregateStats()
+
+    def _encode(self, data):
+        b_data = json.dumps(data).encode('utf-8')
+        if self._compression == 'gzip':
+            return gzip.compress(b_data, compresslevel=6)
+        if self._compression == 'zstd':
+            return zstandard.ZstdCompressor().compress(b_data)
+        return b_data
+
+    def _write(self, data):
+        write_atomic(self._output, self._encode(data))
+
+    def v2_runner_on_ok(self, result):
+        if not self._incremental:
+            return
+        # Mirrors how the strategy applies set_stats to the stats of the
+        # run, of which only those that are not per host are written
+        task = result._task
+        if task.loop or task.loop_with:
+            items = result._result.get('results', [])
+        else:
+            items = [result._result]
+        changed = False
+        for item in items:
+            stats = item.get('ansible_stats') or {}
+            if not stats.get('data') or stats.get('per_host', True):
+                continue
+            for key, value in stats['data'].items():
+                if stats.get('aggregate'):
+                    self._stats.update_custom_stats(key, value)
+                else:
+                    self._stats.set_custom_stats(key, value)
+            changed = True
+        if changed:
+            self._write(self._stats.custom.get('_run', {}))
+
     def v2_playbook_on_stats(self, stats):
-        with open(self._output, 'w+') as f:
-            json.dump(
-                stats.custom.get('_run', {}) if hasattr(stats, 'custom') else {},
-                f
-            )
+        self._write(
+            stats.custom.get('_run', {}) if hasattr(stats, 'custom') else {}
+        )
@@ -0,0 +1,201 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+    name: template_profile
+    short_description: Report the templates that ansible spends the most time on
+    description:
+        - Instruments templating on the controller and in forks, recording
+          for each unique template string or file the number of renders and
+          compiles, the time spent rendering and compiling, and how many
+          compiles a cache of compiled templates would have avoided
+        - Reports the templates with the most time spent, to find the
+          expressions worth caching or rewriting
+    notes:
+        - >-
+          Templates are timed from when this callback is loaded, templating
+          done while loading the playbook is not included.
+        - >-
+          Cumulative time includes the time spent rendering nested
+          templates, such as variables that are themselves templates, and
+          files included by Jinja, while self time excludes them.
+        - >-
+          Files rendered by the C(template) action and lookup are reported by
+          their path, and files loaded by Jinja, such as includes and
+          imports, by their name. A miss is a render or load that had to
+          compile its template.
+    type: aggregate
+    options:
+      limit:
+        description: Limit the output to the top N templates. Set to C(-1)
+                     for no limit
+        default: 20
+        env:
+          - name: TEMPLATE_PROFILE_LIMIT
+        ini:
+          - key: limit
+            section: template_profile_callback
+        type: int
+      sort:
+        description: The value to sort templates by
+        default: cumulative
+        choices:
+          - cumulative
+          - self
+          - renders
+          - compiles
+          - recompiles
+          - compile
+        env:
+          - name: TEMPLATE_PROFILE_SORT
+        ini:
+          - key: sort
+            section: template_profile_callback
+        type: str
+      width:
+        description: Maximum width of template strings in the output
+        default: 80
+        env:
+          - name: TEMPLATE_PROFILE_WIDTH
+        ini:
+          - key: width
+            section: template_profile_callback
+        type: int
+'''
+
+import functools
+import json
+import os
+import shutil
+import tempfile
+
+from ansible.executor.process.worker import WorkerProcess
+from ansible.module_utils.six import PY3
+from ansible.plugins.callback import CallbackBase
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_fork import (
+    defer_sigterm,
+    wait_for_workers,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_store import (
+    ProfileStore,
+)
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_templates import (
+    FILE,
+    TemplateTracker,
+    merge_rows,
+    top,
+)
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'sivel.toiletwater.template_profile'
+    CALLBACK_NEEDS_WHITELIST = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display)
+
+        if not PY3:
+            self._display.warning(
+                'The template_profile callback plugin requires Python3'
+            )
+            self.disabled = True
+            return
+
+        self._tmp = tempfile.mkdtemp()
+        # Forks append their templates to the store as record meta
+        self._store = ProfileStore(os.path.join(self._tmp, 'templates'))
+        self._store.create()
+        self._tracker = TemplateTracker()
+
+    def set_options(self, *args, **kwargs):
+        super(CallbackModule, self).set_options(*args, **kwargs)
+
+        self._limit = self.get_option('limit')
+        self._sort = self.get_option('sort')
+        self._width = max(self.get_option('width'), 10)
+
+        self._tracker.install()
+        WorkerProcess.run = self._track_worker(WorkerProcess.run)
+
+    def _track_worker(self, func):
+        """Closure for recording the templates of each fork, which are
+        appended to the store as it exits
+        """
+        @functools.wraps(func)
+        def inner(wp):
+            tracker = self._tracker
+            # Discard the counts inherited from the controller
+            tracker.reset()
+            try:
+                return func(wp)
+            finally:
+                with defer_sigterm():
+                    self._store.append({}, {'templates': tracker.rows()})
+
+        return inner
+
+    def _label(self, kind, name):
+        if kind == FILE:
+            return name
+        label = json.dumps(name)
+        if len(label) > self._width:
+            label = label[:self._width - 3] + '...'
+        return label
+
+    def v2_playbook_on_stats(self, stats):
+        for pid in wait_for_workers():
+            self._display.warning(
+                'Timed out waiting for fork %s to write its templates' % pid
+            )
+        self._tracker.uninstall()
+
+        templates = merge_rows({}, self._tracker.rows())
+        forks = 0
+        for dummy, meta, dummy in self._store.records(entries=False):
+            forks += 1
+            merge_rows(templates, meta['templates'])
+
+        renders = sum(entry[0] for entry in templates.values())
+        compiles = sum(entry[1] for entry in templates.values())
+        recompiles = sum(entry[2] for entry in templates.values())
+        self._display.banner('Templates')
+        self._display.display(
+            '%d unique templates, %d renders, %d compiles, %d recompiles, '
+            'from the controller and %d forks' % (
+                len(templates), renders, compiles, recompiles, forks
+            )
+        )
+        self._display.display(
+            '%8s %8s %8s %6s %10s %10s %10s  %s' % (
+                'renders', 'compiles', 'recomp', 'miss', 'cumtime',
+                'selftime', 'compile', 'template'
+            )
+        )
+        for row in top(templates, self._sort, self._limit):
+            (kind, name, renders, compiles, recompiles, self_time,
+             cumulative, compile_time) = row
+            self._display.display(
+                '%8d %8d %8d %5.1f%% %10.3f %10.3f %10.3f  %s' % (
+                    renders,
+                    compiles,
+                    recompiles,
+                    compiles / renders * 100 if renders else 0.0,
+                    cumulative,
+                    self_time,
+                    compile_time,
+                    self._label(kind, name),
+                )
+            )
+
+        try:
+            shutil.rmtree(self._tmp)
+        except Exception:
+            pass
@@ -12,25 +12,119 @@ DOCUMENTATION = '''
     description:
         - Noop inventory plugin used to enable cProfile as early as possible
         - Must be used with the C(sivel.toiletwater.cprofile) callback plugin
+        - Also records startup timing, reported by the
+          C(sivel.toiletwater.cprofile) callback plugin
+    options:
+      plugin:
+        description: Token that ensures this is a source file for the
+                     C(sivel.toiletwater.cprofile) plugin. Optional, as
+                     any inventory source enables this plugin, and options
+                     may instead be provided via env or ini
+        required: false
+        choices:
+          - sivel.toiletwater.cprofile
+      mode:
+        description: The profiler to use. C(deterministic) uses C(cProfile),
+                     and C(sampling) uses a statistical stack sampler with
+                     much lower overhead. Should match the C(mode) of the
+                     C(sivel.toiletwater.cprofile) callback plugin.
+        default: deterministic
+        choices:
+          - deterministic
+          - sampling
+        env:
+          - name: CPROFILE_MODE
+        ini:
+          - key: mode
+            section: cprofile_callback
+        type: str
+      sample_interval:
+        description: Interval in seconds between stack samples when
+                     C(mode=sampling)
+        default: 0.01
+        env:
+          - name: CPROFILE_SAMPLE_INTERVAL
+        ini:
+          - key: sample_interval
+            section: cprofile_callback
+        type: float
+      startup_report:
+        description: >-
+          Record startup timing for a report by the
+          C(sivel.toiletwater.cprofile) callback plugin, separate from play
+          execution. Includes the time from process start to inventory
+          parsing, inventory parsing, playbook loading and play setup up to
+          the first task, the time spent in plugin loader lookups, and
+          module import times, in the manner of C(python -X importtime).
+          Only imports after this plugin is loaded, and plugin loader
+          lookups on the controller before the first task starts, are
+          timed.
+        default: true
+        env:
+          - name: CPROFILE_STARTUP_REPORT
+        ini:
+          - key: startup_report
+            section: cprofile_callback
+        type: bool
 '''
 
 import _lsprof
 import cProfile
 import sys
 
+from ansible.errors import AnsibleParserError
 from ansible.plugins.inventory import BaseInventoryPlugin
 
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_sampler
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_startup
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_sampler import (
+    SamplingProfiler,
+)
+
 
 class InventoryModule(BaseInventoryPlugin):
     NAME = 'cprofile'
 
     def __init__(self):
-        p = sys.getprofile()
+        profile_startup.start()
+        p = profile_sampler.active() or sys.getprofile()
         # Profiler may have been started by `python -m cProfile`
-        if not isinstance(p, _lsprof.Profiler):
+        self._owned = not isinstance(p, (_lsprof.Profiler, SamplingProfiler))
+        if self._owned:
             p = cProfile.Profile()
             p.enable()
+        self._p = p
         super().__init__()
 
     def verify_file(self, path):
         return True
+
+    def parse(self, inventory, loader, path, cache=True):
+        super().parse(inventory, loader, path, cache=cache)
+
+        try:
+            self._read_config_data(path)
+        except AnsibleParserError:
+            # Not a config file for this plugin, options can still be
+            # provided via env or ini
+            pass
+
+        if not self.get_option('startup_report'):
+            profile_startup.stop()
+
+        # Options aren't available until now, switch profilers if the
+        # one started in ``__init__`` doesn't match the mode. A profiler
+        # started by the user, such as with `python -m cProfile`, is kept
+        if not self._owned:
+            return
+        if self.get_option('mode') == 'sampling':
+            if not isinstance(self._p, SamplingProfiler):
+                self._p.disable()
+                self._p = SamplingProfiler(
+                    self.get_option('sample_interval')
+                )
+                self._p.enable()
+        elif isinstance(self._p, SamplingProfiler):
+            self._p.disable()
+            self._p = cProfile.Profile()
+            self._p.enable()
@@ -26,7 +26,100 @@ DOCUMENTATION = r'''
       default: auto
       description:
         - Explicitly set a system to use when calling a binary module
-  requirements: []
+    arch_fallbacks:
+      required: false
+      type: dict
+      description:
+        - Architectures to try in order, by architecture, when there is no
+          implementation of the module for the architecture, merged over
+          the defaults
+        - After the fallbacks, a generic implementation for the system,
+          with an architecture of C(any), is tried
+        - By default C(amd64v4), C(amd64v3) and C(amd64v2) fall back to the
+          lower levels and C(amd64), and C(arm64) falls back to C(arm)
+    platform_cache:
+      required: false
+      type: str
+      default: run
+      choices:
+        - run
+        - facts
+        - none
+      description:
+        - Where to cache the system and architecture when they are
+          discovered by running C(gather_facts), so that each host or
+          delegate is only probed once per run
+        - C(run) caches them on the controller for the rest of the run
+          only
+        - C(facts) also caches them in the
+          C(exec_binary_module_platforms) fact of the host, so that they
+          persist between runs when fact caching is configured
+        - C(none) probes the host each time
+    remote_cache:
+      required: false
+      type: str
+      description:
+        - A directory on the target to cache binary modules in, such as
+          C(~/.ansible/binary_modules), keyed by their SHA-256 checksum
+        - When set, the binary module is only transferred when it is not
+          already in the cache, and is otherwise executed from the cache
+        - The cache is written as the remote user, and not the become user.
+          When becoming an unprivileged user, who typically cannot read the
+          cache, the cache is not used and the binary module is transferred
+    compression:
+      required: false
+      type: str
+      default: none
+      choices:
+        - none
+        - gzip
+        - xz
+        - zstd
+      description:
+        - Compress the binary module on the controller before it is
+          transferred, and decompress it on the target before it is
+          executed
+        - Each binary module is compressed once per run, and the compressed
+          copy is shared by all forks
+        - Requires the matching C(gzip), C(xz) or C(zstd) command on the
+          target. If decompression fails, the binary module is
+          transferred uncompressed
+    server:
+      required: false
+      type: bool
+      default: false
+      description:
+        - Keep the binary module running on the target as a server, that
+          later tasks using the same binary module and become user send
+          their requests to, instead of starting a new process
+        - The binary module must support being run as a server, see the
+          notes
+        - When a server cannot be started, such as with async, the
+          powershell shell, or a connection without pipelining, the binary
+          module is executed without one
+    server_idle_timeout:
+      required: false
+      type: int
+      default: 300
+      description:
+        - Seconds that a server started by this task may be idle before it
+          is stopped
+    server_request_timeout:
+      required: false
+      type: int
+      default: 60
+      description:
+        - Seconds to wait for a server to respond to a request, and
+          separately for requests from other tasks to finish before it
+        - A server that is busy for longer is not used, and the binary
+          module is executed without it
+        - A server that does not respond in time is stopped, and the
+          binary module is executed again without it, so binary modules
+          that may run for longer should set a higher timeout
+        - Requires the C(timeout) command on the target, without which the
+          response is waited for indefinitely
+  requirements:
+    - zstandard (python library on the controller, for O(compression=zstd))
   notes:
     - This module will not generally be called directly, but will be
       configured in a collection as the C(action_plugin) for a specific
@@ -37,8 +130,33 @@ DOCUMENTATION = r'''
     - The binary modules that this action proxies to must be named like
       C({root}_{system}_{arch}). An example would look like
       C(helloworld_linux_amd64).
-    - The general implementation of arch follows that of C(GOOS) defined
-      in Golang.
+    - The general implementation of arch follows that of C(GOARCH) defined
+      in Golang. Discovered architectures are mapped to their C(GOARCH)
+      names, such as C(x86_64) to C(amd64) and C(aarch64) to C(arm64).
+    - The modules of a collection, including those redirected by its
+      C(meta/runtime.yml), are listed once per run and shared by all forks,
+      and a missing implementation fails the task before anything is
+      transferred to the target. Redirects, and implementations that are
+      not in a collection, are looked up with the module loader once per
+      run.
+    - Gathered C(ansible_facts.system) and C(ansible_facts.architecture)
+      take precedence over cached platforms. With O(platform_cache=facts),
+      a reimaged host keeps its cached platform until the fact cache is
+      cleared.
+    - O(remote_cache) and O(compression) are not supported with the
+      powershell shell, and cached binary modules are never removed from
+      the target.
+    - When used with O(remote_cache), the binary module is only compressed
+      and transferred on a cache miss.
+    - With O(server), the binary module is started once with a single
+      C(--ansible-server) argument, and must read newline delimited JSON
+      requests from stdin, each the arguments it would otherwise read
+      from its args file, writing a single line of JSON result to stdout
+      for each request, in order.
+    - Servers run as the become user, in a directory under
+      C(~/.ansible/binary_module_servers), and handle one request at a
+      time. The environment of a server is that of the task that started
+      it.
   author: 'Matt Martz (@sivel)'
 '''
 
@@ -60,6 +178,31 @@ EXAMPLES = r'''
       system: linux
       arch: amd64
       name: sivel
+
+  - name: Keep the binary module on the target between calls
+    sivel.toiletwater.exec_binary_module:
+      module: sivel.toiletwater.helloworld
+      remote_cache: ~/.ansible/binary_modules
+      name: sivel
+
+  - name: Compress the binary module for a slow link
+    sivel.toiletwater.exec_binary_module:
+      module: sivel.toiletwater.helloworld
+      compression: xz
+      name: sivel
+
+  - name: Prefer an amd64v3 build, falling back to amd64 or a generic build
+    sivel.toiletwater.exec_binary_module:
+      module: sivel.toiletwater.helloworld
+      arch: amd64v3
+      name: sivel
+
+  - name: Reuse a running binary module for many short calls
+    sivel.toiletwater.exec_binary_module:
+      module: sivel.toiletwater.helloworld
+      server: true
+      name: '{{ item }}'
+    loop: '{{ names }}'
 '''
 
 RETURN = r'''
@@ -74,6 +217,34 @@ RETURN = r'''
   _module:
     type: str
     description: The formatted module name including the root, system, and
-                 architecture
-    returned: always
+                 architecture, of the implementation that was executed,
+                 after any fallbacks
+    returned: when an implementation was found
+  _remote_cache:
+    type: str
+    description: Whether the binary module was found in the remote cache,
+                 C(hit), or had to be transferred, C(miss)
+    returned: when O(remote_cache) is set
+    sample: hit
+  _server:
+    type: str
+    description: Whether the request was sent to a server that this task
+                 C(started), or that was already running and C(reused)
+    returned: when O(server) is enabled, and a server was used
+    sample: reused
+  ansible_facts:
+    type: dict
+    description: The platforms discovered by C(gather_facts), cached in the
+                 facts of the host
+    returned: when the platform was discovered by C(gather_facts), and
+              O(platform_cache=facts)
+    contains:
+      exec_binary_module_platforms:
+        type: dict
+        description: The lowercased C(system) and C(architecture) of each
+                     host or delegate, by host name
+        sample:
+          web01:
+            system: linux
+            architecture: x86_64
 '''
@@ -0,0 +1,35 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Atomic file replacement for callbacks that dump files"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import tempfile
+
+
+def write_atomic(path, b_data):
+    """Write ``b_data`` to a temporary file alongside ``path``, and rename
+    it over ``path``, so that readers never see a partially written file
+    """
+    dirname, name = os.path.split(path)
+    fd, tmp = tempfile.mkstemp(prefix='.%s.' % name, dir=dirname)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b_data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates files only readable by the owner
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,332 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Persist ``pstats`` compatible call graphs to SQLite, and query the
+callers, callees and hot paths of functions across a whole run
+
+Written by the cprofile callback as the ``callgraph`` export format, and
+queried offline with::
+
+    python -m ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_callgraph \\
+        profile.callgraph.sqlite callers _execute_module
+
+Each profile added is stored separately, and queries merge all profiles,
+or those whose name contains ``--profile``. The ``function_stats`` and
+``call_edges`` views merge all profiles, for use from the ``sqlite3``
+shell.
+
+As with ``pstats``, only caller/callee pairs are recorded, so hot paths
+are reconstructed by attributing the time of a function to each of its
+callers in proportion to the time spent in calls from that caller.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import argparse
+import os
+import sqlite3
+import sys
+
+MAX_DEPTH = 128
+
+# Paths accounting for less than this fraction of the time of the queried
+# function are pruned
+MIN_FRACTION = 0.01
+
+SCHEMA = '''
+CREATE TABLE profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL
+);
+CREATE TABLE functions (
+    id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    lineno INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE stats (
+    profile INTEGER NOT NULL REFERENCES profiles (id),
+    function INTEGER NOT NULL REFERENCES functions (id),
+    cc INTEGER NOT NULL,
+    nc INTEGER NOT NULL,
+    tt REAL NOT NULL,
+    ct REAL NOT NULL
+);
+CREATE TABLE edges (
+    profile INTEGER NOT NULL REFERENCES profiles (id),
+    caller INTEGER NOT NULL REFERENCES functions (id),
+    callee INTEGER NOT NULL REFERENCES functions (id),
+    cc INTEGER NOT NULL,
+    nc INTEGER NOT NULL,
+    tt REAL NOT NULL,
+    ct REAL NOT NULL
+);
+CREATE INDEX edges_caller ON edges (caller);
+CREATE INDEX edges_callee ON edges (callee);
+CREATE VIEW function_stats AS
+    SELECT functions.*, SUM(cc) AS cc, SUM(nc) AS nc, SUM(tt) AS tt,
+           SUM(ct) AS ct
+    FROM stats JOIN functions ON functions.id = stats.function
+    GROUP BY functions.id;
+CREATE VIEW call_edges AS
+    SELECT caller, callee, SUM(cc) AS cc, SUM(nc) AS nc, SUM(tt) AS tt,
+           SUM(ct) AS ct
+    FROM edges
+    GROUP BY caller, callee;
+'''
+
+
+def func_name(func):
+    """Format a function key like ``pstats.func_std_string``"""
+    filename, lineno, name = func
+    if filename == '~' and lineno == 0:
+        return name
+    return '%s:%d(%s)' % (filename, lineno, name)
+
+
+class CallGraphWriter:
+    """Write ``pstats`` compatible stats to a new SQLite database at
+    ``path``, replacing any existing database. Everything is written in a
+    single transaction, committed on ``close``
+    """
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute('PRAGMA journal_mode = OFF')
+        self._conn.execute('PRAGMA synchronous = OFF')
+        self._conn.executescript(SCHEMA)
+        self._ids = {}
+
+    def _id(self, func):
+        try:
+            return self._ids[func]
+        except KeyError:
+            cursor = self._conn.execute(
+                'INSERT INTO functions (filename, lineno, name) '
+                'VALUES (?, ?, ?)',
+                func
+            )
+            func_id = self._ids[func] = cursor.lastrowid
+            return func_id
+
+    def add(self, name, stats):
+        """Add the ``pstats`` compatible ``stats`` as a profile named
+        ``name``
+        """
+        profile = self._conn.execute(
+            'INSERT INTO profiles (name) VALUES (?)',
+            (name,)
+        ).lastrowid
+        rows = []
+        edges = []
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            func_id = self._id(func)
+            rows.append((profile, func_id, cc, nc, tt, ct))
+            for caller, value in callers.items():
+                edges.append(
+                    (profile, self._id(caller), func_id) + tuple(value[:4])
+                )
+        self._conn.executemany(
+            'INSERT INTO stats VALUES (?, ?, ?, ?, ?, ?)',
+            rows
+        )
+        self._conn.executemany(
+            'INSERT INTO edges VALUES (?, ?, ?, ?, ?, ?, ?)',
+            edges
+        )
+
+    def close(self):
+        self._conn.commit()
+        self._conn.close()
+
+
+def load(path, profile=None):
+    """Load the call graph at ``path`` as a ``pstats`` compatible dict,
+    merging all profiles, or only those whose name contains ``profile``
+    """
+    conn = sqlite3.connect(path)
+    try:
+        if profile:
+            where = (
+                'WHERE profile IN (SELECT id FROM profiles '
+                "WHERE instr(name, ?) > 0)"
+            )
+            args = (profile,)
+        else:
+            where = ''
+            args = ()
+        funcs = {
+            row[0]: tuple(row[1:])
+            for row in conn.execute(
+                'SELECT id, filename, lineno, name FROM functions'
+            )
+        }
+        stats = {}
+        for func_id, cc, nc, tt, ct in conn.execute(
+                'SELECT function, SUM(cc), SUM(nc), SUM(tt), SUM(ct) '
+                'FROM stats %s GROUP BY function' % where, args):
+            stats[funcs[func_id]] = (cc, nc, tt, ct, {})
+        for caller, callee, cc, nc, tt, ct in conn.execute(
+                'SELECT caller, callee, SUM(cc), SUM(nc), SUM(tt), SUM(ct) '
+                'FROM edges %s GROUP BY caller, callee' % where, args):
+            stats[funcs[callee]][4][funcs[caller]] = (cc, nc, tt, ct)
+    finally:
+        conn.close()
+    return stats
+
+
+def find(stats, pattern):
+    """Functions in ``stats`` whose formatted name contains ``pattern``,
+    most expensive first
+    """
+    return sorted(
+        (func for func in stats if pattern in func_name(func)),
+        key=lambda func: stats[func][3],
+        reverse=True
+    )
+
+
+def callers(stats, func):
+    """``(caller, (cc, nc, tt, ct))`` for each caller of ``func``, most
+    expensive first
+    """
+    return sorted(
+        stats[func][4].items(),
+        key=lambda item: item[1][3],
+        reverse=True
+    )
+
+
+def callees(stats, func):
+    """``(callee, (cc, nc, tt, ct))`` for each function called by
+    ``func``, most expensive first
+    """
+    return sorted(
+        (
+            (callee, value[4][func]) for callee, value in stats.items()
+            if func in value[4]
+        ),
+        key=lambda item: item[1][3],
+        reverse=True
+    )
+
+
+def hot_paths(stats, func, limit=10, min_fraction=MIN_FRACTION,
+              max_depth=MAX_DEPTH):
+    """The ``limit`` most expensive call paths leading to ``func``, as
+    ``(path, seconds)``, where ``path`` is a tuple of function keys from
+    the root to ``func``, and ``seconds`` is the cumulative time of
+    ``func`` attributed to that path
+    """
+    total = stats[func][3]
+    threshold = total * min_fraction
+    paths = []
+
+    def walk(path, seconds):
+        edges = [
+            (caller, value[3]) for caller, value in stats[path[0]][4].items()
+            if caller not in path and caller in stats
+        ]
+        edge_total = sum(ct for dummy, ct in edges)
+        if not edges or not edge_total or len(path) > max_depth:
+            paths.append((path, seconds))
+            return
+        for caller, ct in edges:
+            share = seconds * ct / edge_total
+            if share >= threshold and share > 0:
+                walk((caller,) + path, share)
+
+    walk((func,), total)
+    paths.sort(key=lambda p: p[1], reverse=True)
+    if limit is not None and limit >= 0:
+        return paths[:limit]
+    return paths
+
+
+def _format_edges(out, title, edges):
+    out.write('  %s:\n' % title)
+    if not edges:
+        out.write('    (none)\n')
+        return
+    out.write('    %10s %10s %10s  function\n' % ('ncalls', 'tottime',
+                                                  'cumtime'))
+    for func, (cc, nc, tt, ct) in edges:
+        ncalls = str(nc) if nc == cc else '%d/%d' % (nc, cc)
+        out.write('    %10s %10.3f %10.3f  %s\n' % (ncalls, tt, ct,
+                                                    func_name(func)))
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(
+        prog='profile_callgraph',
+        description='Query a call graph exported by the '
+                    'sivel.toiletwater.cprofile callback'
+    )
+    parser.add_argument('path', help='Path to profile.callgraph.sqlite')
+    parser.add_argument(
+        'command',
+        choices=('top', 'callers', 'callees', 'paths'),
+        help='top lists the most expensive functions, callers and callees '
+             'list the functions calling and called by the matching '
+             'functions, and paths lists the most expensive call paths '
+             'leading to the matching functions'
+    )
+    parser.add_argument(
+        'pattern',
+        nargs='?',
+        default='',
+        help='Match functions whose filename:lineno(function) contains '
+             'this string'
+    )
+    parser.add_argument(
+        '--profile',
+        help='Only include profiles whose name contains this string'
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=10,
+        help='Maximum number of functions to show, and of callers, callees '
+             'or paths per function'
+    )
+    args = parser.parse_args(argv)
+
+    stats = load(args.path, profile=args.profile)
+    funcs = find(stats, args.pattern)
+    if not funcs:
+        sys.stderr.write('No functions matching %r\n' % args.pattern)
+        return 1
+    limit = args.limit if args.limit >= 0 else None
+    funcs = funcs[:limit]
+
+    if args.command == 'top':
+        _format_edges(out, 'functions', [
+            (func, tuple(stats[func][:4])) for func in funcs
+        ])
+        return 0
+
+    for func in funcs:
+        cc, nc, tt, ct = stats[func][:4]
+        out.write('%s  ncalls=%d tottime=%.3f cumtime=%.3f\n' % (
+            func_name(func), nc, tt, ct
+        ))
+        if args.command == 'callers':
+            _format_edges(out, 'called by', callers(stats, func)[:limit])
+        elif args.command == 'callees':
+            _format_edges(out, 'calls', callees(stats, func)[:limit])
+        else:
+            for path, seconds in hot_paths(stats, func, limit=limit):
+                out.write('  %10.3f %5.1f%%  %s\n' % (
+                    seconds,
+                    seconds / ct * 100 if ct else 0.0,
+                    ' -> '.join(func_name(f) for f in path)
+                ))
+        out.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Per function comparison of two ``pstats`` compatible dicts"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from collections import namedtuple
+
+# Map ``pstats`` sort keys to the index of the value compared
+METRICS = {
+    'calls': 1,
+    'ncalls': 1,
+    'time': 2,
+    'tottime': 2,
+    'cumulative': 3,
+    'cumtime': 3,
+}
+
+Delta = namedtuple(
+    'Delta',
+    ('func', 'ncalls', 'tottime', 'cumtime', 'base', 'absolute', 'relative')
+)
+
+
+def _pair(base, current):
+    """Pair each function in ``current`` with the same function in
+    ``base``, or ``None``, returning the pairs and the functions only in
+    ``base``. Functions are matched by ``(filename, funcname)``, so that
+    they survive unrelated edits above them, with ``lineno`` only used to
+    choose between functions of the same name in a file
+    """
+    unmatched = {}
+    for func in base:
+        if func not in current:
+            unmatched.setdefault((func[0], func[2]), []).append(func)
+    pairs = []
+    for func in sorted(current):
+        if func in base:
+            pairs.append((func, func))
+            continue
+        candidates = unmatched.get((func[0], func[2]))
+        if not candidates:
+            pairs.append((func, None))
+            continue
+        old = min(candidates, key=lambda c: (abs(c[1] - func[1]), c[1]))
+        candidates.remove(old)
+        pairs.append((func, old))
+    removed = [func for funcs in unmatched.values() for func in funcs]
+    return pairs, removed
+
+
+def diff_stats(base, current, metric='cumtime'):
+    """Compare ``current`` against ``base``, returning a ``Delta`` for
+    every function in either, matched as by ``_pair``. ``ncalls``,
+    ``tottime`` and ``cumtime`` are ``(current, change)`` pairs, and
+    ``absolute`` and ``relative`` are the change in ``metric``.
+    ``relative`` is ``None`` for functions not in ``base``
+    """
+    index = METRICS[metric]
+    empty = (0, 0, 0.0, 0.0, {})
+    pairs, removed = _pair(base, current)
+    deltas = []
+    for func, old in pairs + [(func, func) for func in removed]:
+        old = base[old] if old is not None else empty
+        new = current.get(func, empty)
+        absolute = new[index] - old[index]
+        deltas.append(Delta(
+            func,
+            (new[1], new[1] - old[1]),
+            (new[2], new[2] - old[2]),
+            (new[3], new[3] - old[3]),
+            old[index],
+            absolute,
+            absolute / old[index] if old[index] else None,
+        ))
+    return deltas
+
+
+def regressions(deltas, limit=-1, relative=False):
+    """Return ``deltas`` that regressed, sorted by the largest absolute or
+    relative change first
+    """
+    if relative:
+        key = 'relative'
+        deltas = [d for d in deltas if d.relative is not None]
+    else:
+        key = 'absolute'
+    ordered = sorted(
+        (d for d in deltas if getattr(d, key) > 0),
+        key=lambda d: (-getattr(d, key), d.func)
+    )
+    if limit is not None and limit >= 0:
+        return ordered[:limit]
+    return ordered
@@ -0,0 +1,358 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Export ``pstats`` compatible stats as collapsed stacks, speedscope JSON,
+Chrome trace event JSON and SQLite call graphs, and fork timelines as
+Chrome trace event JSON
+
+``pstats`` only records caller/callee pairs, not full stacks, so stacks are
+reconstructed by walking the call graph from the roots, and attributing time
+to each callee in proportion to the time its caller spent on that path.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+from collections import namedtuple
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_callgraph import (
+    CallGraphWriter,
+    func_name,
+)
+
+# Nodes accounting for less than this fraction of the total time are pruned
+MIN_FRACTION = 0.0005
+MAX_DEPTH = 128
+
+FORMATS = {
+    'collapsed': 'profile.collapsed',
+    'speedscope': 'profile.speedscope.json',
+    'chrome': 'profile.trace.json',
+    'timeline': 'timeline.trace.json',
+    'callgraph': 'profile.callgraph.sqlite',
+}
+
+# Formats written from stats, rather than from fork timelines
+STATS_FORMATS = frozenset(('collapsed', 'speedscope', 'chrome', 'callgraph'))
+
+# Formats written from stats, using the reconstructed call tree
+TREE_FORMATS = frozenset(('collapsed', 'speedscope', 'chrome'))
+
+Node = namedtuple('Node', ('func', 'total', 'self', 'children'))
+
+
+def build_tree(stats, min_fraction=MIN_FRACTION, max_depth=MAX_DEPTH):
+    """Reconstruct a call tree from ``stats``, returning a list of root
+    ``Node``
+    """
+    callees = {}
+    roots = []
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        root = True
+        for caller, value in callers.items():
+            if caller == func or caller not in stats:
+                continue
+            root = False
+            callees.setdefault(caller, []).append((func, value[3]))
+        if root:
+            roots.append(func)
+
+    roots.sort(key=lambda f: stats[f][3], reverse=True)
+    threshold = sum(stats[f][3] for f in roots) * min_fraction
+    stack = set()
+
+    def node(func, total, depth):
+        tt, ct = stats[func][2:4]
+        fraction = min(total / ct, 1.0) if ct else 0.0
+        children = []
+        if depth < max_depth:
+            stack.add(func)
+            for callee, edge_ct in callees.get(func, ()):
+                if callee in stack:
+                    continue
+                child_total = edge_ct * fraction
+                if child_total < threshold or child_total <= 0:
+                    continue
+                children.append(node(callee, child_total, depth + 1))
+            stack.discard(func)
+        children.sort(key=lambda n: n.total, reverse=True)
+        return Node(func, total, tt * fraction, children)
+
+    return [
+        node(func, stats[func][3], 0) for func in roots
+        if stats[func][3] >= threshold and stats[func][3] > 0
+    ]
+
+
+def iter_stacks(tree, prefix=()):
+    """Yield ``(stack, self_time)`` for every node in ``tree``, where
+    ``stack`` is a tuple of function keys from the root
+    """
+    for node in tree:
+        stack = prefix + (node.func,)
+        if node.self > 0:
+            yield stack, node.self
+        for item in iter_stacks(node.children, stack):
+            yield item
+
+
+class Exporter:
+    """Incrementally write profiles to ``path`` in each of ``formats``
+
+    Each call to ``add`` appends a single named profile, so that
+    ``per_host_task`` output does not need to be held in memory. Timeline
+    timestamps are relative to ``origin``.
+    """
+    def __init__(self, path, formats, origin=0.0):
+        self.path = path
+        self.formats = formats
+        self.origin = origin
+        if not os.path.isdir(path):
+            os.makedirs(path, mode=0o755)
+        self._files = {
+            fmt: open(os.path.join(path, FORMATS[fmt]), 'w')
+            for fmt in formats if fmt != 'callgraph'
+        }
+        if 'callgraph' in formats:
+            self._callgraph = CallGraphWriter(
+                os.path.join(path, FORMATS['callgraph'])
+            )
+        else:
+            self._callgraph = None
+        self._count = 0
+        # speedscope shares frames across all profiles
+        self._frames = {}
+        if 'speedscope' in self._files:
+            self._files['speedscope'].write(
+                '{"$schema": '
+                '"https://www.speedscope.app/file-format-schema.json", '
+                '"exporter": "sivel.toiletwater.cprofile", '
+                '"profiles": ['
+            )
+        if 'chrome' in self._files:
+            self._files['chrome'].write('{"traceEvents": [')
+        # host -> tid, and fork slots seen, for the timeline
+        self._hosts = {}
+        self._slots = set()
+        self._timeline_count = 0
+        if 'timeline' in self._files:
+            self._files['timeline'].write('{"traceEvents": [')
+            self._write_timeline([
+                {'name': 'process_name', 'ph': 'M', 'pid': 1, 'tid': 0,
+                 'args': {'name': 'Forks'}},
+                {'name': 'process_name', 'ph': 'M', 'pid': 2, 'tid': 0,
+                 'args': {'name': 'Hosts'}},
+            ])
+
+    def add(self, name, stats):
+        """Add the ``pstats`` compatible ``stats`` as a profile named
+        ``name``. Use a tuple for ``name`` to nest the profile under
+        multiple frames in collapsed output
+        """
+        if not STATS_FORMATS.intersection(self.formats):
+            return
+        if isinstance(name, str):
+            name = (name,)
+        if self._callgraph:
+            self._callgraph.add(' - '.join(name), stats)
+        if not TREE_FORMATS.intersection(self._files):
+            return
+        tree = build_tree(stats)
+        if 'collapsed' in self._files:
+            self._write_collapsed(name, tree)
+        if 'speedscope' in self._files:
+            self._write_speedscope(name, tree)
+        if 'chrome' in self._files:
+            self._write_chrome(name, tree)
+        self._count += 1
+
+    def _write_collapsed(self, name, tree):
+        f = self._files['collapsed']
+        prefix = ';'.join(n.replace(';', ':') for n in name)
+        for stack, seconds in iter_stacks(tree):
+            micros = int(round(seconds * 1000000))
+            if not micros:
+                continue
+            f.write('%s;%s %d\n' % (
+                prefix,
+                ';'.join(func_name(func).replace(';', ':') for func in stack),
+                micros
+            ))
+
+    def _frame(self, func):
+        try:
+            return self._frames[func]
+        except KeyError:
+            index = self._frames[func] = len(self._frames)
+            return index
+
+    def _write_speedscope(self, name, tree):
+        samples = []
+        weights = []
+        for stack, seconds in iter_stacks(tree):
+            samples.append([self._frame(func) for func in stack])
+            weights.append(seconds)
+        f = self._files['speedscope']
+        if self._count:
+            f.write(', ')
+        json.dump(
+            {
+                'type': 'sampled',
+                'name': ' - '.join(name),
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights,
+            },
+            f
+        )
+
+    def _write_chrome(self, name, tree):
+        f = self._files['chrome']
+        pid = self._count + 1
+        events = [{
+            'name': 'process_name',
+            'ph': 'M',
+            'pid': pid,
+            'tid': 0,
+            'args': {'name': ' - '.join(name)},
+        }]
+
+        def layout(nodes, start):
+            for node in nodes:
+                events.append({
+                    'name': node.func[2],
+                    'cat': 'function',
+                    'ph': 'X',
+                    'ts': start * 1000000,
+                    'dur': node.total * 1000000,
+                    'pid': pid,
+                    'tid': 0,
+                    'args': {
+                        'file': node.func[0],
+                        'line': node.func[1],
+                        'self': node.self,
+                    },
+                })
+                # Children are laid out back to back, and scaled to fit
+                # within their parent, as reconstructed times may not be
+                # perfectly consistent
+                children_total = sum(c.total for c in node.children)
+                if children_total > node.total and children_total:
+                    scale = node.total / children_total
+                    children = [
+                        c._replace(total=c.total * scale)
+                        for c in node.children
+                    ]
+                else:
+                    children = node.children
+                layout(children, start)
+                start += node.total
+
+        layout(tree, 0.0)
+        for event in events:
+            if self._count or event is not events[0]:
+                f.write(',\n')
+            json.dump(event, f)
+
+    def _write_timeline(self, events):
+        f = self._files['timeline']
+        for event in events:
+            if self._timeline_count:
+                f.write(',\n')
+            json.dump(event, f)
+            self._timeline_count += 1
+
+    def _span(self, name, cat, start, end, pid, tid, args=None):
+        return {
+            'name': name,
+            'cat': cat,
+            'ph': 'X',
+            'ts': (start - self.origin) * 1000000,
+            'dur': max(end - start, 0) * 1000000,
+            'pid': pid,
+            'tid': tid,
+            'args': args or {},
+        }
+
+    def add_timeline(self, meta):
+        """Add the timeline of a single fork, from the ``timeline`` key of
+        its profile ``meta``. Forks are laid out by fork slot, showing fork
+        startup, the task run and the time spent saving the profile, and
+        by host, showing the time each task waited for a free fork slot
+        """
+        if 'timeline' not in self._files or 'timeline' not in meta:
+            return
+        timeline = meta['timeline']
+        queued = timeline.get('queued')
+        spawned = timeline['spawned']
+        started = timeline['started']
+        finished = timeline['finished']
+        saved = timeline.get('saved')
+        name = '%(task_name)s - %(host)s' % meta
+        args = {
+            'play': meta['play'],
+            'task': meta['task_name'],
+            'task_uuid': meta['task_uuid'],
+            'host': meta['host'],
+            'pid': meta['pid'],
+        }
+
+        events = []
+        slot = timeline.get('slot')
+        slot = -1 if slot is None else slot
+        if slot not in self._slots:
+            self._slots.add(slot)
+            events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': slot + 1,
+                'args': {'name': 'Fork %d' % (slot + 1) if slot >= 0
+                         else 'Fork'},
+            })
+        try:
+            host = self._hosts[meta['host']]
+        except KeyError:
+            host = self._hosts[meta['host']] = len(self._hosts) + 1
+            events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': 2, 'tid': host,
+                'args': {'name': meta['host']},
+            })
+
+        events.append(
+            self._span('fork', 'fork', spawned, started, 1, slot + 1, args)
+        )
+        events.append(
+            self._span(name, 'run', started, finished, 1, slot + 1, args)
+        )
+        if saved is not None:
+            events.append(self._span(
+                'profile', 'profile', finished, saved, 1, slot + 1, args
+            ))
+        if queued is not None:
+            events.append(self._span(
+                'queue wait', 'queue', queued, spawned, 2, host, args
+            ))
+        events.append(
+            self._span(name, 'run', spawned, finished, 2, host, args)
+        )
+        self._write_timeline(events)
+
+    def close(self):
+        if 'speedscope' in self._files:
+            frames = sorted(self._frames, key=self._frames.__getitem__)
+            self._files['speedscope'].write(
+                '], "shared": {"frames": %s}}' % json.dumps([
+                    {'name': func[2], 'file': func[0], 'line': func[1]}
+                    for func in frames
+                ])
+            )
+        for fmt in ('chrome', 'timeline'):
+            if fmt in self._files:
+                self._files[fmt].write('], "displayTimeUnit": "ms"}')
+        for f in self._files.values():
+            f.close()
+        if self._callgraph:
+            self._callgraph.close()
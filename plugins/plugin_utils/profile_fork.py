@@ -0,0 +1,59 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Helpers for callbacks that record data from forks
+
+Forks are terminated as soon as a play ends, and results are sent to the
+controller before a fork has finished, so data written by a fork after
+running its task can be lost without these.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import contextlib
+import multiprocessing
+import os
+import signal
+import time
+
+from ansible.executor.process.worker import WorkerProcess
+
+# Seconds to wait for forks to finish writing at exit
+WORKER_TIMEOUT = 60
+
+
+@contextlib.contextmanager
+def defer_sigterm():
+    """Defer ``SIGTERM`` until the end of the block
+
+    Forks are terminated as soon as a play ends, which may be before they
+    have finished writing their profile
+    """
+    received = []
+    previous = signal.signal(
+        signal.SIGTERM,
+        lambda signum, frame: received.append(signum)
+    )
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+        if received:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+
+def wait_for_workers(timeout=WORKER_TIMEOUT):
+    """Wait up to ``timeout`` seconds in total for forks that are still
+    running, returning the pids of any that did not exit in time
+    """
+    deadline = time.monotonic() + timeout
+    alive = []
+    for child in multiprocessing.active_children():
+        if not isinstance(child, WorkerProcess):
+            continue
+        child.join(max(deadline - time.monotonic(), 0))
+        if child.is_alive():
+            alive.append(child.pid)
+    return alive
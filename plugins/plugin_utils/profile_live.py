@@ -0,0 +1,126 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Unix socket server for inspecting profiles while a playbook runs
+
+Each connection sends a single line request, and receives a text response
+before the connection is closed, for example::
+
+    echo 'sort=tottime limit=20' | nc -U /path/to/socket
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import errno
+import os
+import socket
+import stat
+import threading
+
+MAX_REQUEST = 4096
+
+
+def parse_request(line):
+    """Parse a request line of space separated ``key=value`` pairs into a
+    dict. Raises ``ValueError`` for malformed pairs
+    """
+    request = {}
+    for pair in line.split():
+        key, sep, value = pair.partition('=')
+        if not sep or not key:
+            raise ValueError('Invalid request %r, expected key=value' % pair)
+        request[key] = value
+    return request
+
+
+def _remove_stale(path):
+    """Remove a socket left behind at ``path`` by a previous run, raising
+    ``OSError`` if ``path`` is not a socket, or is still in use
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return
+        raise
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EEXIST, 'Not a socket', path)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except (IOError, OSError):
+        os.unlink(path)
+    else:
+        raise OSError(errno.EADDRINUSE, 'Socket in use', path)
+    finally:
+        probe.close()
+
+
+class LiveServer(threading.Thread):
+    """Serve the text returned by ``handler`` for each request over the
+    Unix socket at ``path``. ``handler`` is called with the parsed request
+    dict from this thread, one connection at a time
+    """
+    def __init__(self, path, handler, timeout=0.5):
+        super(LiveServer, self).__init__(
+            name='cprofile-live',
+            daemon=True
+        )
+        self.path = path
+        self._handler = handler
+        self._stop_event = threading.Event()
+        _remove_stale(path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o077)
+        try:
+            self._sock.bind(path)
+        finally:
+            os.umask(umask)
+        self._sock.listen(8)
+        self._sock.settimeout(timeout)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                conn, dummy = self._sock.accept()
+            except socket.timeout:
+                continue
+            except (IOError, OSError):
+                if self._stop_event.is_set():
+                    break
+                raise
+            try:
+                self._serve(conn)
+            except (IOError, OSError):
+                pass
+            finally:
+                conn.close()
+
+    def _serve(self, conn):
+        conn.settimeout(5)
+        data = b''
+        while b'\n' not in data and len(data) < MAX_REQUEST:
+            chunk = conn.recv(MAX_REQUEST)
+            if not chunk:
+                break
+            data += chunk
+        line = data.split(b'\n', 1)[0].decode('utf-8', 'replace')
+        try:
+            response = self._handler(parse_request(line))
+        except Exception as e:
+            # Never let a failed report stop the server, which would leave
+            # the socket bound with nothing accepting
+            response = 'ERROR: %s\n' % e
+        conn.sendall(response.encode('utf-8', 'surrogateescape'))
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self._sock.close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,120 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Allocation tracking with ``tracemalloc`` for the cprofile callback"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import heapq
+import itertools
+import resource
+import sys
+import tracemalloc
+
+_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+    # The profilers themselves, and the cprofile callback
+    tracemalloc.Filter(False, '*/cProfile.py'),
+    tracemalloc.Filter(False, '*/pstats.py'),
+    tracemalloc.Filter(False, '*/plugin_utils/profile_*.py'),
+    tracemalloc.Filter(False, '*/callback/cprofile.py'),
+)
+
+
+def start(reset=False):
+    """Start tracing allocations. If already tracing and ``reset`` is
+    ``True``, such as in a fork of a traced process, discard what has been
+    traced so far
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif reset:
+        tracemalloc.clear_traces()
+        tracemalloc.reset_peak()
+
+
+def peak_rss(children=False):
+    """Peak resident set size in bytes of this process, or of the largest
+    of its terminated children
+    """
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    maxrss = resource.getrusage(who).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss
+    return maxrss * 1024
+
+
+def collect(limit):
+    """Snapshot the current allocations, returning a JSON serializable
+    dict of the traced peak, peak RSS, and the ``limit`` largest allocation
+    sites as ``[filename, lineno, size, count]``
+    """
+    snapshot = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    dummy, peak = tracemalloc.get_traced_memory()
+    return {
+        'peak': peak,
+        'rss': peak_rss(),
+        'top': [
+            [
+                stat.traceback[0].filename,
+                stat.traceback[0].lineno,
+                stat.size,
+                stat.count,
+            ]
+            for stat in snapshot.statistics('lineno')[:limit]
+        ],
+    }
+
+
+class MemoryReport:
+    """Accumulate memory data from many forks, retaining only the
+    ``limit`` forks with the highest peak RSS, along with totals of
+    allocation sites across all forks
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.count = 0
+        self._heap = []
+        self._counter = itertools.count()
+        # (filename, lineno) -> [size, count]
+        self.sites = {}
+
+    def add(self, name, memory):
+        self.count += 1
+        item = (memory['rss'], next(self._counter), name, memory)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+        for filename, lineno, size, count in memory['top']:
+            try:
+                site = self.sites[(filename, lineno)]
+            except KeyError:
+                site = self.sites[(filename, lineno)] = [0, 0]
+            site[0] += size
+            site[1] += count
+
+    def forks(self):
+        """The retained forks, as ``(name, memory)``, highest peak RSS
+        first
+        """
+        return [
+            (name, memory) for dummy, dummy, name, memory
+            in sorted(self._heap, reverse=True)
+        ]
+
+    def top_sites(self):
+        """Allocation sites summed across all forks, as
+        ``[filename, lineno, size, count]``, largest first
+        """
+        return sorted(
+            ([f, l, s, c] for (f, l), (s, c) in self.sites.items()),
+            key=lambda site: site[2],
+            reverse=True
+        )[:self.limit]
@@ -0,0 +1,133 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Fixed size summaries of task durations, for the dump_metrics callback
+
+Memory used by each summary is independent of the number of values added,
+so that it stays constant regardless of the number of hosts.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import heapq
+import itertools
+import math
+
+
+class LogHistogram:
+    """Histogram of durations with logarithmic buckets, from ``low`` to
+    ``high`` seconds, each ``growth`` times wider than the last. Quantiles
+    are estimated to within half a bucket, about 4.5% with the default
+    ``growth``, and clamped to the minimum and maximum values added
+    """
+    def __init__(self, low=0.001, high=86400.0, growth=2 ** 0.125):
+        self.low = low
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        # Values below ``low`` go in the first bucket, and values above
+        # ``high`` in the last
+        self.buckets = [0] * (
+            int(math.ceil(math.log(high / low) / self._log_growth)) + 2
+        )
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self.low:
+            return 0
+        index = int(math.log(value / self.low) / self._log_growth) + 1
+        return min(index, len(self.buckets) - 1)
+
+    def add(self, value):
+        self.buckets[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimate the value at quantile ``q``, between 0 and 1, or
+        ``None`` if no values have been added
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                break
+        if index == 0:
+            estimate = self.min
+        elif index == len(self.buckets) - 1:
+            estimate = self.max
+        else:
+            # Geometric midpoint of the bucket
+            estimate = self.low * self.growth ** (index - 0.5)
+        return min(max(estimate, self.min), self.max)
+
+
+class SlowestHosts:
+    """The ``limit`` slowest hosts, by a single duration"""
+    def __init__(self, limit):
+        self.limit = limit
+        self._heap = []
+        self._counter = itertools.count()
+
+    def add(self, host, duration):
+        item = (duration, next(self._counter), host)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, item)
+        elif self.limit and item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def top(self):
+        """``(host, duration)``, slowest first"""
+        return [
+            (host, duration) for duration, dummy, host
+            in sorted(self._heap, reverse=True)
+        ]
+
+
+class HeavyHitters:
+    """Approximate the keys with the largest totals, using the Space-Saving
+    algorithm with ``capacity`` counters. When a key without a counter is
+    added and all counters are used, it replaces the smallest, inheriting
+    its total as an error bound, so a total may be overestimated by at most
+    its error, and any key whose total exceeds the smallest counter is
+    guaranteed a counter
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # key -> [total, error]
+        self.counters = {}
+
+    def add(self, key, value):
+        counters = self.counters
+        try:
+            counters[key][0] += value
+            return
+        except KeyError:
+            pass
+        if len(counters) < self.capacity:
+            counters[key] = [value, 0.0]
+            return
+        smallest = min(counters, key=lambda k: counters[k][0])
+        total = counters.pop(smallest)[0]
+        counters[key] = [total + value, total]
+
+    def top(self, limit):
+        """``(key, total, error)`` for the ``limit`` largest totals"""
+        return [
+            (key, total, error) for key, (total, error) in sorted(
+                self.counters.items(),
+                key=lambda item: item[1][0],
+                reverse=True
+            )[:limit]
+        ]
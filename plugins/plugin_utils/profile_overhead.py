@@ -0,0 +1,98 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Measure the cost of profiling, for the cprofile callback
+
+Forks record the time spent in each phase of profiling, which is
+accumulated by ``OverheadReport``. The time cProfile adds to every
+function call is estimated by ``calibrate``, in a similar manner to
+``profile.Profile.calibrate``.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import cProfile
+import time
+
+# Phases recorded by forks, in the order they occur
+PHASES = (
+    ('enable', 'profiler enable'),
+    ('disable', 'profiler disable'),
+    ('memory', 'memory snapshot'),
+    ('build', 'stats build'),
+    ('encode', 'stats encode'),
+    ('lock', 'store lock wait'),
+    ('write', 'store write'),
+)
+
+
+def _empty():
+    pass
+
+
+def _loop(iterations):
+    func = _empty
+    for dummy in range(iterations):
+        func()
+
+
+def calibrate(iterations=100000, repeat=3):
+    """Estimate the seconds cProfile adds to each function call, from the
+    best of ``repeat`` timings of ``iterations`` calls to an empty
+    function, with and without profiling. Must not be called while
+    another profiler is enabled
+    """
+    clock = time.perf_counter
+    plain = profiled = float('inf')
+    for dummy in range(repeat):
+        begin = clock()
+        _loop(iterations)
+        plain = min(plain, clock() - begin)
+
+        p = cProfile.Profile()
+        p.enable()
+        begin = clock()
+        _loop(iterations)
+        elapsed = clock() - begin
+        p.disable()
+        profiled = min(profiled, elapsed)
+    return max(profiled - plain, 0.0) / iterations
+
+
+class OverheadReport:
+    """Accumulate the profiling overhead recorded by forks"""
+    def __init__(self):
+        self.count = 0
+        # Function calls and seconds recorded by the profiles
+        self.calls = 0
+        self.total = 0.0
+        # phase -> [total, max]
+        self.phases = {}
+
+    def add(self, overhead, calls=0, total=0.0):
+        """Add the ``overhead`` of a single fork, a dict of phase to
+        seconds, along with the ``calls`` and ``total`` seconds of its
+        profile
+        """
+        self.count += 1
+        self.calls += calls
+        self.total += total
+        for phase, seconds in overhead.items():
+            try:
+                entry = self.phases[phase]
+            except KeyError:
+                entry = self.phases[phase] = [0.0, 0.0]
+            entry[0] += seconds
+            entry[1] = max(entry[1], seconds)
+
+    def rows(self):
+        """``(description, total, max)`` for each phase recorded, in the
+        order they occur
+        """
+        return [
+            (description,) + tuple(self.phases[phase])
+            for phase, description in PHASES
+            if phase in self.phases
+        ]
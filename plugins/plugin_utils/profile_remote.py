@@ -0,0 +1,126 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Profile AnsiballZ wrapped Python modules on managed hosts
+
+A profiling snippet is injected into the AnsiballZ wrapper, immediately
+before the module is run, in the same way that Ansible injects code
+coverage. At exit, the snippet writes the ``pstats`` compatible stats of
+the module to stdout as a single marker line following the module result,
+which is removed again before the result is parsed on the controller.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import base64
+import json
+import re
+import zlib
+
+MARKER = '#sivel.toiletwater.cprofile:'
+
+# Filenames of functions run on managed hosts are given this prefix, so
+# they are not merged with controller functions of the same name
+PREFIX = 'remote:'
+
+# Strips the temporary directory AnsiballZ extracts its payload to
+PAYLOAD_RE = re.compile(r'^.*?/ansible_[^/]*_payload\.zip/')
+
+RUN_MODULE_RE = re.compile(br'^( +)runpy\.run_module\(', re.M)
+
+# Runs under the Python of the managed host, which may be Python 2
+TEMPLATE = '''
+try:
+    import atexit as _cprofile_atexit
+    import base64 as _cprofile_base64
+    import cProfile as _cprofile
+    import json as _cprofile_json
+    import zlib as _cprofile_zlib
+except ImportError:
+    _cprofile = None
+
+if _cprofile is not None:
+    _cprofile_p = _cprofile.Profile()
+
+    def _cprofile_write():
+        _cprofile_p.disable()
+        _cprofile_p.create_stats()
+        stats = []
+        for (f, l, n), (cc, nc, tt, ct, callers) in _cprofile_p.stats.items():
+            stats.append([f, l, n, cc, nc, tt, ct, [
+                [cf, cl, cn] + list(value)
+                for (cf, cl, cn), value in callers.items()
+            ]])
+        data = _cprofile_zlib.compress(
+            _cprofile_json.dumps(stats).encode('utf-8')
+        )
+        sys.stdout.write('\\n%s%s\\n' % (
+            MARKER,
+            _cprofile_base64.b64encode(data).decode('ascii')
+        ))
+        sys.stdout.flush()
+
+    _cprofile_atexit.register(_cprofile_write)
+    _cprofile_p.enable()
+'''.replace('MARKER', repr(MARKER))
+
+
+def inject(b_module_data):
+    """Inject the profiling snippet into the AnsiballZ wrapper
+    ``b_module_data``, returning ``None`` if the wrapper is not recognized
+    """
+    match = RUN_MODULE_RE.search(b_module_data)
+    if not match:
+        return None
+    indent = match.group(1).decode('ascii')
+    snippet = ''.join(
+        '%s%s\n' % (indent, line) if line else '\n'
+        for line in TEMPLATE.splitlines()
+    ).encode('utf-8')
+    start = match.start()
+    return b_module_data[:start] + snippet + b_module_data[start:]
+
+
+def remote_name(filename):
+    """Rewrite a filename from a managed host, removing the temporary
+    AnsiballZ payload location so that the same function is merged across
+    hosts and tasks
+    """
+    return PREFIX + PAYLOAD_RE.sub('', filename)
+
+
+def extract(stdout):
+    """Remove the stats marker line from module ``stdout``, returning
+    ``(stdout, stats)``, where ``stats`` is a ``pstats`` compatible dict,
+    or ``None`` if no stats were found
+    """
+    index = stdout.rfind(MARKER)
+    if index == -1:
+        return stdout, None
+    end = stdout.find('\n', index)
+    if end == -1:
+        end = len(stdout)
+    encoded = stdout[index + len(MARKER):end]
+    stdout = stdout[:index].rstrip('\n') + stdout[end:]
+    try:
+        raw = json.loads(zlib.decompress(base64.b64decode(encoded)))
+    except (ValueError, TypeError, zlib.error):
+        return stdout, None
+
+    names = {}
+
+    def key(filename, lineno, name):
+        try:
+            filename = names[filename]
+        except KeyError:
+            filename = names[filename] = remote_name(filename)
+        return filename, lineno, name
+
+    stats = {}
+    for f, l, n, cc, nc, tt, ct, callers in raw:
+        stats[key(f, l, n)] = (cc, nc, tt, ct, {
+            key(*caller[:3]): tuple(caller[3:]) for caller in callers
+        })
+    return stdout, stats
@@ -0,0 +1,187 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Roll up ``pstats`` compatible stats into Ansible subsystems
+
+Functions outside of any subsystem, such as builtins and the standard
+library, are attributed to the subsystem of their most expensive caller,
+or to ``other`` when none is found within ``MAX_DEPTH`` callers.
+Cumulative time is the time spent in calls
+entering a subsystem from outside of it, which may count time more than
+once when subsystems call back into each other.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+OTHER = 'other'
+
+# Callers followed to attribute a function outside of any subsystem, before
+# giving up
+MAX_DEPTH = 100
+
+# Checked in order, the first match wins. Each rule is a path fragment,
+# and optionally a tuple of function names within matching paths
+SUBSYSTEMS = (
+    ('remote modules', ('remote:',)),
+    ('sivel.toiletwater', ('/ansible_collections/sivel/toiletwater/',)),
+    ('module transfer', (
+        ('/ansible/plugins/action/__init__.py', (
+            '_transfer_data', '_transfer_file', '_low_level_execute_command',
+            '_fixup_perms2', '_make_tmp_path', '_remove_tmp_path',
+        )),
+        '/ansible/plugins/shell/',
+    )),
+    ('module build', (
+        '/ansible/executor/module_common.py',
+        '/ansible/executor/powershell/',
+        '/ansible/executor/interpreter_discovery.py',
+        ('/ansible/plugins/action/__init__.py', ('_configure_module',)),
+    )),
+    ('connection', (
+        '/ansible/plugins/connection/', '/ansible/plugins/become/',
+        '/paramiko/',
+    )),
+    ('templating', (
+        '/ansible/template/', '/ansible/_internal/_templating/', '/jinja2/',
+        '/markupsafe/',
+    )),
+    ('lookups', ('/ansible/plugins/lookup/', '/plugins/lookup/')),
+    ('filters and tests', (
+        '/ansible/plugins/filter/', '/ansible/plugins/test/',
+        '/plugins/filter/', '/plugins/test/',
+    )),
+    ('strategy', (
+        '/ansible/plugins/strategy/',
+        '/ansible/executor/task_queue_manager.py',
+        '/ansible/executor/play_iterator.py',
+    )),
+    ('action plugins', ('/ansible/plugins/action/', '/plugins/action/')),
+    ('task execution', (
+        '/ansible/executor/task_executor.py', '/ansible/executor/process/',
+        '/ansible/executor/task_result.py',
+    )),
+    ('callbacks', ('/ansible/plugins/callback/', '/plugins/callback/')),
+    ('vars', ('/ansible/vars/', '/ansible/plugins/vars/')),
+    ('inventory', ('/ansible/inventory/', '/ansible/plugins/inventory/')),
+    ('plugin loader', (
+        '/ansible/plugins/loader.py', '/ansible/utils/collection_loader/',
+    )),
+    ('parsing', ('/ansible/parsing/', '/yaml/')),
+    ('playbook objects', ('/ansible/playbook/',)),
+    ('ansible', ('/ansible/',)),
+)
+
+
+class Classifier:
+    """Classify function keys into subsystems, caching the result for each
+    unique key. ``extra`` subsystems, as ``{name: [fragment, ...]}``, are
+    checked before the defaults
+    """
+    def __init__(self, extra=None):
+        self.subsystems = tuple(
+            (name, tuple(fragments))
+            for name, fragments in (extra or {}).items()
+        ) + SUBSYSTEMS
+        self._cache = {}
+
+    def __call__(self, func):
+        try:
+            return self._cache[func]
+        except KeyError:
+            pass
+        filename = func[0].replace('\\', '/')
+        found = OTHER
+        for name, rules in self.subsystems:
+            for rule in rules:
+                if isinstance(rule, tuple):
+                    fragment, functions = rule
+                    if fragment in filename and func[2] in functions:
+                        break
+                elif rule in filename:
+                    break
+            else:
+                continue
+            found = name
+            break
+        self._cache[func] = found
+        return found
+
+
+def rollup(stats, classify, key=None):
+    """Roll up ``stats`` by subsystem using ``classify``, a callable that
+    maps a function key to a subsystem name. ``key`` maps the keys of
+    ``stats`` to function keys, for stats keyed by function key id.
+    Returns ``(totals, total)``, where ``totals`` maps subsystem to
+    ``[self, cumulative]``, and ``total`` is the total self time
+    """
+    key = key or (lambda func: func)
+    subsystems = {}
+
+    def subsystem(func):
+        # Follow the chain of most expensive callers until a function in a
+        # subsystem is found, skipping callers already in the chain. Only
+        # results that did not depend on the chain are cached, along with
+        # the number of callers followed
+        try:
+            return subsystems[func][0]
+        except KeyError:
+            pass
+        chain = [func]
+        seen = {func}
+        cyclic = False
+        while True:
+            current = chain[-1]
+            try:
+                name, depth = subsystems[current]
+            except KeyError:
+                pass
+            else:
+                depth += len(chain) - 1
+                break
+            depth = len(chain) - 1
+            name = classify(key(current))
+            if name != OTHER or current not in stats:
+                break
+            callers = []
+            for caller, value in stats[current][4].items():
+                if caller in seen:
+                    cyclic = cyclic or caller != current
+                    continue
+                callers.append((value[3], caller))
+            if not callers:
+                break
+            if depth == MAX_DEPTH:
+                # Too deep to resolve
+                return OTHER
+            caller = max(callers)[1]
+            chain.append(caller)
+            seen.add(caller)
+        if depth > MAX_DEPTH:
+            return OTHER
+        if not cyclic:
+            for i, current in enumerate(chain):
+                subsystems[current] = (name, depth - i)
+        return name
+
+    totals = {}
+    total = 0.0
+    for func, (cc, nc, tt, ct, callers) in stats.items():
+        total += tt
+        name = subsystem(func)
+        try:
+            entry = totals[name]
+        except KeyError:
+            entry = totals[name] = [0.0, 0.0]
+        entry[0] += tt
+        entered = False
+        for caller, value in callers.items():
+            if caller == func:
+                continue
+            entered = True
+            if subsystem(caller) != name:
+                entry[1] += value[3]
+        if not entered:
+            entry[1] += ct
+    return totals, total
@@ -0,0 +1,156 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Statistical stack sampling profiler
+
+Provides the subset of the ``cProfile.Profile`` interface used by
+``pstats`` and the cprofile callback, so that it can be used in place of
+``cProfile.Profile`` where the overhead of deterministic profiling is too
+high.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import sys
+import threading
+import time
+
+_ACTIVE = None
+
+
+def active():
+    """Return the most recently enabled ``SamplingProfiler`` that is still
+    running, or ``None``
+    """
+    if _ACTIVE is not None and _ACTIVE.running:
+        return _ACTIVE
+    return None
+
+
+class SamplingProfiler:
+    """Samples the stack of the thread that called ``enable`` every
+    ``interval`` seconds from a background thread.
+
+    The resulting ``stats`` are ``pstats`` compatible, where the number
+    of calls is the number of samples that a function was seen in, and
+    times are the wall clock time attributed to those samples. C functions
+    do not have frames, and as such are attributed to their caller.
+    """
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stats = {}
+        # stack of code objects, leaf first -> [samples, seconds]
+        self._samples = {}
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def enable(self):
+        global _ACTIVE
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(),),
+            name='cprofile-sampler',
+            daemon=True
+        )
+        self._thread.start()
+        _ACTIVE = self
+
+    def disable(self):
+        if not self.running:
+            return
+        self._stop_event.set()
+        self._thread.join()
+
+    def _sample(self, ident):
+        current_frames = sys._current_frames
+        samples = self._samples
+        wait = self._stop_event.wait
+        interval = self.interval
+        clock = time.perf_counter
+        last = clock()
+        while not wait(interval):
+            frame = current_frames().get(ident)
+            now = clock()
+            if frame is None:
+                # target thread has exited
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack = tuple(stack)
+            try:
+                sample = samples[stack]
+            except KeyError:
+                sample = samples[stack] = [0, 0.0]
+            sample[0] += 1
+            sample[1] += now - last
+            last = now
+
+    def create_stats(self):
+        self.disable()
+        self.snapshot_stats()
+
+    def snapshot_stats(self):
+        """Build ``stats`` from the samples collected so far, this is safe
+        to call while sampling is still running
+        """
+        stats = {}
+        keys = {}
+
+        def key(code):
+            try:
+                return keys[code]
+            except KeyError:
+                k = keys[code] = (
+                    code.co_filename,
+                    code.co_firstlineno,
+                    code.co_name
+                )
+                return k
+
+        for stack, (count, seconds) in list(self._samples.items()):
+            funcs = [key(code) for code in stack]
+            seen = set()
+            edges = set()
+            for i, func in enumerate(funcs):
+                leaf = i == 0
+                try:
+                    entry = stats[func]
+                except KeyError:
+                    entry = stats[func] = [0, 0, 0.0, 0.0, {}]
+                if leaf:
+                    entry[2] += seconds
+                if func not in seen:
+                    # recursive frames only count once per sample
+                    seen.add(func)
+                    entry[0] += count
+                    entry[1] += count
+                    entry[3] += seconds
+                try:
+                    caller = funcs[i + 1]
+                except IndexError:
+                    continue
+                if (caller, func) in edges:
+                    continue
+                edges.add((caller, func))
+                cc, nc, tt, ct = entry[4].get(caller, (0, 0, 0.0, 0.0))
+                entry[4][caller] = (
+                    cc + count,
+                    nc + count,
+                    tt + (seconds if leaf else 0.0),
+                    ct + seconds,
+                )
+
+        self.stats = {
+            func: tuple(value) for func, value in stats.items()
+        }
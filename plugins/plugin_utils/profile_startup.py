@@ -0,0 +1,247 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Startup timing for the cprofile inventory and callback plugins
+
+Started by the cprofile inventory plugin, as the earliest point that
+collection code runs. Records module import times, in the manner of
+``python -X importtime``, time spent in plugin loader lookups, and
+timestamps of startup milestones, which are reported by the cprofile
+callback. Recording ends, and the hooks are uninstalled, when the first
+task starts.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import functools
+import importlib._bootstrap
+import inspect
+import os
+import time
+
+# Milestones in the order they are reached
+MILESTONES = (
+    ('process', 'interpreter startup and imports'),
+    ('inventory_plugin', 'inventory parsing'),
+    ('inventory', 'playbook loading'),
+    ('playbook', 'play setup'),
+    ('first_task', None),
+)
+
+_TIMER = None
+
+
+def process_start():
+    """Wall clock time the current process started, or ``None`` if it
+    cannot be determined
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            # The command name may contain spaces, and is in parens
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/stat') as f:
+            btime = next(
+                int(line.split()[1]) for line in f
+                if line.startswith('btime ')
+            )
+    except (IOError, OSError, IndexError, StopIteration, ValueError):
+        return None
+    # starttime is field 22, the first 2 fields were split off above
+    return btime + int(fields[19]) / os.sysconf('SC_CLK_TCK')
+
+
+def active():
+    """Return the running ``StartupTimer``, or ``None``"""
+    return _TIMER
+
+
+def start():
+    """Start the ``StartupTimer``, if not already started"""
+    global _TIMER
+    if _TIMER is None:
+        _TIMER = StartupTimer()
+        _TIMER.install()
+    return _TIMER
+
+
+def stop():
+    """Stop and discard the ``StartupTimer``"""
+    global _TIMER
+    if _TIMER is not None:
+        _TIMER.uninstall()
+        _TIMER = None
+
+
+class StartupTimer:
+    """Records import times, plugin loader time and startup milestones"""
+    def __init__(self):
+        self.marks = {
+            'process': process_start(),
+            'inventory_plugin': time.time(),
+        }
+        # module name -> [self, cumulative]
+        self.imports = {}
+        # loader -> [calls, seconds]
+        self.loaders = {}
+        self._stack = []
+        self._loader_depth = 0
+        self._patched = []
+        self._recording = True
+
+    def mark(self, name):
+        """Record the time of milestone ``name``, only the first time it
+        is reached. Reaching the last milestone ends startup
+        """
+        if name in self.marks:
+            return
+        self.marks[name] = time.time()
+        if name == MILESTONES[-1][0]:
+            self.finish()
+
+    def finish(self):
+        """Uninstall the hooks, keeping what was recorded up to now"""
+        self.uninstall()
+        # Imports and lookups that are still running when the hooks are
+        # uninstalled are not recorded
+        self._recording = False
+
+    def phases(self):
+        """Return ``(description, seconds)`` for each startup phase whose
+        start and end milestones were both reached
+        """
+        phases = []
+        for (begin, description), (end, dummy) in zip(MILESTONES,
+                                                      MILESTONES[1:]):
+            if self.marks.get(begin) and self.marks.get(end):
+                phases.append(
+                    (description, self.marks[end] - self.marks[begin])
+                )
+        return phases
+
+    def top_imports(self, limit):
+        """The ``limit`` slowest imports by cumulative time, as
+        ``(name, self, cumulative)``
+        """
+        ordered = sorted(
+            ((name, s, c) for name, (s, c) in self.imports.items()),
+            key=lambda i: i[2],
+            reverse=True
+        )
+        if limit is not None and limit >= 0:
+            return ordered[:limit]
+        return ordered
+
+    def _patch(self, obj, name, wrapper):
+        original = getattr(obj, name)
+        setattr(obj, name, functools.wraps(original)(wrapper(original)))
+        self._patched.append((obj, name, original))
+
+    def install(self):
+        self._patch(importlib._bootstrap, '_find_and_load', self._time_import)
+        # Imported here, to leave as little as possible imported before
+        # the import hook is installed
+        from ansible.inventory.data import InventoryData
+        from ansible.plugins import loader
+
+        self._patch(InventoryData, 'reconcile_inventory', self._mark_inventory)
+        for cls in (loader.PluginLoader, getattr(loader, 'Jinja2Loader', None)):
+            if cls is None:
+                continue
+            for name in ('find_plugin_with_context', 'get_with_context',
+                         'all'):
+                if name in vars(cls):
+                    self._patch(cls, name, self._time_loader)
+
+    def uninstall(self):
+        while self._patched:
+            obj, name, original = self._patched.pop()
+            setattr(obj, name, original)
+
+    def _time_import(self, func):
+        clock = time.perf_counter
+
+        def inner(name, *args, **kwargs):
+            stack = self._stack
+            stack.append(0.0)
+            begin = clock()
+            try:
+                return func(name, *args, **kwargs)
+            finally:
+                elapsed = clock() - begin
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                if self._recording:
+                    try:
+                        entry = self.imports[name]
+                    except KeyError:
+                        entry = self.imports[name] = [0.0, 0.0]
+                    entry[0] += elapsed - children
+                    entry[1] += elapsed
+
+        return inner
+
+    def _record_loader(self, loader, elapsed, calls=1):
+        if not self._recording:
+            return
+        name = loader.package.rsplit('.', 1)[-1]
+        try:
+            entry = self.loaders[name]
+        except KeyError:
+            entry = self.loaders[name] = [0, 0.0]
+        entry[0] += calls
+        entry[1] += elapsed
+
+    def _time_loader(self, func):
+        clock = time.perf_counter
+
+        if inspect.isgeneratorfunction(func):
+            # Time each step of the generator, excluding the time spent by
+            # the consumer between steps
+            def inner(loader, *args, **kwargs):
+                iterator = func(loader, *args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        nested = self._loader_depth
+                        self._loader_depth += 1
+                        begin = clock()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            return
+                        finally:
+                            if not nested:
+                                elapsed += clock() - begin
+                            self._loader_depth -= 1
+                        yield item
+                finally:
+                    self._record_loader(loader, elapsed)
+
+            return inner
+
+        def inner(loader, *args, **kwargs):
+            # Only the outermost lookup is timed, as loaders call each
+            # other
+            if self._loader_depth:
+                return func(loader, *args, **kwargs)
+            self._loader_depth += 1
+            begin = clock()
+            try:
+                return func(loader, *args, **kwargs)
+            finally:
+                self._loader_depth -= 1
+                self._record_loader(loader, clock() - begin)
+
+        return inner
+
+    def _mark_inventory(self, func):
+        def inner(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.mark('inventory')
+
+        return inner
@@ -0,0 +1,326 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Compact append-only store for profile data written by forks
+
+The store is a single file shared by all forks. Each fork appends its
+records with a single ``write`` while holding an exclusive lock, and the
+controller reads records back via ``mmap``.
+
+Layout::
+
+    MAGIC
+    record*
+
+    record   = type:char length:uint32 payload
+    'K'      = id:uint64 lineno:uint32 filename_len:uint16 filename funcname
+    'P'      = meta_len:uint32 count:uint32 meta:json entry*
+    'M'      = meta:json
+    entry    = id:uint64 cc:uint32 nc:uint32 tt:double ct:double
+               ncallers:uint32 caller*
+    caller   = id:uint64 cc:uint32 nc:uint32 tt:double ct:double
+
+An ``'M'`` record holds updates to the meta of the profile record before
+it, written under the same lock, for values only known once that record
+has been written.
+
+Function keys (``(filename, lineno, funcname)``) are interned as a 64bit
+hash, and only written to the store the first time they are seen. As forks
+inherit the keys already read by the controller, most records consist of
+nothing but fixed width counters.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b'TWPS\x01'
+
+RECORD = struct.Struct('<cI')
+KEY = struct.Struct('<QIH')
+PROFILE = struct.Struct('<II')
+ENTRY = struct.Struct('<QIIddI')
+CALLER = struct.Struct('<QIIdd')
+
+KEY_RECORD = b'K'
+PROFILE_RECORD = b'P'
+META_RECORD = b'M'
+
+
+def key_id(func):
+    """Return the 64bit id used to intern a function key"""
+    digest = hashlib.blake2b(
+        ('%s\0%d\0%s' % func).encode('utf-8', 'surrogateescape'),
+        digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def add_entries(target, entries):
+    """Merge ``entries`` into ``target``, both keyed by function key id.
+    Mirrors ``pstats.Stats.add``
+    """
+    for fid, (cc, nc, tt, ct, callers) in entries.items():
+        try:
+            old = target[fid]
+        except KeyError:
+            target[fid] = [cc, nc, tt, ct, dict(callers)]
+            continue
+        old[0] += cc
+        old[1] += nc
+        old[2] += tt
+        old[3] += ct
+        old_callers = old[4]
+        for cid, value in callers.items():
+            try:
+                old_value = old_callers[cid]
+            except KeyError:
+                old_callers[cid] = value
+            else:
+                old_callers[cid] = tuple(
+                    i[0] + i[1] for i in zip(old_value, value)
+                )
+    return target
+
+
+def _update_meta(meta, update):
+    for key, value in update.items():
+        if isinstance(value, dict) and isinstance(meta.get(key), dict):
+            meta[key].update(value)
+        else:
+            meta[key] = value
+
+
+def reduce_range(path, start, stop):
+    """Merge the entries of the profile records in the store at ``path``
+    between the ``start`` and ``stop`` offsets, keyed by function key id.
+    Suitable for running in a separate process
+    """
+    merged = {}
+    for dummy, meta, entries in ProfileStore(path).records(start, stop=stop):
+        add_entries(merged, entries)
+    return merged
+
+
+class ProfileStore:
+    """Reader and writer for the profile store at ``path``"""
+    def __init__(self, path):
+        self.path = path
+        # id -> function key, and the reverse
+        self.keys = {}
+        self._ids = {}
+        self.end = len(MAGIC)
+
+    def create(self):
+        """Create the store, should be called by the controller before
+        any forks attempt to append to it
+        """
+        with open(self.path, 'wb') as f:
+            f.write(MAGIC)
+
+    def _intern(self, func, buf):
+        try:
+            return self._ids[func]
+        except KeyError:
+            pass
+        fid = key_id(func)
+        self._ids[func] = fid
+        if fid not in self.keys:
+            self.keys[fid] = func
+            filename = func[0].encode('utf-8', 'surrogateescape')
+            funcname = func[2].encode('utf-8', 'surrogateescape')
+            payload = b''.join((
+                KEY.pack(fid, func[1], len(filename)),
+                filename,
+                funcname,
+            ))
+            buf += RECORD.pack(KEY_RECORD, len(payload))
+            buf += payload
+        return fid
+
+    def append(self, stats, meta, timing=None):
+        """Append a record of ``stats``, a ``pstats`` compatible dict,
+        along with JSON serializable ``meta``. If given, ``timing`` is the
+        key of a dict within ``meta`` that the seconds spent encoding
+        ``stats``, waiting for the lock, and writing the record are added
+        to, as ``encode``, ``lock`` and ``write``
+        """
+        clock = time.perf_counter
+        begin = clock()
+        buf = bytearray()
+        entries = bytearray()
+        stats = stats or {}
+        intern = self._intern
+        for func, (cc, nc, tt, ct, callers) in stats.items():
+            entries += ENTRY.pack(intern(func, buf), cc, nc, tt, ct,
+                                  len(callers))
+            for caller, value in callers.items():
+                entries += CALLER.pack(intern(caller, buf), *value)
+
+        if timing is not None:
+            meta[timing]['encode'] = clock() - begin
+        b_meta = json.dumps(meta).encode('utf-8')
+        header = PROFILE.pack(len(b_meta), len(stats))
+        buf += RECORD.pack(
+            PROFILE_RECORD,
+            len(header) + len(b_meta) + len(entries)
+        )
+        buf += header
+        buf += b_meta
+        buf += entries
+
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+        try:
+            begin = clock()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            locked = clock()
+            self._write(fd, buf)
+            if timing is not None:
+                update = {
+                    'lock': locked - begin,
+                    'write': clock() - locked,
+                }
+                meta[timing].update(update)
+                b_update = json.dumps({timing: update}).encode('utf-8')
+                self._write(
+                    fd,
+                    RECORD.pack(META_RECORD, len(b_update)) + b_update
+                )
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _write(fd, buf):
+        view = memoryview(buf)
+        while view:
+            view = view[os.write(fd, view):]
+
+    def _map(self):
+        with open(self.path, 'rb') as f:
+            # Writers hold an exclusive lock for the duration of a write,
+            # so the size seen here always lands on a record boundary
+            fcntl.flock(f, fcntl.LOCK_SH)
+            try:
+                size = os.fstat(f.fileno()).st_size
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            if size <= len(MAGIC):
+                return None, size
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ), size
+
+    def _read_key(self, mm, offset, end):
+        fid, lineno, length = KEY.unpack_from(mm, offset)
+        offset += KEY.size
+        filename = mm[offset:offset + length].decode(
+            'utf-8',
+            'surrogateescape'
+        )
+        funcname = mm[offset + length:end].decode('utf-8', 'surrogateescape')
+        func = (filename, lineno, funcname)
+        self.keys[fid] = func
+        self._ids[func] = fid
+
+    def records(self, offset=None, entries=True, stop=None):
+        """Yield ``(offset, meta, entries)`` for each profile record
+        starting at ``offset``, and before ``stop`` if given, with
+        ``entries`` keyed by function key id.
+
+        Function keys read along the way are added to ``keys``. The offset
+        of the end of the last record read is available as ``end`` after
+        iterating.
+        """
+        offset = offset or len(MAGIC)
+        self.end = offset
+        mm, size = self._map()
+        if mm is None:
+            return
+        if stop is not None:
+            size = min(size, stop)
+        try:
+            while offset + RECORD.size <= size:
+                record_offset = offset
+                rtype, length = RECORD.unpack_from(mm, offset)
+                start = offset + RECORD.size
+                offset = start + length
+                if rtype == KEY_RECORD:
+                    self._read_key(mm, start, offset)
+                    self.end = offset
+                elif rtype == PROFILE_RECORD:
+                    meta_len, count = PROFILE.unpack_from(mm, start)
+                    start += PROFILE.size
+                    meta = json.loads(mm[start:start + meta_len])
+                    if entries:
+                        data = self._read_entries(
+                            mm,
+                            start + meta_len,
+                            count
+                        )
+                    else:
+                        data = None
+                    offset = self._read_meta(mm, offset, size, meta)
+                    self.end = offset
+                    yield record_offset, meta, data
+                elif rtype == META_RECORD:
+                    # Belongs to a profile record before ``offset``
+                    self.end = offset
+        finally:
+            mm.close()
+
+    def _read_meta(self, mm, offset, size, meta):
+        if offset + RECORD.size > size:
+            return offset
+        rtype, length = RECORD.unpack_from(mm, offset)
+        start = offset + RECORD.size
+        if rtype != META_RECORD or start + length > size:
+            return offset
+        _update_meta(meta, json.loads(mm[start:start + length]))
+        return start + length
+
+    def _read_entries(self, mm, offset, count):
+        entries = {}
+        entry_unpack = ENTRY.unpack_from
+        caller_unpack = CALLER.unpack_from
+        entry_size = ENTRY.size
+        caller_size = CALLER.size
+        for dummy in range(count):
+            fid, cc, nc, tt, ct, ncallers = entry_unpack(mm, offset)
+            offset += entry_size
+            callers = {}
+            for dummy in range(ncallers):
+                cid, ccc, cnc, ctt, cct = caller_unpack(mm, offset)
+                offset += caller_size
+                callers[cid] = (ccc, cnc, ctt, cct)
+            entries[fid] = (cc, nc, tt, ct, callers)
+        return entries
+
+    def read(self, offset):
+        """Return ``(meta, entries)`` for the single profile record at
+        ``offset``
+        """
+        for dummy, meta, entries in self.records(offset):
+            return meta, entries
+        raise ValueError('No profile record at offset %d' % offset)
+
+    def resolve(self, entries):
+        """Convert ``entries`` keyed by function key id into a ``pstats``
+        compatible dict keyed by function key
+        """
+        keys = self.keys
+        return {
+            keys[fid]: (
+                cc,
+                nc,
+                tt,
+                ct,
+                {keys[cid]: value for cid, value in callers.items()}
+            )
+            for fid, (cc, nc, tt, ct, callers) in entries.items()
+        }
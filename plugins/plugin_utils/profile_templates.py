@@ -0,0 +1,234 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""Per template timing for the template_profile callback
+
+Records, for each unique template string or file, the number of times it
+was rendered and compiled, and the time spent in both. Templates are
+rendered by ``Templar.template``, rather than ``Templar.do_template``,
+which newer ansible-core deprecates and no longer calls, and files loaded
+by Jinja, such as includes and imports, by ``Environment._load_template``.
+Compiles are counted in ``Environment.compile``, and attributed to the
+template being rendered or loaded. A template that ``Templar.template``
+resolves without Jinja, such as a single variable, is a render without a
+compile.
+
+A compile of a source that was already compiled by the same process, or
+by the controller before a fork started, is counted as a recompile, that
+a cache of compiled templates would have avoided.
+"""
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import functools
+import time
+
+STRING = 'string'
+FILE = 'file'
+
+# Columns of ``rows``
+COLUMNS = (
+    'kind', 'name', 'renders', 'compiles', 'recompiles', 'self',
+    'cumulative', 'compile',
+)
+
+# Sort keys, and the index of the value in a row sorted by
+SORTS = {
+    'renders': 2,
+    'compiles': 3,
+    'recompiles': 4,
+    'self': 5,
+    'cumulative': 6,
+    'compile': 7,
+}
+
+
+class TemplateTracker:
+    """Records render and compile counts and times per template"""
+    def __init__(self):
+        # (kind, name) -> [renders, compiles, recompiles, self, cumulative,
+        #                  compile]
+        self.templates = {}
+        # [key, templar, children, wrapped] for each render or load in
+        # progress
+        self._stack = []
+        # Hashes of sources compiled by this process
+        self._compiled = set()
+        self._patched = []
+        self._template = None
+
+    def reset(self):
+        """Discard the recorded counts and times, but not the record of
+        sources already compiled
+        """
+        self.templates = {}
+
+    def _entry(self, key):
+        try:
+            return self.templates[key]
+        except KeyError:
+            entry = self.templates[key] = [0, 0, 0, 0.0, 0.0, 0.0]
+            return entry
+
+    def rows(self):
+        """The recorded templates as JSON serializable lists, of
+        ``COLUMNS``
+        """
+        return [list(key) + entry for key, entry in self.templates.items()]
+
+    def _patch(self, obj, name, wrapper):
+        original = getattr(obj, name)
+        setattr(obj, name, functools.wraps(original)(wrapper(original)))
+        self._patched.append((obj, name, original))
+
+    def install(self):
+        from ansible.template import Templar
+        from jinja2.environment import Environment
+
+        self._template = Templar.template
+        self._patch(Templar, 'template', self._time_render)
+        # Still called directly by the template action of older
+        # ansible-core
+        if hasattr(Templar, 'do_template'):
+            self._patch(Templar, 'do_template', self._time_do_template)
+        self._patch(Environment, '_load_template', self._time_load)
+        self._patch(Environment, 'compile', self._time_compile)
+
+    def uninstall(self):
+        while self._patched:
+            obj, name, original = self._patched.pop()
+            setattr(obj, name, original)
+
+    def _time(self, key, templar, func, *args, **kwargs):
+        clock = time.perf_counter
+        stack = self._stack
+        frame = [key, templar, 0.0, func]
+        stack.append(frame)
+        begin = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = clock() - begin
+            stack.pop()
+            if stack:
+                stack[-1][2] += elapsed
+            entry = self._entry(key)
+            entry[0] += 1
+            entry[3] += elapsed - frame[2]
+            entry[4] += elapsed
+
+    def _render_key(self, templar, data):
+        # A file rendered by the template action or lookup, with a
+        # templar of its own that has the file in its variables
+        stack = self._stack
+        if not stack or stack[-1][1] is not templar:
+            try:
+                path = templar.available_variables.get('template_path')
+            except AttributeError:
+                path = None
+            if path:
+                return (FILE, path)
+        return (STRING, data)
+
+    def _time_render(self, func):
+        def inner(templar, data, *args, **kwargs):
+            # Containers are templated by calling ``template`` for each
+            # item, and strings that are not templates are returned as is
+            convert_bare = kwargs.get('convert_bare', args[:1] == (True,))
+            if not isinstance(data, str) or not (
+                    convert_bare or _possibly_template(templar, data)):
+                return func(templar, data, *args, **kwargs)
+            return self._time(self._render_key(templar, data), templar, func,
+                              templar, data, *args, **kwargs)
+
+        return inner
+
+    def _time_do_template(self, func):
+        def inner(templar, data, *args, **kwargs):
+            # Already timed when called by ``template``
+            stack = self._stack
+            if (stack and stack[-1][1] is templar
+                    and stack[-1][3] is self._template):
+                return func(templar, data, *args, **kwargs)
+            return self._time(self._render_key(templar, data), templar, func,
+                              templar, data, *args, **kwargs)
+
+        return inner
+
+    def _time_load(self, func):
+        def inner(env, name, *args, **kwargs):
+            stack = self._stack
+            templar = stack[-1][1] if stack else None
+            return self._time((FILE, name), templar, func, env, name, *args,
+                              **kwargs)
+
+        return inner
+
+    def _time_compile(self, func):
+        clock = time.perf_counter
+
+        def inner(env, source, name=None, filename=None, *args, **kwargs):
+            stack = self._stack
+            if stack:
+                key = stack[-1][0]
+            elif filename or name:
+                key = (FILE, filename or name)
+            else:
+                key = (STRING, source if isinstance(source, str)
+                       else repr(source))
+            begin = clock()
+            try:
+                return func(env, source, name, filename, *args, **kwargs)
+            finally:
+                elapsed = clock() - begin
+                entry = self._entry(key)
+                entry[1] += 1
+                entry[5] += elapsed
+                digest = hash((filename, source))
+                if digest in self._compiled:
+                    entry[2] += 1
+                else:
+                    self._compiled.add(digest)
+
+        return inner
+
+
+def _possibly_template(templar, data):
+    try:
+        return templar.is_possibly_template(data)
+    except AttributeError:
+        return True
+
+
+def merge_rows(templates, rows):
+    """Merge ``rows``, as returned by ``TemplateTracker.rows``, into
+    ``templates``, keyed by ``(kind, name)``
+    """
+    for row in rows:
+        key = (row[0], row[1])
+        try:
+            entry = templates[key]
+        except KeyError:
+            templates[key] = list(row[2:])
+            continue
+        for i, value in enumerate(row[2:]):
+            entry[i] += value
+    return templates
+
+
+def top(templates, sort='cumulative', limit=None):
+    """The ``limit`` templates with the highest ``sort`` value, as
+    ``(kind, name, renders, compiles, recompiles, self, cumulative,
+    compile)``
+    """
+    index = SORTS[sort] - 2
+    ordered = sorted(
+        templates.items(),
+        key=lambda item: item[1][index],
+        reverse=True
+    )
+    if limit is not None and limit >= 0:
+        ordered = ordered[:limit]
+    return [key + tuple(entry) for key, entry in ordered]
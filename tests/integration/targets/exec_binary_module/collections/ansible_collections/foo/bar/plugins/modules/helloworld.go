@@ -16,20 +16,24 @@
 package main
 
 import (
+	"bufio"
 	"encoding/json"
 	"fmt"
 	"io/ioutil"
 	"os"
+	"time"
 )
 
 type ModuleArgs struct {
-	Name string
+	Name  string
+	Sleep int
 }
 
 type Response struct {
 	Msg     string `json:"msg"`
 	Changed bool   `json:"changed"`
 	Failed  bool   `json:"failed"`
+	Pid     int    `json:"pid"`
 }
 
 func ExitJson(responseBody Response) {
@@ -56,6 +60,40 @@ func returnResponse(responseBody Response) {
 	}
 }
 
+func hello(moduleArgs ModuleArgs) Response {
+	var response Response
+
+	time.Sleep(time.Duration(moduleArgs.Sleep) * time.Second)
+
+	var name string = "World"
+	if moduleArgs.Name != "" {
+		name = moduleArgs.Name
+	}
+
+	response.Msg = "Hello, " + name + "!"
+	response.Pid = os.Getpid()
+	return response
+}
+
+// Handle newline delimited JSON requests on stdin, as run by
+// exec_binary_module with server enabled
+func serve() {
+	scanner := bufio.NewScanner(os.Stdin)
+	for scanner.Scan() {
+		var response Response
+		var moduleArgs ModuleArgs
+		err := json.Unmarshal(scanner.Bytes(), &moduleArgs)
+		if err != nil {
+			response.Msg = "Request not valid JSON"
+			response.Failed = true
+		} else {
+			response = hello(moduleArgs)
+		}
+		body, _ := json.Marshal(response)
+		fmt.Println(string(body))
+	}
+}
+
 func main() {
 	var response Response
 
@@ -64,6 +102,11 @@ func main() {
 		FailJson(response)
 	}
 
+	if os.Args[1] == "--ansible-server" {
+		serve()
+		return
+	}
+
 	argsFile := os.Args[1]
 
 	text, err := ioutil.ReadFile(argsFile)
@@ -79,11 +122,5 @@ func main() {
 		FailJson(response)
 	}
 
-	var name string = "World"
-	if moduleArgs.Name != "" {
-		name = moduleArgs.Name
-	}
-
-	response.Msg = "Hello, " + name + "!"
-	ExitJson(response)
+	ExitJson(hello(moduleArgs))
 }
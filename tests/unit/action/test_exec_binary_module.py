@@ -0,0 +1,596 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import gzip
+import hashlib
+import lzma
+import os
+import shlex
+import subprocess
+import time
+
+from unittest.mock import MagicMock, call
+
+import pytest
+
+from ansible import constants as C
+from ansible.plugins.action import ActionBase
+
+from ansible_collections.sivel.toiletwater.plugins.action import exec_binary_module
+from ansible_collections.sivel.toiletwater.plugins.action.exec_binary_module import (
+    PLATFORMS_FACT,
+    SERVER_REQUEST,
+    SERVER_WATCHDOG,
+    ActionModule,
+)
+
+LINUX = {'system': 'linux', 'architecture': 'x86_64'}
+
+
+@pytest.fixture(autouse=True)
+def local_tmp(tmp_path, monkeypatch):
+    monkeypatch.setattr(C, 'DEFAULT_LOCAL_TMP', str(tmp_path))
+    for name in ('_PLATFORMS', '_CHECKSUMS', '_INDEX', '_FOUND'):
+        monkeypatch.setattr(exec_binary_module, name, {})
+    return tmp_path
+
+
+def make_action(args=None, delegate_to=None):
+    task = MagicMock()
+    task.args = args or {}
+    task.async_val = 0
+    task.check_mode = False
+    task.delegate_to = delegate_to
+    task.delegate_facts = None
+    task.resolved_action = 'foo.bar.helloworld'
+    connection = MagicMock()
+    connection._shell.tmpdir = None
+    connection._shell.SHELL_FAMILY = 'sh'
+    connection._shell.join_path = lambda *a: '/'.join(a)
+    templar = MagicMock()
+    # No gathered facts
+    templar.template.side_effect = KeyError('ansible_facts')
+    templar.set_temporary_context.return_value.__enter__.return_value = templar
+    action = ActionModule(
+        task, connection, MagicMock(), MagicMock(), templar, MagicMock()
+    )
+    action._gather_platform = MagicMock(side_effect=lambda tv: dict(LINUX))
+    return action
+
+
+def test_platform_cache_run():
+    task_vars = {'inventory_hostname': 'h1'}
+    action = make_action()
+    for dummy in range(3):
+        conf, facts = action._determine_auto(task_vars, 'run')
+        assert conf == {'system': 'linux', 'architecture': 'amd64'}
+        assert facts is None
+    assert action._gather_platform.call_count == 1
+
+    # Another fork, later in the run
+    exec_binary_module._PLATFORMS.clear()
+    action = make_action()
+    assert action._determine_auto(task_vars, 'run')[0]['system'] == 'linux'
+    assert action._gather_platform.call_count == 0
+
+    # Stale facts from a previous run are not used
+    action = make_action()
+    task_vars = {
+        'inventory_hostname': 'h2',
+        'ansible_facts': {
+            PLATFORMS_FACT: {
+                'h2': {'system': 'linux', 'architecture': 'aarch64'},
+            },
+        },
+    }
+    conf, facts = action._determine_auto(task_vars, 'run')
+    assert conf['architecture'] == 'amd64'
+    assert action._gather_platform.call_count == 1
+
+
+def test_platform_cache_none(local_tmp):
+    task_vars = {'inventory_hostname': 'h1'}
+    action = make_action()
+    for dummy in range(2):
+        conf, facts = action._determine_auto(task_vars, 'none')
+        assert facts is None
+    assert action._gather_platform.call_count == 2
+    assert not list(local_tmp.iterdir())
+
+
+def test_platform_cache_facts():
+    action = make_action(delegate_to='d1')
+    task_vars = {
+        'inventory_hostname': 'h1',
+        'ansible_facts': {
+            PLATFORMS_FACT: {'h1': dict(LINUX)},
+        },
+    }
+    conf, facts = action._determine_auto(task_vars, 'facts')
+    assert conf['architecture'] == 'amd64'
+    # Delegated results are assigned to the inventory host, so the delegate
+    # is cached in its facts, alongside what was already there
+    assert facts == {
+        PLATFORMS_FACT: {'h1': LINUX, 'd1': LINUX},
+    }
+
+    # A new run, with the persisted fact
+    exec_binary_module._PLATFORMS.clear()
+    action = make_action()
+    task_vars = {
+        'inventory_hostname': 'h2',
+        'ansible_facts': {
+            PLATFORMS_FACT: {
+                'h2': {'system': 'freebsd', 'architecture': 'amd64'},
+            },
+        },
+    }
+    conf, facts = action._determine_auto(task_vars, 'facts')
+    assert conf == {'system': 'freebsd', 'architecture': 'amd64'}
+    assert facts is None
+    assert action._gather_platform.call_count == 0
+
+
+def test_run_platform_cache():
+    action = make_action({'platform_cache': 'bogus'})
+    result = action.run(task_vars={'inventory_hostname': 'h1'})
+    assert result['failed']
+    assert 'platform_cache must be one of' in result['msg']
+
+    action = make_action({'platform_cache': 'facts'})
+    action._resolve = MagicMock(return_value='foo.bar.helloworld_linux_amd64')
+    action._execute_module = MagicMock(return_value={'msg': 'Hello'})
+    result = action.run(task_vars={'inventory_hostname': 'h1'})
+    assert result['_module'] == 'foo.bar.helloworld_linux_amd64'
+    assert result['ansible_facts'] == {PLATFORMS_FACT: {'h1': LINUX}}
+
+    # A boolean enables the run cache
+    action = make_action({'platform_cache': True})
+    action._resolve = MagicMock(return_value='foo.bar.helloworld_linux_amd64')
+    action._execute_module = MagicMock(return_value={'msg': 'Hello'})
+    result = action.run(task_vars={'inventory_hostname': 'h1'})
+    assert 'ansible_facts' not in result
+    assert action._gather_platform.call_count == 0
+
+
+@pytest.fixture
+def binary(tmp_path):
+    path = tmp_path / 'helloworld_linux_amd64'
+    path.write_bytes(b'\x7fELF' + b'\x00' * 1024)
+    return str(path)
+
+
+def test_checksum(binary, local_tmp, monkeypatch):
+    with open(binary, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    assert exec_binary_module.checksum(binary) == digest
+
+    # Shared with other forks through the local tmp dir, while the binary
+    # is unchanged
+    cached, = local_tmp.glob('binary-module-checksum-*.json')
+    cached.write_text('"cached"')
+    monkeypatch.setattr(exec_binary_module, '_CHECKSUMS', {})
+    assert exec_binary_module.checksum(binary) == 'cached'
+
+    with open(binary, 'ab') as f:
+        f.write(b'\x00')
+    with open(binary, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    assert exec_binary_module.checksum(binary) == digest
+
+
+def make_cache_action(commands, rc=0, become_unprivileged=False):
+    action = make_action({'remote_cache': '~/.cache/bin/'})
+    action._is_become_unprivileged = MagicMock(
+        return_value=become_unprivileged
+    )
+
+    def execute(cmd, sudoable=True, **kwargs):
+        commands.append(cmd)
+        return {'rc': rc.pop(0) if isinstance(rc, list) else rc,
+                'stdout': '', 'stderr': 'denied'}
+
+    action._low_level_execute_command = MagicMock(side_effect=execute)
+    action._resolve = MagicMock(return_value='foo.bar.helloworld_linux_amd64')
+    action._execute_module = MagicMock(return_value={'msg': 'Hello'})
+    return action
+
+
+def test_remote_cache_hit(binary, monkeypatch):
+    upload = MagicMock()
+    monkeypatch.setattr(ActionBase, '_transfer_file', upload)
+    commands = []
+    action = make_cache_action(commands)
+    action.run(task_vars={'inventory_hostname': 'h1'})
+    assert action._remote_cache == '~/.cache/bin'
+
+    remote = '/tmp/ansible-tmp/AnsiballZ_helloworld'
+    assert action._transfer_file(binary, remote) == remote
+    digest = exec_binary_module.checksum(binary)
+    assert commands == [
+        f'test -f ~/.cache/bin/{digest} '
+        f'&& ln -sf ~/.cache/bin/{digest} {remote}'
+    ]
+    assert action._remote_cache_result == 'hit'
+    upload.assert_not_called()
+
+    # The args file is never cached
+    args = '/tmp/ansible-tmp/args'
+    action._transfer_file(binary, args)
+    upload.assert_called_once_with(binary, args)
+    assert len(commands) == 1
+
+
+def test_remote_cache_miss(binary, monkeypatch):
+    upload = MagicMock()
+    monkeypatch.setattr(ActionBase, '_transfer_file', upload)
+    commands = []
+    action = make_cache_action(commands, rc=[1, 0])
+    action.run(task_vars={'inventory_hostname': 'h1'})
+
+    remote = '/tmp/ansible-tmp/AnsiballZ_helloworld'
+    assert action._transfer_file(binary, remote) == remote
+    assert action._remote_cache_result == 'miss'
+    upload.assert_called_once_with(binary, remote)
+    digest = exec_binary_module.checksum(binary)
+    assert len(commands) == 2
+    # Copied into the cache under a temporary name, then renamed
+    assert commands[1].startswith(f'mkdir -p ~/.cache/bin && cp {remote} ')
+    assert f'&& mv -f ~/.cache/bin/.{digest}.' in commands[1]
+    assert f' ~/.cache/bin/{digest} || {{ rm -f ' in commands[1]
+
+
+def test_remote_cache_failed(binary, monkeypatch):
+    upload = MagicMock()
+    monkeypatch.setattr(ActionBase, '_transfer_file', upload)
+    warning = MagicMock()
+    monkeypatch.setattr(exec_binary_module.display, 'warning', warning)
+    commands = []
+    action = make_cache_action(commands, rc=1)
+    action.run(task_vars={'inventory_hostname': 'h1'})
+
+    remote = '/tmp/ansible-tmp/AnsiballZ_helloworld'
+    assert action._transfer_file(binary, remote) == remote
+    assert action._remote_cache_result == 'miss'
+    upload.assert_called_once_with(binary, remote)
+    assert 'Failed to cache binary module' in warning.call_args[0][0]
+
+
+def test_remote_cache_become_unprivileged(binary, monkeypatch):
+    upload = MagicMock()
+    monkeypatch.setattr(ActionBase, '_transfer_file', upload)
+    monkeypatch.setattr(exec_binary_module.display, 'warning', MagicMock())
+    commands = []
+    action = make_cache_action(commands, become_unprivileged=True)
+    result = action.run(task_vars={'inventory_hostname': 'h1'})
+    assert action._remote_cache is None
+    assert '_remote_cache' not in result
+
+    remote = '/tmp/ansible-tmp/AnsiballZ_helloworld'
+    action._transfer_file(binary, remote)
+    upload.assert_called_once_with(binary, remote)
+    assert not commands
+
+
+def test_compressed(binary, local_tmp, monkeypatch):
+    with open(binary, 'rb') as f:
+        data = f.read()
+
+    path = exec_binary_module.compressed(binary, 'gzip')
+    assert os.path.dirname(path) == str(local_tmp)
+    assert path.endswith('.gz')
+    with gzip.open(path) as f:
+        assert f.read() == data
+
+    # Compressed once per run
+    compress = MagicMock()
+    monkeypatch.setattr(exec_binary_module, '_compress', compress)
+    assert exec_binary_module.compressed(binary, 'gzip') == path
+    compress.assert_not_called()
+    monkeypatch.undo()
+
+    path = exec_binary_module.compressed(binary, 'xz')
+    assert path.endswith('.xz')
+    with lzma.open(path) as f:
+        assert f.read() == data
+
+
+def test_compressed_zstd(binary, monkeypatch):
+    zstandard = MagicMock()
+    zstandard.ZstdCompressor.return_value.compress.return_value = b'zstd'
+    monkeypatch.setattr(exec_binary_module, 'zstandard', zstandard,
+                        raising=False)
+    path = exec_binary_module.compressed(binary, 'zstd')
+    assert path.endswith('.zst')
+    with open(path, 'rb') as f:
+        assert f.read() == b'zstd'
+    zstandard.ZstdCompressor.assert_called_once_with(level=10)
+
+
+def make_compression_action(commands, compression='gzip', rc=0):
+    action = make_action({'compression': compression})
+
+    def execute(cmd, sudoable=True, **kwargs):
+        commands.append(cmd)
+        return {'rc': rc, 'stdout': '', 'stderr': 'gzip: not found'}
+
+    action._low_level_execute_command = MagicMock(side_effect=execute)
+    action._resolve = MagicMock(return_value='foo.bar.helloworld_linux_amd64')
+    action._execute_module = MagicMock(return_value={'msg': 'Hello'})
+    return action
+
+
+def test_compression_invalid(monkeypatch):
+    action = make_compression_action([], compression='bzip2')
+    result = action.run(task_vars={'inventory_hostname': 'h1'})
+    assert result['failed']
+    assert 'compression must be one of' in result['msg']
+
+    monkeypatch.setattr(exec_binary_module, 'HAS_ZSTANDARD', False)
+    action = make_compression_action([], compression='zstd')
+    result = action.run(task_vars={'inventory_hostname': 'h1'})
+    assert result['failed']
+    assert 'zstandard' in result['msg']
+
+
+def test_compression_transfer(binary, monkeypatch):
+    upload = MagicMock()
+    monkeypatch.setattr(ActionBase, '_transfer_file', upload)
+    commands = []
+    action = make_compression_action(commands)
+    action.run(task_vars={'inventory_hostname': 'h1'})
+    assert action._compression == 'gzip'
+
+    remote = '/tmp/ansible-tmp/AnsiballZ_helloworld'
+    assert action._transfer_file(binary, remote) == remote
+    upload.assert_called_once_with(
+        exec_binary_module.compressed(binary, 'gzip'),
+        f'{remote}.gz'
+    )
+    assert commands == [
+        f'gzip -dc {remote}.gz > {remote} && rm -f {remote}.gz '
+        f'|| {{ rm -f {remote} {remote}.gz; exit 1; }}'
+    ]
+
+    # The args file is never compressed
+    upload.reset_mock()
+    action._transfer_file(binary, '/tmp/ansible-tmp/args')
+    upload.assert_called_once_with(binary, '/tmp/ansible-tmp/args')
+    assert len(commands) == 1
+
+
+def test_compression_decompress_failed(binary, monkeypatch):
+    upload = MagicMock()
+    monkeypatch.setattr(ActionBase, '_transfer_file', upload)
+    warning = MagicMock()
+    monkeypatch.setattr(exec_binary_module.display, 'warning', warning)
+    commands = []
+    action = make_compression_action(commands, rc=127)
+    action.run(task_vars={'inventory_hostname': 'h1'})
+
+    remote = '/tmp/ansible-tmp/AnsiballZ_helloworld'
+    assert action._transfer_file(binary, remote) is upload.return_value
+    # Falls back to transferring it uncompressed
+    assert upload.call_args_list == [
+        call(exec_binary_module.compressed(binary, 'gzip'), f'{remote}.gz'),
+        call(binary, remote),
+    ]
+    assert len(commands) == 1
+    assert 'transferring it uncompressed' in warning.call_args[0][0]
+    assert 'gzip: not found' in warning.call_args[0][0]
+
+
+@pytest.fixture
+def collection(tmp_path, monkeypatch):
+    path = tmp_path / 'ansible_collections' / 'foo' / 'bar'
+    modules = path / 'plugins' / 'modules'
+    modules.mkdir(parents=True)
+    (modules / 'helloworld_linux_amd64').write_bytes(b'')
+    (modules / 'helloworld_linux_amd64.yml').write_text('')
+    (modules / 'helloworld_linux_386.yml').write_text('')
+    (modules / 'helloworld_linux_amd64v2').symlink_to('helloworld_linux_amd64')
+    (modules / 'helloworld_linux_arm').write_bytes(b'')
+    get_path = MagicMock(return_value=str(path))
+    get_metadata = MagicMock(return_value={'plugin_routing': {'modules': {
+        'helloworld_linux_arm64': {'redirect': 'baz.qux.helloworld_linux_arm64'},
+        'helloworld_linux_arm': {'tombstone': {'removal_version': '2.0.0'}},
+    }}})
+    monkeypatch.setattr(exec_binary_module, '_get_collection_path', get_path)
+    monkeypatch.setattr(exec_binary_module, '_get_collection_metadata', get_metadata)
+    return get_path
+
+
+def test_has_module(collection, monkeypatch):
+    action = make_action()
+    find = action._shared_loader_obj.module_loader.find_plugin_with_context
+    find.side_effect = lambda name, collection_list=None: MagicMock(
+        resolved=name in ('foo.bar.helloworld_linux_arm64', 'helloworld_linux_any')
+    )
+
+    for dummy in range(2):
+        calls = find.call_count
+        # Modules and symlinks are found without the loader, and a module
+        # missing from the collection is not found
+        assert action._has_module('foo.bar.helloworld_linux_amd64')
+        assert action._has_module('foo.bar.helloworld_linux_amd64v2')
+        assert not action._has_module('foo.bar.helloworld_linux_s390x')
+        assert not action._has_module('foo.bar.helloworld_linux_386')
+        assert not action._has_module('foo.bar.helloworld_linux_arm')
+        assert find.call_count == calls
+
+        # Redirects, and names that are not in a collection, are looked up
+        # with the loader, once
+        assert action._has_module('foo.bar.helloworld_linux_arm64')
+        assert action._has_module('helloworld_linux_any')
+        assert not action._has_module('helloworld_linux_s390x')
+        assert find.call_count == 3
+
+        # Shared with other forks through the local tmp dir
+        monkeypatch.setattr(exec_binary_module, '_INDEX', {})
+        monkeypatch.setattr(exec_binary_module, '_FOUND', {})
+    collection.assert_called_once_with('foo.bar')
+
+    assert action._resolve('foo.bar.helloworld', 'linux', 'arm64v9', {
+        'arm64v9': ['arm64'],
+    }) == 'foo.bar.helloworld_linux_arm64'
+    assert find.call_count == 3
+
+
+def test_has_module_not_collection(monkeypatch):
+    monkeypatch.setattr(
+        exec_binary_module,
+        '_get_collection_path',
+        MagicMock(side_effect=ValueError('unable to locate collection foo.bar'))
+    )
+    action = make_action()
+    find = action._shared_loader_obj.module_loader.find_plugin_with_context
+    find.return_value = MagicMock(resolved=True)
+    assert action._has_module('foo.bar.helloworld_linux_amd64')
+    find.assert_called_once_with(
+        'foo.bar.helloworld_linux_amd64',
+        collection_list=action._task.collections
+    )
+
+
+@pytest.mark.parametrize('option, value', [
+    ('server_idle_timeout', 'soon'),
+    ('server_idle_timeout', None),
+    ('server_idle_timeout', 0),
+    ('server_request_timeout', True),
+    ('server_request_timeout', -1),
+])
+def test_server_timeout_invalid(option, value):
+    action = make_action({'server': True, option: value})
+    result = action.run(task_vars={'inventory_hostname': 'h1'})
+    assert result['failed']
+    assert result['msg'] == f'{option} must be a positive integer, got {value}'
+
+
+def test_start_server_tmpdir(binary, monkeypatch):
+    upload = MagicMock()
+    monkeypatch.setattr(ActionBase, '_transfer_file', upload)
+    action = make_action()
+    action._make_tmp_path = MagicMock(return_value='/tmp/ansible-tmp')
+    action._remove_tmp_path = MagicMock()
+    action._fixup_perms2 = MagicMock()
+    action._low_level_execute_command = MagicMock(return_value={
+        'rc': 0, 'stdout': '', 'stderr': '',
+    })
+    assert action._start_server(binary, '~/servers/x', 300)
+    upload.assert_called_once_with(
+        binary,
+        '/tmp/ansible-tmp/AnsiballZ_helloworld_linux_amd64'
+    )
+    # The binary is copied into the server dir, and the tmp dir removed
+    action._remove_tmp_path.assert_called_once_with(
+        '/tmp/ansible-tmp',
+        force=True
+    )
+
+    # A tmp dir made by ansible is left to it
+    action = make_action()
+    action._connection._shell.tmpdir = '/tmp/ansible-tmp'
+    action._make_tmp_path = MagicMock()
+    action._remove_tmp_path = MagicMock()
+    action._fixup_perms2 = MagicMock()
+    action._low_level_execute_command = MagicMock(return_value={
+        'rc': 3, 'stdout': '', 'stderr': '',
+    })
+    assert action._start_server(binary, '~/servers/x', 300) is False
+    action._make_tmp_path.assert_not_called()
+    action._remove_tmp_path.assert_not_called()
+
+
+def dead_pid():
+    proc = subprocess.Popen(['true'])
+    proc.wait()
+    return proc.pid
+
+
+@pytest.fixture
+def server(tmp_path):
+    # A server dir for a running server, with regular files in place of
+    # the FIFOs, and a response waiting
+    d = tmp_path / 'server'
+    d.mkdir()
+    (d / 'pid').write_text(f'{os.getpid()}\n')
+    (d / 'in').write_text('')
+    (d / 'out').write_text('{"changed": false}\n')
+    return d
+
+
+def request(server, timeout):
+    return subprocess.run(
+        ['sh', '-c', SERVER_REQUEST % {
+            'dir': shlex.quote(str(server)),
+            'timeout': timeout,
+        }],
+        input=b'{}\n',
+        capture_output=True,
+        timeout=30,
+    )
+
+
+def test_server_request(server):
+    res = request(server, 1)
+    assert res.returncode == 0
+    assert res.stdout == b'{"changed": false}\n'
+    assert (server / 'in').read_text() == '{}\n'
+    assert not (server / 'lock').exists()
+
+
+def test_server_request_lock_stale(server):
+    # Left behind by a request that exited without releasing it
+    (server / 'lock').mkdir()
+    (server / 'lock' / 'pid').write_text(f'{dead_pid()}\n')
+    res = request(server, 1)
+    assert res.returncode == 0
+    assert not (server / 'lock').exists()
+
+    # Left behind before the holder recorded its pid
+    (server / 'lock').mkdir()
+    old = time.time() - 120
+    os.utime(server / 'lock', (old, old))
+    res = request(server, 1)
+    assert res.returncode == 0
+    assert not (server / 'lock').exists()
+
+
+def test_server_request_lock_busy(server):
+    # Held by a running request, that is waited for at most the timeout
+    (server / 'lock').mkdir()
+    (server / 'lock' / 'pid').write_text(f'{os.getpid()}\n')
+    start = time.monotonic()
+    res = request(server, 1)
+    assert res.returncode == 5
+    assert time.monotonic() - start < 5
+    assert (server / 'in').read_text() == ''
+    assert (server / 'lock').exists()
+
+    # A lock without a holder may still be being taken
+    (server / 'lock' / 'pid').unlink()
+    assert request(server, 1).returncode == 5
+
+
+def test_server_watchdog_lock_stale(tmp_path):
+    d = tmp_path / 'server'
+    d.mkdir()
+    os.mkfifo(d / 'in')
+    os.mkfifo(d / 'out')
+    (d / 'module').write_text('#!/bin/sh\nwhile read line; do :; done\n')
+    (d / 'module').chmod(0o700)
+    (d / 'lock').mkdir()
+    (d / 'lock' / 'pid').write_text(f'{dead_pid()}\n')
+    watchdog = subprocess.Popen(['sh', '-c', SERVER_WATCHDOG, 'sh', str(d), '1'])
+    try:
+        # Idle servers are stopped despite the stale lock
+        assert watchdog.wait(timeout=20) == 0
+    finally:
+        if watchdog.returncode is None:
+            watchdog.kill()
+    assert not d.exists()
@@ -0,0 +1,171 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+
+from ansible_collections.sivel.toiletwater.plugins.callback import cprofile
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_store import ProfileStore
+
+
+foo = ('/usr/lib/ansible/foo.py', 1, 'foo')
+bar = ('/usr/lib/ansible/sub/bar.py', 10, 'bar')
+other = ('/usr/lib/other/baz.py', 1, 'baz')
+builtin = ('~', 0, '<built-in method builtins.len>')
+
+stats = {
+    foo: (1, 1, 0.5, 1.0, {}),
+    bar: (2, 3, 0.25, 0.5, {foo: (2, 3, 0.25, 0.5)}),
+    other: (1, 1, 0.125, 0.125, {bar: (1, 1, 0.125, 0.125)}),
+    builtin: (4, 4, 0.125, 0.125, {other: (4, 4, 0.125, 0.125)}),
+}
+
+
+def test_filter_index():
+    index = cprofile.FilterIndex(
+        ['/usr/lib/ansible', 'builtins', 'function:baz']
+    )
+    assert index.match(foo)
+    assert index.match(bar)
+    assert index.match(other)
+    assert index.match(builtin)
+
+    index = cprofile.FilterIndex(['/usr/lib/ansible/sub'])
+    assert not index.match(foo)
+    assert index.match(bar)
+    assert not index.match(other)
+    assert not index.match(builtin)
+
+
+def test_filter_pstats():
+    ps = cprofile.make_stats(dict(stats))
+    cprofile.filter_pstats(ps, ['/usr/lib/ansible'])
+    assert set(ps.stats) == {foo, bar}
+    assert ps.total_calls == 4
+    assert ps.prim_calls == 3
+    assert ps.total_tt == 0.75
+
+
+def test_strip_filter():
+    ps = cprofile.make_stats(dict(stats))
+    cprofile.filter_pstats(ps, ['/usr/lib/ansible'])
+    cprofile.strip_filter(ps)
+    stripped_foo = ('foo.py', 1, 'foo')
+    stripped_bar = ('sub/bar.py', 10, 'bar')
+    assert set(ps.stats) == {stripped_foo, stripped_bar}
+    # callers are stripped too, so the call graph stays intact
+    assert ps.stats[stripped_bar][4] == {stripped_foo: (2, 3, 0.25, 0.5)}
+
+
+def test_strip_path():
+    assert cprofile.strip_path([foo, bar, other]) == '/usr/lib/'
+    assert cprofile.strip_path([builtin]) is None
+
+
+def test_make_stats_empty():
+    ps = cprofile.make_stats({})
+    assert ps.stats == {}
+    assert ps.total_tt == 0
+
+
+def test_compile_patterns():
+    assert cprofile.compile_patterns([]) is None
+    assert cprofile.compile_patterns(['']) is None
+    pattern = cprofile.compile_patterns(['web*', 'db01'])
+    assert pattern.match('web01')
+    assert pattern.match('db01')
+    assert not pattern.match('db010')
+    assert not pattern.match('app01')
+
+
+def test_stats_aggregator_workers(tmp_path):
+    store = ProfileStore(os.path.join(tmp_path, 'profiles'))
+    store.create()
+    count = cprofile.POOL_MIN_RECORDS * 2 + 1
+    for i in range(count):
+        store.append(stats, {'i': i})
+
+    results = []
+    for workers in (1, 3):
+        seen = []
+        aggregator = cprofile.StatsAggregator(
+            ProfileStore(store.path),
+            0,
+            on_meta=lambda meta: seen.append(meta['i']),
+            workers=workers
+        )
+        results.append(aggregator.stop())
+        assert seen == list(range(count))
+    assert results[0] == results[1]
+    assert results[1][foo] == (count, count, 0.5 * count, 1.0 * count, {})
+
+
+def make_host_tasks(tmp_path, count):
+    store = ProfileStore(os.path.join(tmp_path, 'profiles'))
+    store.create()
+    for i in range(count):
+        # Totals tie across hosts, and are ranked by offset
+        entries = {foo: (1, 1, float(i % 5), float(i % 5), {})}
+        store.append(entries, {
+            'play': 'play',
+            'task_name': 'task%d' % (i % 3),
+            'host': 'host%d' % i,
+            'total': float(i % 5),
+            'i': i,
+        })
+    return store
+
+
+def select_host_tasks(store, top):
+    top_host_tasks = cprofile.TopHostTasks(top)
+    for offset, meta, dummy in store.records(entries=False):
+        top_host_tasks.add(offset, meta)
+    return top_host_tasks
+
+
+def test_top_host_tasks(tmp_path):
+    store = make_host_tasks(tmp_path, 20)
+    records = list(store.records(entries=False))
+    grand_total = sum(meta['total'] for dummy, meta, dummy in records)
+
+    top_host_tasks = select_host_tasks(store, 4)
+    kept = top_host_tasks.kept()
+    assert [meta['i'] for dummy, dummy, meta in kept] == [19, 14, 9, 4]
+    assert [total for total, dummy, dummy in kept] == [4.0] * 4
+
+    # Kept records are read again by offset, with their entries
+    for total, offset, meta in kept:
+        read_meta, entries = store.read(offset)
+        assert read_meta['i'] == meta['i']
+        assert store.resolve(entries)[foo][2] == total
+
+    # The remaining records are summarized by task, and together with the
+    # kept records account for the total time
+    rest = top_host_tasks.rest
+    assert sum(summary[0] for summary in rest.values()) == 16
+    assert sum(summary[1] for summary in rest.values()) + sum(
+        total for total, dummy, dummy in kept
+    ) == grand_total
+    assert rest[('play', 'task0')][:3] == [6, 9.0, 3.0]
+    assert rest[('play', 'task0')][3] == 'host3'
+
+
+def test_top_host_tasks_none(tmp_path):
+    store = make_host_tasks(tmp_path, 5)
+    top_host_tasks = select_host_tasks(store, 0)
+    assert top_host_tasks.kept() == []
+    assert sum(summary[0] for summary in top_host_tasks.rest.values()) == 5
+    assert sum(summary[1] for summary in top_host_tasks.rest.values()) == 10.0
+
+
+def test_top_host_tasks_all(tmp_path):
+    store = make_host_tasks(tmp_path, 5)
+    for top in (None, -1, 5, 10):
+        top_host_tasks = select_host_tasks(store, top)
+        kept = top_host_tasks.kept()
+        assert [meta['i'] for dummy, dummy, meta in kept] == [4, 3, 2, 1, 0]
+        assert top_host_tasks.rest == {}
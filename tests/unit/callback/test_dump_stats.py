@@ -0,0 +1,121 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import gzip
+import json
+import os
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from ansible.executor.stats import AggregateStats
+from ansible.plugins.callback import CallbackBase
+
+from ansible_collections.sivel.toiletwater.plugins.callback.dump_stats import CallbackModule
+
+
+def make_callback(tmp_path, monkeypatch, **options):
+    options = dict({
+        'output': str(tmp_path / 'stats.json'),
+        'incremental': False,
+        'compression': 'none',
+    }, **options)
+    monkeypatch.setattr(CallbackBase, 'set_options', lambda *a, **kw: None)
+    callback = CallbackModule()
+    callback.get_option = options.__getitem__
+    callback.set_options()
+    return callback
+
+
+def make_result(*stats, loop=False):
+    result = MagicMock()
+    result._task.loop = ['item'] if loop else None
+    result._task.loop_with = None
+    items = [{'ansible_stats': s} for s in stats]
+    result._result = {'results': items} if loop else items[0]
+    return result
+
+
+def run_stats(data):
+    stats = AggregateStats()
+    for key, value in data.items():
+        stats.set_custom_stats(key, value)
+    return stats
+
+
+def test_incremental(tmp_path, monkeypatch):
+    set_custom_stats = AggregateStats.set_custom_stats
+    callback = make_callback(tmp_path, monkeypatch, incremental=True)
+    make_callback(tmp_path, monkeypatch, incremental=True)
+    # The stats of the run are left alone
+    assert AggregateStats.set_custom_stats is set_custom_stats
+
+    output = tmp_path / 'stats.json'
+    callback.v2_runner_on_ok(make_result({'data': {'foo': 'bar'}}))
+    # Per host stats are not written
+    assert not output.exists()
+
+    callback.v2_runner_on_ok(make_result(
+        {'data': {'count': 1, 'foo': 'bar'}, 'per_host': False, 'aggregate': True},
+    ))
+    assert json.loads(output.read_text()) == {'count': 1, 'foo': 'bar'}
+
+    callback.v2_runner_on_ok(make_result(
+        {'data': {'count': 1}, 'per_host': False, 'aggregate': True},
+        {'data': {'foo': 'baz'}, 'per_host': False, 'aggregate': False},
+        loop=True,
+    ))
+    assert json.loads(output.read_text()) == {'count': 2, 'foo': 'baz'}
+
+    callback.v2_playbook_on_stats(run_stats({'count': 2}))
+    assert json.loads(output.read_text()) == {'count': 2}
+
+
+def test_not_incremental(tmp_path, monkeypatch):
+    callback = make_callback(tmp_path, monkeypatch)
+    callback.v2_runner_on_ok(make_result(
+        {'data': {'count': 1}, 'per_host': False, 'aggregate': True},
+    ))
+    assert not (tmp_path / 'stats.json').exists()
+
+    callback.v2_playbook_on_stats(run_stats({'count': 1}))
+    assert json.loads((tmp_path / 'stats.json').read_text()) == {'count': 1}
+
+
+def test_compression_gzip(tmp_path, monkeypatch):
+    callback = make_callback(tmp_path, monkeypatch, compression='gzip')
+    callback.v2_playbook_on_stats(run_stats({'foo': 'bar'}))
+    assert not (tmp_path / 'stats.json').exists()
+    with gzip.open(tmp_path / 'stats.json.gz') as f:
+        assert json.load(f) == {'foo': 'bar'}
+
+
+def test_compression_zstd(tmp_path, monkeypatch):
+    zstandard = pytest.importorskip('zstandard')
+    callback = make_callback(
+        tmp_path,
+        monkeypatch,
+        output=str(tmp_path / 'stats.json.zst'),
+        compression='zstd',
+    )
+    callback.v2_playbook_on_stats(run_stats({'foo': 'bar'}))
+    b_data = (tmp_path / 'stats.json.zst').read_bytes()
+    assert json.loads(zstandard.ZstdDecompressor().decompress(b_data)) == {'foo': 'bar'}
+
+
+def test_interrupted(tmp_path, monkeypatch):
+    callback = make_callback(tmp_path, monkeypatch)
+    callback.v2_playbook_on_stats(run_stats({'foo': 'bar'}))
+
+    monkeypatch.setattr(os, 'fsync', MagicMock(side_effect=KeyboardInterrupt))
+    with pytest.raises(KeyboardInterrupt):
+        callback.v2_playbook_on_stats(run_stats({'foo': 'baz'}))
+    # The previous output is intact, and the partial write is removed
+    assert json.loads((tmp_path / 'stats.json').read_text()) == {'foo': 'bar'}
+    assert os.listdir(tmp_path) == ['stats.json']
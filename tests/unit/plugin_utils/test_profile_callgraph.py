@@ -0,0 +1,80 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import io
+import os
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_callgraph
+
+
+main = ('main.py', 1, 'main')
+a = ('a.py', 1, 'a')
+b = ('b.py', 1, 'b')
+shared = ('shared.py', 1, 'shared')
+
+stats = {
+    main: (1, 1, 1.0, 10.0, {}),
+    a: (1, 1, 1.0, 5.0, {main: (1, 1, 1.0, 5.0)}),
+    b: (1, 1, 2.0, 4.0, {main: (1, 1, 2.0, 4.0)}),
+    shared: (2, 2, 6.0, 6.0, {a: (1, 1, 4.0, 4.0), b: (1, 1, 2.0, 2.0)}),
+}
+
+
+def write(tmp_path):
+    path = os.path.join(str(tmp_path), 'profile.callgraph.sqlite')
+    writer = profile_callgraph.CallGraphWriter(path)
+    writer.add('all - one - h1', stats)
+    writer.add('all - one - h2', stats)
+    writer.close()
+    return path
+
+
+def test_load(tmp_path):
+    path = write(tmp_path)
+    merged = profile_callgraph.load(path)
+    assert merged[shared] == (4, 4, 12.0, 12.0, {
+        a: (2, 2, 8.0, 8.0),
+        b: (2, 2, 4.0, 4.0),
+    })
+    assert merged[main] == (2, 2, 2.0, 20.0, {})
+    assert profile_callgraph.load(path, profile='h1') == stats
+    assert profile_callgraph.load(path, profile='h3') == {}
+
+
+def test_queries():
+    assert profile_callgraph.find(stats, '.py:1(') == [main, shared, a, b]
+    assert profile_callgraph.callers(stats, shared) == [
+        (a, (1, 1, 4.0, 4.0)),
+        (b, (1, 1, 2.0, 2.0)),
+    ]
+    assert profile_callgraph.callees(stats, main) == [
+        (a, (1, 1, 1.0, 5.0)),
+        (b, (1, 1, 2.0, 4.0)),
+    ]
+    assert profile_callgraph.hot_paths(stats, shared) == [
+        ((main, a, shared), 4.0),
+        ((main, b, shared), 2.0),
+    ]
+    assert profile_callgraph.hot_paths(stats, shared, limit=1) == [
+        ((main, a, shared), 4.0),
+    ]
+
+
+def test_main(tmp_path):
+    path = write(tmp_path)
+    out = io.StringIO()
+    assert profile_callgraph.main([path, 'paths', 'shared'], out=out) == 0
+    lines = out.getvalue().splitlines()
+    assert lines[0] == 'shared.py:1(shared)  ncalls=4 tottime=12.000 cumtime=12.000'
+    assert lines[1].split() == [
+        '8.000', '66.7%',
+        'main.py:1(main)', '->', 'a.py:1(a)', '->', 'shared.py:1(shared)',
+    ]
+
+    out = io.StringIO()
+    assert profile_callgraph.main([path, 'callers', 'missing'], out=out) == 1
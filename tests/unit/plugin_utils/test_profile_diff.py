@@ -0,0 +1,73 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_diff import (
+    diff_stats,
+    regressions,
+)
+
+
+same = ('same.py', 1, 'same')
+slower = ('slower.py', 1, 'slower')
+faster = ('faster.py', 1, 'faster')
+new = ('new.py', 1, 'new')
+removed = ('removed.py', 1, 'removed')
+
+base = {
+    same: (1, 1, 1.0, 1.0, {}),
+    slower: (1, 1, 1.0, 2.0, {}),
+    faster: (1, 1, 1.0, 4.0, {}),
+    removed: (1, 1, 1.0, 1.0, {}),
+}
+
+current = {
+    same: (1, 1, 1.0, 1.0, {}),
+    slower: (2, 2, 1.5, 3.0, {}),
+    faster: (1, 1, 0.5, 2.0, {}),
+    new: (1, 1, 0.25, 0.25, {}),
+}
+
+
+def test_diff_stats():
+    deltas = {d.func: d for d in diff_stats(base, current)}
+    assert set(deltas) == {same, slower, faster, new, removed}
+    assert deltas[slower].ncalls == (2, 1)
+    assert deltas[slower].tottime == (1.5, 0.5)
+    assert deltas[slower].cumtime == (3.0, 1.0)
+    assert deltas[slower].relative == 0.5
+    assert deltas[new].relative is None
+    assert deltas[removed].absolute == -1.0
+
+
+def test_diff_stats_moved():
+    # Lines added above functions between runs
+    base = {
+        ('mod.py', 10, 'moved'): (1, 1, 1.0, 1.0, {}),
+        ('mod.py', 20, '<lambda>'): (1, 1, 1.0, 1.0, {}),
+        ('mod.py', 40, '<lambda>'): (1, 1, 2.0, 2.0, {}),
+    }
+    current = {
+        ('mod.py', 15, 'moved'): (1, 1, 1.5, 1.5, {}),
+        ('mod.py', 25, '<lambda>'): (1, 1, 1.0, 1.0, {}),
+        ('mod.py', 45, '<lambda>'): (1, 1, 3.0, 3.0, {}),
+        ('mod.py', 50, '<lambda>'): (1, 1, 0.5, 0.5, {}),
+    }
+    deltas = {d.func: d for d in diff_stats(base, current)}
+    assert set(deltas) == set(current)
+    assert deltas[('mod.py', 15, 'moved')].relative == 0.5
+    # The nearest line breaks ties between functions of the same name
+    assert deltas[('mod.py', 25, '<lambda>')].absolute == 0.0
+    assert deltas[('mod.py', 45, '<lambda>')].absolute == 1.0
+    assert deltas[('mod.py', 50, '<lambda>')].relative is None
+
+
+def test_regressions():
+    deltas = diff_stats(base, current, 'tottime')
+    assert [d.func for d in regressions(deltas)] == [slower, new]
+    assert [d.func for d in regressions(deltas, relative=True)] == [slower]
+    assert [d.func for d in regressions(deltas, limit=1)] == [slower]
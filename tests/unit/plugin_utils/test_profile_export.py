@@ -0,0 +1,124 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import json
+import os
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_export
+
+
+main = ('main.py', 1, 'main')
+a = ('a.py', 1, 'a')
+b = ('b.py', 1, 'b')
+shared = ('shared.py', 1, 'shared')
+
+stats = {
+    main: (1, 1, 1.0, 10.0, {}),
+    a: (1, 1, 1.0, 5.0, {main: (1, 1, 1.0, 5.0)}),
+    b: (1, 1, 2.0, 4.0, {main: (1, 1, 2.0, 4.0)}),
+    shared: (2, 2, 6.0, 6.0, {a: (1, 1, 4.0, 4.0), b: (1, 1, 2.0, 2.0)}),
+}
+
+
+def test_build_tree():
+    tree = profile_export.build_tree(stats)
+    assert len(tree) == 1
+    root = tree[0]
+    assert root.func == main
+    assert root.total == 10.0
+    assert root.self == 1.0
+    assert [c.func for c in root.children] == [a, b]
+    node_a, node_b = root.children
+    assert node_a.children[0].func == shared
+    # shared spent 4 of its 6 seconds when called from a
+    assert node_a.children[0].total == 4.0
+    assert node_a.children[0].self == 4.0
+    assert node_b.children[0].total == 2.0
+
+
+def test_iter_stacks():
+    stacks = dict(profile_export.iter_stacks(profile_export.build_tree(stats)))
+    assert stacks[(main,)] == 1.0
+    assert stacks[(main, a, shared)] == 4.0
+    assert stacks[(main, b, shared)] == 2.0
+    assert sum(stacks.values()) == 10.0
+
+
+def test_exporter(tmp_path):
+    exporter = profile_export.Exporter(
+        str(tmp_path),
+        list(profile_export.FORMATS)
+    )
+    exporter.add('one', stats)
+    exporter.add(('play', 'task', 'host'), stats)
+    exporter.close()
+
+    with open(os.path.join(tmp_path, 'profile.collapsed')) as f:
+        lines = f.read().splitlines()
+    assert 'one;main.py:1(main);a.py:1(a);shared.py:1(shared) 4000000' in lines
+    assert 'play;task;host;main.py:1(main) 1000000' in lines
+
+    with open(os.path.join(tmp_path, 'profile.speedscope.json')) as f:
+        speedscope = json.load(f)
+    assert [p['name'] for p in speedscope['profiles']] == [
+        'one',
+        'play - task - host',
+    ]
+    assert len(speedscope['shared']['frames']) == 4
+    assert sum(speedscope['profiles'][0]['weights']) == 10.0
+
+    with open(os.path.join(tmp_path, 'profile.trace.json')) as f:
+        trace = json.load(f)
+    complete = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+    assert len(complete) == 10
+    assert {e['pid'] for e in complete} == {1, 2}
+
+
+def test_exporter_timeline(tmp_path):
+    exporter = profile_export.Exporter(str(tmp_path), ['timeline'], 100.0)
+    meta = {
+        'host': 'h1',
+        'task_name': 'task',
+        'task_uuid': 'uuid',
+        'play': 'play',
+        'pid': 1234,
+        'timeline': {
+            'queued': 100.5,
+            'spawned': 101.0,
+            'slot': 0,
+            'started': 101.25,
+            'finished': 103.0,
+            'saved': 103.5,
+        },
+    }
+    exporter.add('ignored', stats)
+    exporter.add_timeline(meta)
+    exporter.add_timeline(dict(meta, host='h2', timeline=dict(
+        meta['timeline'], queued=None, slot=1
+    )))
+    exporter.close()
+
+    assert not os.path.exists(os.path.join(tmp_path, 'profile.collapsed'))
+    with open(os.path.join(tmp_path, 'timeline.trace.json')) as f:
+        trace = json.load(f)
+    spans = [
+        (e['name'], e['pid'], e['tid'], e['ts'], e['dur'])
+        for e in trace['traceEvents'] if e['ph'] == 'X'
+    ]
+    assert spans[:5] == [
+        ('fork', 1, 1, 1000000.0, 250000.0),
+        ('task - h1', 1, 1, 1250000.0, 1750000.0),
+        ('profile', 1, 1, 3000000.0, 500000.0),
+        ('queue wait', 2, 1, 500000.0, 500000.0),
+        ('task - h1', 2, 1, 1000000.0, 2000000.0),
+    ]
+    # No queue wait without a task start time
+    assert [s[0] for s in spans[5:]] == [
+        'fork', 'task - h2', 'profile', 'task - h2'
+    ]
+    assert [s[2] for s in spans[5:]] == [2, 2, 2, 2]
@@ -0,0 +1,78 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+import socket
+import stat
+
+import pytest
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_live import (
+    LiveServer,
+    parse_request,
+)
+
+
+def request(path, line):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(path)
+    sock.sendall(line)
+    sock.shutdown(socket.SHUT_WR)
+    data = b''
+    while True:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    sock.close()
+    return data.decode('utf-8')
+
+
+def test_parse_request():
+    assert parse_request('') == {}
+    assert parse_request('sort=tottime,ncalls limit=5') == {
+        'sort': 'tottime,ncalls',
+        'limit': '5',
+    }
+    with pytest.raises(ValueError):
+        parse_request('limit')
+
+
+def test_live_server(tmp_path):
+    path = str(tmp_path / 'live.sock')
+
+    def handler(req):
+        if 'limit' in req:
+            int(req['limit'])
+        if 'fail' in req:
+            raise TypeError(req['fail'])
+        return 'ok %s\n' % sorted(req.items())
+
+    server = LiveServer(path, handler, timeout=0.05)
+    server.start()
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+        assert request(path, b'sort=tottime\n') == "ok [('sort', 'tottime')]\n"
+        assert request(path, b'limit=x').startswith('ERROR: ')
+        assert request(path, b'bogus\n').startswith('ERROR: Invalid request')
+        # Any error is reported, and the server keeps serving
+        assert request(path, b'fail=boom\n') == 'ERROR: boom\n'
+        assert request(path, b'\n') == 'ok []\n'
+        # Only one server may use the socket at a time
+        with pytest.raises(OSError):
+            LiveServer(path, handler)
+    finally:
+        server.stop()
+    assert not os.path.exists(path)
+
+    # A stale socket from a previous run is replaced
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    server = LiveServer(path, handler)
+    server.stop()
@@ -0,0 +1,29 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_memory import (
+    MemoryReport,
+)
+
+
+def memory(rss, top):
+    return {'peak': rss // 2, 'rss': rss, 'top': top}
+
+
+def test_memory_report():
+    report = MemoryReport(2)
+    report.add('small', memory(10, [['a.py', 1, 100, 1]]))
+    report.add('large', memory(30, [['a.py', 1, 50, 2], ['b.py', 2, 10, 1]]))
+    report.add('medium', memory(20, [['c.py', 3, 500, 5]]))
+
+    assert report.count == 3
+    assert [name for name, dummy in report.forks()] == ['large', 'medium']
+    assert report.top_sites() == [
+        ['c.py', 3, 500, 5],
+        ['a.py', 1, 150, 3],
+    ]
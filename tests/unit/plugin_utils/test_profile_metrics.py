@@ -0,0 +1,50 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_metrics
+
+
+def test_log_histogram():
+    histogram = profile_metrics.LogHistogram()
+    assert histogram.quantile(0.5) is None
+    size = len(histogram.buckets)
+    for i in range(1, 1001):
+        histogram.add(i / 100.0)
+    assert len(histogram.buckets) == size
+    assert histogram.count == 1000
+    assert histogram.min == 0.01
+    assert histogram.max == 10.0
+    for q, expected in ((0.5, 5.0), (0.95, 9.5), (0.99, 9.9)):
+        assert abs(histogram.quantile(q) - expected) / expected < 0.05
+    assert histogram.quantile(1.0) == 10.0
+
+    histogram = profile_metrics.LogHistogram()
+    histogram.add(0.0)
+    histogram.add(100000.0)
+    assert histogram.quantile(0.0) == 0.0
+    assert histogram.quantile(1.0) == 100000.0
+
+
+def test_slowest_hosts():
+    slowest = profile_metrics.SlowestHosts(2)
+    for host, duration in (('a', 1.0), ('b', 3.0), ('c', 2.0), ('d', 0.5)):
+        slowest.add(host, duration)
+    assert slowest.top() == [('b', 3.0), ('c', 2.0)]
+
+
+def test_heavy_hitters():
+    hitters = profile_metrics.HeavyHitters(3)
+    for host in ('a', 'b', 'a', 'c', 'a', 'd', 'b', 'a'):
+        hitters.add(host, 1.0)
+    assert len(hitters.counters) == 3
+    top = hitters.top(2)
+    assert top[0] == ('a', 4.0, 0.0)
+    # Every estimate bounds the true total from above, within its error
+    for key, total, error in hitters.top(3):
+        true = {'a': 4.0, 'b': 2.0, 'c': 1.0, 'd': 1.0}[key]
+        assert total - error <= true <= total
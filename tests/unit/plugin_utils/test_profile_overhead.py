@@ -0,0 +1,31 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_overhead
+
+
+def test_overhead_report():
+    report = profile_overhead.OverheadReport()
+    report.add({'encode': 0.25, 'enable': 0.5}, calls=10, total=1.0)
+    report.add({'encode': 0.5, 'build': 0.125, 'lock': 0.25, 'write': 0.125},
+               calls=5, total=2.0)
+    assert report.count == 2
+    assert report.calls == 15
+    assert report.total == 3.0
+    assert report.rows() == [
+        ('profiler enable', 0.5, 0.5),
+        ('stats build', 0.125, 0.125),
+        ('stats encode', 0.75, 0.5),
+        ('store lock wait', 0.25, 0.25),
+        ('store write', 0.125, 0.125),
+    ]
+
+
+def test_calibrate():
+    per_call = profile_overhead.calibrate(iterations=1000, repeat=1)
+    assert 0.0 <= per_call < 0.001
@@ -0,0 +1,53 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import subprocess
+import sys
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_remote
+
+
+WRAPPER = b'''
+import sys
+def _ansiballz_main():
+    import runpy
+    def invoke_module():
+        def main():
+            sum(range(10))
+            print('{"changed": false}')
+            sys.exit(0)
+        runpy.run_module = lambda **kwargs: main()
+        runpy.run_module(mod_name='ansible.modules.ping')
+    invoke_module()
+_ansiballz_main()
+'''
+
+
+def test_remote_name():
+    assert profile_remote.remote_name(
+        '/tmp/ansible_ping_payload_abc123/ansible_ping_payload.zip/'
+        'ansible/modules/ping.py'
+    ) == 'remote:ansible/modules/ping.py'
+    assert profile_remote.remote_name('~') == 'remote:~'
+
+
+def test_inject_extract():
+    assert profile_remote.inject(b'print(1)\n') is None
+    injected = profile_remote.inject(WRAPPER)
+    stdout = subprocess.check_output(
+        [sys.executable, '-c', injected]
+    ).decode('utf-8')
+    assert profile_remote.MARKER in stdout
+
+    stdout, stats = profile_remote.extract(stdout)
+    assert stdout.strip() == '{"changed": false}'
+    funcs = {func[2]: func for func in stats}
+    assert funcs['main'][0].startswith(profile_remote.PREFIX)
+    assert funcs['main'] in stats[funcs['<built-in method builtins.sum>']][4]
+
+    assert profile_remote.extract('{}\n') == ('{}\n', None)
@@ -0,0 +1,108 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pytest
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_rollup import (
+    MAX_DEPTH,
+    OTHER,
+    Classifier,
+    rollup,
+)
+
+
+run = ('/usr/lib/python3/site-packages/ansible/executor/task_executor.py', 1, 'run')
+render = ('/usr/lib/python3/site-packages/jinja2/environment.py', 1, 'render')
+exec_command = ('/usr/lib/python3/site-packages/ansible/plugins/connection/ssh.py', 1, 'exec_command')
+configure = ('/usr/lib/python3/site-packages/ansible/plugins/action/__init__.py', 1, '_configure_module')
+execute = ('/usr/lib/python3/site-packages/ansible/plugins/action/__init__.py', 1, '_execute_module')
+builtin = ('~', 0, '<built-in method builtins.len>')
+
+
+def test_classifier():
+    classify = Classifier()
+    assert classify(run) == 'task execution'
+    assert classify(render) == 'templating'
+    assert classify(exec_command) == 'connection'
+    assert classify(configure) == 'module build'
+    assert classify(execute) == 'action plugins'
+    assert classify(builtin) == OTHER
+    assert classify(('remote:ansible/modules/ping.py', 1, 'main')) == 'remote modules'
+
+    classify = Classifier({'my.collection': ['/jinja2/']})
+    assert classify(render) == 'my.collection'
+    assert classify(run) == 'task execution'
+
+
+def test_rollup():
+    stats = {
+        run: (1, 1, 0.5, 4.0, {}),
+        render: (2, 2, 1.0, 1.5, {run: (2, 2, 1.0, 1.5)}),
+        exec_command: (1, 1, 1.5, 2.0, {run: (1, 1, 1.5, 2.0)}),
+        builtin: (4, 4, 1.0, 1.0, {
+            render: (1, 1, 0.25, 0.25),
+            exec_command: (3, 3, 0.75, 0.75),
+        }),
+    }
+    totals, total = rollup(stats, Classifier())
+    assert total == 4.0
+    assert totals == {
+        'task execution': [0.5, 4.0],
+        'templating': [1.0, 1.5],
+        # builtin is attributed to its most expensive caller, and the call
+        # from render enters the subsystem
+        'connection': [2.5, 2.25],
+    }
+    assert OTHER not in totals
+
+    keys = list(stats)
+    by_id = {keys.index(func): (cc, nc, tt, ct, {
+        keys.index(caller): value for caller, value in callers.items()
+    }) for func, (cc, nc, tt, ct, callers) in stats.items()}
+    assert rollup(by_id, Classifier(), key=keys.__getitem__) == (totals, total)
+
+
+def test_rollup_deep():
+    # A long chain of builtins called from run, deeper than the recursion
+    # limit
+    chain = [('~', 0, 'builtin%d' % i) for i in range(5000)]
+    stats = {run: (1, 1, 0.5, 1.5, {})}
+    for caller, func in zip([run] + chain, chain):
+        stats[func] = (1, 1, 0.0002, 1.0, {caller: (1, 1, 0.0002, 1.0)})
+    totals, total = rollup(stats, Classifier())
+    assert sorted(totals) == [OTHER, 'task execution']
+    # Only the builtins within MAX_DEPTH callers of run are attributed to it
+    assert totals['task execution'][0] == pytest.approx(0.5 + 0.0002 * MAX_DEPTH)
+
+    # The result does not depend on the order functions are visited
+    reordered = dict(reversed(list(stats.items())))
+    reordered_totals = rollup(reordered, Classifier())[0]
+    assert sorted(reordered_totals) == sorted(totals)
+    for name, value in totals.items():
+        assert reordered_totals[name] == pytest.approx(value)
+
+
+def test_rollup_cycle():
+    a = ('~', 0, 'a')
+    b = ('~', 0, 'b')
+    stats = {
+        run: (1, 1, 0.5, 3.0, {}),
+        render: (1, 1, 0.5, 1.0, {run: (1, 1, 0.5, 1.0)}),
+        # a and b mostly call each other, a is also called from run and b
+        # from render
+        a: (3, 2, 1.0, 2.0, {b: (2, 1, 0.5, 1.5), run: (1, 1, 0.5, 0.5)}),
+        b: (3, 2, 1.0, 2.0, {a: (2, 1, 0.5, 1.5), render: (1, 1, 0.5, 0.5)}),
+    }
+    totals, total = rollup(stats, Classifier())
+    assert total == 3.0
+    assert totals['task execution'][0] == 1.5
+    assert totals['templating'][0] == 1.5
+
+    # The result does not depend on the order functions are visited
+    reordered = dict(reversed(list(stats.items())))
+    assert rollup(reordered, Classifier()) == (totals, total)
@@ -0,0 +1,60 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import pstats
+import time
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils.profile_sampler import (
+    SamplingProfiler,
+)
+
+
+def root():
+    pass
+
+
+def leaf():
+    pass
+
+
+def key(func):
+    code = func.__code__
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_snapshot_stats():
+    p = SamplingProfiler()
+    p._samples = {
+        (leaf.__code__, root.__code__): [2, 0.5],
+        (root.__code__,): [1, 0.25],
+        # recursion only counts once per sample
+        (root.__code__, root.__code__): [1, 0.25],
+    }
+    p.snapshot_stats()
+    assert p.stats[key(leaf)] == (2, 2, 0.5, 0.5, {key(root): (2, 2, 0.5, 0.5)})
+    assert p.stats[key(root)] == (
+        4, 4, 0.5, 1.0, {key(root): (1, 1, 0.25, 0.25)}
+    )
+
+
+def test_sampling():
+    p = SamplingProfiler(0.001)
+    p.enable()
+    spin(0.1)
+    p.disable()
+    assert not p.running
+    ps = pstats.Stats(p)
+    cc, nc, tt, ct, callers = ps.stats[key(spin)]
+    assert nc > 0
+    assert 0 < ct <= 1
@@ -0,0 +1,81 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import importlib._bootstrap
+import sys
+
+from ansible.plugins.loader import PluginLoader
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_startup
+
+
+def test_phases():
+    timer = profile_startup.StartupTimer()
+    timer.marks = {'process': 1.0, 'inventory_plugin': 1.5, 'playbook': 3.0}
+    timer.mark('inventory')
+    timer.marks['inventory'] = 2.0
+    timer.mark('inventory')
+    assert timer.marks['inventory'] == 2.0
+    assert timer.phases() == [
+        ('interpreter startup and imports', 0.5),
+        ('inventory parsing', 0.5),
+        ('playbook loading', 1.0),
+    ]
+
+
+def test_install(tmp_path):
+    tmp_path.joinpath('tw_startup_outer.py').write_text(
+        'import tw_startup_inner\n'
+    )
+    tmp_path.joinpath('tw_startup_inner.py').write_text('x = 1\n')
+    find_and_load = importlib._bootstrap._find_and_load
+    find_plugin = PluginLoader.find_plugin_with_context
+
+    timer = profile_startup.start()
+    sys.path.insert(0, str(tmp_path))
+    try:
+        assert profile_startup.active() is timer
+        import tw_startup_outer  # noqa: F401
+    finally:
+        sys.path.remove(str(tmp_path))
+        profile_startup.stop()
+
+    assert profile_startup.active() is None
+    assert importlib._bootstrap._find_and_load is find_and_load
+    assert PluginLoader.find_plugin_with_context is find_plugin
+    outer_self, outer_cumulative = timer.imports['tw_startup_outer']
+    inner_self, inner_cumulative = timer.imports['tw_startup_inner']
+    assert outer_cumulative >= inner_cumulative
+    assert abs(outer_self - (outer_cumulative - inner_cumulative)) < 1e-6
+    names = [name for name, dummy, dummy in timer.top_imports(-1)]
+    assert names.index('tw_startup_outer') < names.index('tw_startup_inner')
+    assert len(timer.top_imports(1)) == 1
+
+
+def test_first_task(tmp_path):
+    tmp_path.joinpath('tw_startup_late.py').write_text('x = 1\n')
+    find_and_load = importlib._bootstrap._find_and_load
+    find_plugin = PluginLoader.find_plugin_with_context
+
+    timer = profile_startup.start()
+    sys.path.insert(0, str(tmp_path))
+    try:
+        timer.mark('first_task')
+        # The report is still available to the callback
+        assert profile_startup.active() is timer
+        assert importlib._bootstrap._find_and_load is find_and_load
+        assert PluginLoader.find_plugin_with_context is find_plugin
+        imports = dict(timer.imports)
+        import tw_startup_late  # noqa: F401
+        assert timer.imports == imports
+        assert 'tw_startup_late' not in timer.imports
+    finally:
+        sys.path.remove(str(tmp_path))
+        profile_startup.stop()
+
+    assert profile_startup.active() is None
@@ -0,0 +1,101 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+import os
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_store
+
+
+foo = ('/path/to/foo.py', 1, 'foo')
+bar = ('/path/to/bar.py', 10, 'bar')
+builtin = ('~', 0, "<built-in method builtins.len>")
+
+stats1 = {
+    foo: (1, 1, 0.5, 1.0, {}),
+    bar: (2, 3, 0.25, 0.5, {foo: (2, 3, 0.25, 0.5)}),
+}
+
+stats2 = {
+    bar: (1, 1, 0.25, 0.25, {foo: (1, 1, 0.25, 0.25)}),
+    builtin: (4, 4, 0.125, 0.125, {bar: (4, 4, 0.125, 0.125)}),
+}
+
+
+def test_round_trip(tmp_path):
+    path = os.path.join(tmp_path, 'profiles')
+    writer = profile_store.ProfileStore(path)
+    writer.create()
+    writer.append(stats1, {'host': 'h1'})
+    timing = {'build': 0.5}
+    writer.append(stats2, {'host': 'h2', 'timing': timing}, timing='timing')
+    assert sorted(timing) == ['build', 'encode', 'lock', 'write']
+    assert all(seconds >= 0 for seconds in timing.values())
+    writer.append(stats1, {'host': 'h3'})
+
+    reader = profile_store.ProfileStore(path)
+    records = list(reader.records())
+    # The lock and write timings are written after the record
+    assert [meta for dummy, meta, dummy in records] == [
+        {'host': 'h1'},
+        {'host': 'h2', 'timing': timing},
+        {'host': 'h3'},
+    ]
+    assert reader.resolve(records[0][2]) == stats1
+    assert reader.resolve(records[1][2]) == stats2
+    assert reader.end == os.path.getsize(path)
+
+    assert reader.read(records[1][0]) == (records[1][1], records[1][2])
+
+
+def test_keys_interned_once(tmp_path):
+    path = os.path.join(tmp_path, 'profiles')
+    writer = profile_store.ProfileStore(path)
+    writer.create()
+    writer.append(stats1, {})
+    size = os.path.getsize(path)
+    writer.append(stats1, {})
+    # The second record should not contain any key records
+    assert os.path.getsize(path) - size < size - len(profile_store.MAGIC)
+
+
+def test_incremental_merge(tmp_path):
+    path = os.path.join(tmp_path, 'profiles')
+    writer = profile_store.ProfileStore(path)
+    writer.create()
+    reader = profile_store.ProfileStore(path)
+
+    merged = {}
+    writer.append(stats1, {})
+    for dummy, dummy, entries in reader.records():
+        profile_store.add_entries(merged, entries)
+    offset = reader.end
+
+    writer.append(stats2, {})
+    for dummy, dummy, entries in reader.records(offset):
+        profile_store.add_entries(merged, entries)
+
+    result = reader.resolve(merged)
+    assert result[foo] == (1, 1, 0.5, 1.0, {})
+    assert result[bar] == (3, 4, 0.5, 0.75, {foo: (3, 4, 0.5, 0.75)})
+    assert result[builtin] == stats2[builtin]
+
+
+def test_reduce_range(tmp_path):
+    path = os.path.join(tmp_path, 'profiles')
+    writer = profile_store.ProfileStore(path)
+    writer.create()
+    writer.append(stats1, {})
+    writer.append(stats2, {})
+    writer.append(stats1, {})
+
+    reader = profile_store.ProfileStore(path)
+    offsets = [offset for offset, dummy, dummy in reader.records()]
+    merged = profile_store.reduce_range(path, offsets[1], offsets[2])
+    assert reader.resolve(merged) == stats2
+    merged = profile_store.reduce_range(path, offsets[1], reader.end)
+    assert reader.resolve(merged)[foo] == stats1[foo]
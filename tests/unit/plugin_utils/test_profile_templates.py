@@ -0,0 +1,89 @@
+# (c) 2026 Matt Martz <matt@sivel.net>
+# GNU General Public License v3.0+
+#     (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+# Make coding more python3-ish
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+from ansible.parsing.dataloader import DataLoader
+from ansible.template import Templar
+
+from ansible_collections.sivel.toiletwater.plugins.plugin_utils import profile_templates
+
+
+def test_tracker():
+    tracker = profile_templates.TemplateTracker()
+    templar = Templar(
+        loader=DataLoader(),
+        variables={'greeting': 'hello {{ name }}', 'name': 'world'}
+    )
+    tracker.install()
+    try:
+        for dummy in range(2):
+            assert templar.template('{{ greeting }}!') == 'hello world!'
+    finally:
+        tracker.uninstall()
+    assert templar.template('{{ name }}!') == 'world!'
+
+    templates = dict(
+        ((row[0], row[1]), row[2:]) for row in tracker.rows()
+    )
+    assert set(templates) == {
+        ('string', '{{ greeting }}!'),
+        ('string', 'hello {{ name }}'),
+    }
+    renders, compiles, recompiles, self_time, cumulative, dummy = \
+        templates[('string', '{{ greeting }}!')]
+    assert (renders, compiles, recompiles) == (2, 2, 1)
+    # The nested render of greeting is excluded from self time
+    nested = templates[('string', 'hello {{ name }}')]
+    assert nested[:3] == [2, 2, 1]
+    assert cumulative >= self_time + nested[4] * 0.99
+
+    tracker.reset()
+    assert tracker.rows() == []
+
+
+def test_tracker_template():
+    tracker = profile_templates.TemplateTracker()
+    templar = Templar(loader=DataLoader(), variables={'name': 'world'})
+    tracker.install()
+    try:
+        assert templar.template(['{{ name }}', 'plain', 1]) == [
+            'world', 'plain', 1
+        ]
+        assert templar.template('name', convert_bare=True) == 'world'
+        # As called by the template action of older ansible-core
+        assert templar.do_template('{{ name }}!') == 'world!'
+    finally:
+        tracker.uninstall()
+
+    templates = dict(
+        ((row[0], row[1]), row[2:]) for row in tracker.rows()
+    )
+    # Only strings that are templates are counted, and not containers, nor
+    # the do_template called by template
+    assert set(templates) == {
+        ('string', '{{ name }}'),
+        ('string', 'name'),
+        ('string', '{{ name }}!'),
+    }
+    for renders, compiles, dummy, dummy, dummy, dummy in templates.values():
+        assert renders == compiles == 1
+
+
+def test_merge_rows_top():
+    templates = profile_templates.merge_rows({}, [
+        ['string', 'a', 1, 1, 0, 0.5, 1.0, 0.25],
+        ['file', 'b.j2', 2, 1, 0, 0.25, 0.25, 0.125],
+    ])
+    profile_templates.merge_rows(templates, [
+        ['string', 'a', 1, 1, 1, 0.5, 1.0, 0.25],
+    ])
+    assert templates[('string', 'a')] == [2, 2, 1, 1.0, 2.0, 0.5]
+    assert profile_templates.top(templates) == [
+        ('string', 'a', 2, 2, 1, 1.0, 2.0, 0.5),
+        ('file', 'b.j2', 2, 1, 0, 0.25, 0.25, 0.125),
+    ]
+    assert [t[1] for t in profile_templates.top(templates, 'renders', 1)] == ['a']